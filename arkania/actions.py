@@ -0,0 +1,69 @@
+"""
+Action ids for SimpleEnv and valid-action masks
+
+An action is masked off when taking it in the current state would be a silent no-op:
+  - moving with less than 2 energy
+  - picking up with less than 1 energy, with something already in hand, or on a tile with no water, food, stone or
+    ripe plant
+  - putting down with less than 1 energy or with an empty hand
+  - consuming with an empty hand
+  - throwing (not implemented yet)
+Energy is checked after Agent.step() has run at the start of the next turn, since that is when the action happens.
+"""
+import numpy as np
+
+REST = 0
+MOVE_NORTH = 1
+MOVE_EAST = 2
+MOVE_SOUTH = 3
+MOVE_WEST = 4
+PICK_UP = 5
+PUT_DOWN = 6
+CONSUME = 7
+THROW_NORTH = 8
+THROW_EAST = 9
+THROW_SOUTH = 10
+THROW_WEST = 11
+NUM_ACTIONS = 12
+
+MOVES = [MOVE_NORTH, MOVE_EAST, MOVE_SOUTH, MOVE_WEST]
+THROWS = [THROW_NORTH, THROW_EAST, THROW_SOUTH, THROW_WEST]
+
+
+def effective_energy(energy, food, water):
+    """
+    :return: the energy that will be left for the next action once Agent.step() has run
+    """
+    energy = np.maximum(energy, 0)
+    return energy - (np.asarray(water) - 1 < 25) - (np.asarray(food) - 1 < 25)
+
+
+def action_masks(energy, food, water, in_hand, pickable):
+    """
+    Valid-action masks for a batch of agents
+    :param energy: energy of each agent
+    :param food: food of each agent
+    :param water: water of each agent
+    :param in_hand: in_hand code of each agent (0 = empty)
+    :param pickable: whether there is something to pick up on each agent's tile
+    :return: boolean <n x NUM_ACTIONS> array, True where the action does something
+    """
+    energy = effective_energy(np.asarray(energy, dtype=float), food, water)
+    holding = np.asarray(in_hand) != 0
+    masks = np.zeros((len(energy), NUM_ACTIONS), dtype=bool)
+    masks[:, REST] = True
+    masks[:, MOVES] = (energy >= 2)[:, None]
+    masks[:, PICK_UP] = (energy >= 1) & ~holding & np.asarray(pickable, dtype=bool)
+    masks[:, PUT_DOWN] = (energy >= 1) & holding
+    masks[:, CONSUME] = holding
+    masks[:, THROWS] = False
+    return masks
+
+
+def action_mask(env):
+    """
+    :return: the valid-action mask of the agent in a SimpleEnv, as a boolean array of NUM_ACTIONS
+    """
+    agent = env.agent
+    return action_masks([agent.energy], [agent.food], [agent.water], [agent.what_is_in_hand()],
+                        [env.can_pick_up(agent.x, agent.y)])[0]
@@ -0,0 +1,139 @@
+"""
+Sprite atlas with the lighting baked in
+
+All of the 32x32 sprites are stored side by side in one strip, graphics/sprites/atlas.png, so loading them is a single
+file read.  At load time the strip is copied once per light level with its colors already scaled, and the copies are
+stacked into one texture.  Drawing a sprite at some light is then a lookup of a region of that texture, instead of
+a separate image per sprite tinted with a color on every blit.
+
+The light levels are the ones the day/night cycle of DiscreteEnv goes through (0.5 to 1.0 in steps of 0.05); any
+other light is drawn at the nearest level.  To rebuild the strip after editing the individual sprites:
+    python -m arkania.atlas
+"""
+import os
+import numpy as np
+import pyglet
+from gym.envs.classic_control.rendering import Geom, Color
+
+SPRITE_DIR = os.path.join(os.path.dirname(__file__), 'graphics', 'sprites')
+ATLAS_FILE = os.path.join(SPRITE_DIR, 'atlas.png')
+SPRITE_SIZE = 32
+NUM_SPRITES = 29
+LIGHT_LEVELS = np.linspace(0.5, 1.0, 11)
+
+
+def image_to_array(image):
+    """
+    :return: <height x width x 4> uint8 RGBA array, bottom row first (pyglet's order)
+    """
+    data = image.get_image_data()
+    return np.frombuffer(data.get_data('RGBA', data.width * 4), dtype=np.uint8).reshape(data.height, data.width, 4)
+
+
+def array_to_image(pixels):
+    height, width = pixels.shape[:2]
+    return pyglet.image.ImageData(width, height, 'RGBA', np.ascontiguousarray(pixels).tobytes())
+
+
+def load_sprite_files(directory=SPRITE_DIR):
+    """
+    :return: the strip of all the sprites, built from the individual Simple_Tiles<i>.png files
+    """
+    sprites = [image_to_array(pyglet.image.load(os.path.join(directory, f"Simple_Tiles{i}.png")))
+               for i in range(1, NUM_SPRITES + 1)]
+    return np.concatenate(sprites, axis=1)
+
+
+def build_atlas_file(path=ATLAS_FILE, directory=SPRITE_DIR):
+    array_to_image(load_sprite_files(directory)).save(path)
+
+
+def lit_variants(strip, levels=LIGHT_LEVELS):
+    """
+    :return: one copy of the strip per light level, stacked vertically (level i in rows i * height ...), with the
+             colors scaled by the level and the alpha left alone
+    """
+    lit = np.repeat(strip[None], len(levels), axis=0).astype(np.float32)
+    lit[..., :3] *= np.asarray(levels, dtype=np.float32)[:, None, None, None]
+    return np.rint(lit).astype(np.uint8).reshape(-1, strip.shape[1], 4)
+
+
+class SpriteAtlas:
+    def __init__(self, path=ATLAS_FILE, levels=LIGHT_LEVELS):
+        if os.path.exists(path):
+            strip = image_to_array(pyglet.image.load(path))
+        else:
+            strip = load_sprite_files()
+        self.levels = np.asarray(levels, dtype=float)
+        self.image = array_to_image(lit_variants(strip, self.levels))
+        self._regions = {}
+        self._level_of = {}
+
+    @property
+    def regions(self):
+        """
+        regions[level][tile_id] of the texture in the current GL context.  The texture is made on first use in each
+        group of contexts that share objects, since windows do not always share textures (e.g. headless).
+        """
+        space = pyglet.gl.current_context.object_space
+        regions = self._regions.get(space)
+        if regions is None:
+            texture = self.image.create_texture(pyglet.image.Texture)
+            size = SPRITE_SIZE
+            regions = [[texture.get_region(i * size, level * size, size, size) for i in range(NUM_SPRITES)]
+                       for level in range(len(self.levels))]
+            self._regions[space] = regions
+        return regions
+
+    def level(self, light):
+        """
+        :return: index of the light level nearest to light
+        """
+        index = self._level_of.get(light)
+        if index is None:
+            index = int(np.argmin(np.abs(self.levels - light)))
+            self._level_of[light] = index
+        return index
+
+    def region(self, tile_id, light=1.0):
+        return self.regions[self.level(light)][int(tile_id)]
+
+
+_atlas = None
+
+
+def get_atlas():
+    """
+    :return: the atlas shared by every env in the process (loaded on first use)
+    """
+    global _atlas
+    if _atlas is None:
+        _atlas = SpriteAtlas()
+    return _atlas
+
+
+WHITE = Color((1.0, 1.0, 1.0, 1.0))
+
+
+class SpriteTile(Geom):
+    """
+    One sprite of the atlas, blitted at (x, y).  The light is already in the texture, so every tile shares one
+    white color.
+    """
+
+    def __init__(self, region, x, y, width, height):
+        self._color = WHITE
+        self.attrs = [WHITE]
+        self.img = region
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    def render1(self):
+        self.img.blit(self.x, self.y, width=self.width, height=self.height)
+
+
+if __name__ == "__main__":
+    build_atlas_file()
+    print(f"wrote {ATLAS_FILE}")
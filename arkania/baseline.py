@@ -0,0 +1,209 @@
+"""
+Scripted survival agent for SimpleEnv
+
+The agent keeps water and food up by walking to the nearest BEACH tile or ripe plant / food on the ground, picking it
+up and consuming it, and rests the rest of the time.  Walking is steered by distance fields: for every tile, the
+number of moves to the nearest target over tiles that are safe to stand on (never ROCK-WALL, WATER, DARK-FOREST or
+off the map).
+
+The distance between every pair of safe tiles is computed once per terrain (and again after set_tile changes a
+private one), with one BFS that grows from all of the tiles at once.  A distance field is then the minimum over the
+rows of its targets: the water field is fixed for a terrain, and the food field of an env is only rebuilt when its
+EntityRegistry reports a change to its grids or the env moves to another terrain.
+Actions for a whole batch of envs are chosen with array operations.
+"""
+import weakref
+import numpy as np
+from .actions import REST, MOVE_NORTH, MOVE_EAST, MOVE_SOUTH, MOVE_WEST, PICK_UP, PUT_DOWN, CONSUME, \
+    effective_energy
+from .entities import PLANT_RIPE
+from .simple_env import ROCK, FOREST, WATER, HAND_FOOD, HAND_WATER, HAND_STONE
+
+UNREACHABLE = np.iinfo(np.int16).max
+
+# (dx, dy) of the moves, in the order of the actions MOVE_NORTH, MOVE_EAST, MOVE_SOUTH, MOVE_WEST
+MOVE_ACTIONS = np.array([MOVE_NORTH, MOVE_EAST, MOVE_SOUTH, MOVE_WEST])
+MOVE_DX = np.array([0, 1, 0, -1])
+MOVE_DY = np.array([1, 0, -1, 0])
+
+
+def safe_tiles(tile_map):
+    return ~np.isin(tile_map, [ROCK, FOREST, WATER])
+
+
+def all_pairs_distances(safe):
+    """
+    :param safe: boolean <rows x columns> map of the tiles that can be walked on
+    :return: int16 <tiles x rows x columns>, [t, y, x] = number of moves from tile t (= y * columns + x) to (x, y)
+             over safe tiles, UNREACHABLE if there is no way (or either tile is not safe)
+    """
+    height, width = safe.shape
+    n = height * width
+    dist = np.full((n, height, width), UNREACHABLE, dtype=np.int16)
+    frontier = np.zeros((n, height, width), dtype=bool)
+    sources = np.flatnonzero(safe.ravel())
+    frontier[sources, sources // width, sources % width] = True
+    reached = frontier.copy()
+    step = 0
+    while frontier.any():
+        dist[frontier] = step
+        grown = np.zeros_like(frontier)
+        grown[:, 1:, :] |= frontier[:, :-1, :]
+        grown[:, :-1, :] |= frontier[:, 1:, :]
+        grown[:, :, 1:] |= frontier[:, :, :-1]
+        grown[:, :, :-1] |= frontier[:, :, 1:]
+        frontier = grown & safe & ~reached
+        reached |= frontier
+        step += 1
+    return dist
+
+
+# Terrain -> (its version, all-pairs distances, water field), dropped with the Terrain
+_fields = weakref.WeakKeyDictionary()
+
+
+def terrain_fields(terrain):
+    """
+    :return: the all-pairs distances of a Terrain and its distance field to the BEACH tiles, computed once per
+             Terrain and version
+    """
+    entry = _fields.get(terrain)
+    if entry is None or entry[0] != terrain.version:
+        distances = all_pairs_distances(safe_tiles(terrain.map))
+        entry = _fields[terrain] = (terrain.version, distances, distance_field(distances, terrain.beach))
+    return entry[1], entry[2]
+
+
+def distance_field(distances, targets):
+    """
+    :param targets: boolean <rows x columns> map of the targets
+    :return: int16 <rows x columns> number of moves to the nearest target
+    """
+    rows = distances[np.flatnonzero(targets.ravel())]
+    if len(rows) == 0:
+        return np.full(distances.shape[1:], UNREACHABLE, dtype=np.int16)
+    return rows.min(axis=0)
+
+
+class SurvivalPolicy:
+    """
+    Chooses the actions of a batch of SimpleEnv instances (such as SimpleVectorEnv.envs).
+
+    Each turn, in order of priority:
+      - consume what is in hand once that does not overflow water or food (put a stone down)
+      - rest when there is too little energy left to move
+      - when water or food is below `hungry`, go for whichever is lower: pick up when on a target, else move one
+        step down its distance field
+      - otherwise rest
+    """
+
+    def __init__(self, envs, hungry=70, min_energy=8):
+        self.envs = list(envs)
+        self.hungry = hungry
+        self.min_energy = min_energy
+        self.food_fields = np.full((len(self.envs), 18, 18), UNREACHABLE, dtype=np.int16)
+        self.water_fields = np.empty_like(self.food_fields)
+        self.dirty = np.ones(len(self.envs), dtype=bool)
+        # the Terrain and version each env's fields were computed for
+        self._terrains = [None] * len(self.envs)
+        self._versions = [None] * len(self.envs)
+        self._listeners = [self._listener(i) for i in range(len(self.envs))]
+        for env, listener in zip(self.envs, self._listeners):
+            env.entities.listeners.append(listener)
+
+    def _listener(self, i):
+        def changed(xs, ys):
+            self.dirty[i] = True
+        return changed
+
+    def _refresh(self):
+        for i, env in enumerate(self.envs):
+            terrain = env.terrain
+            if terrain is not self._terrains[i] or terrain.version != self._versions[i]:
+                self._terrains[i], self._versions[i] = terrain, terrain.version
+                _, self.water_fields[i] = terrain_fields(terrain)
+                self.dirty[i] = True
+        for i in np.flatnonzero(self.dirty):
+            env = self.envs[i]
+            reg = env.entities
+            distances, _ = terrain_fields(env.terrain)
+            self.food_fields[i] = distance_field(distances, (reg.plant_stage == PLANT_RIPE) | (reg.food_count > 0))
+        self.dirty[:] = False
+
+    def __call__(self, obs=None):
+        """
+        :param obs: ignored, the policy reads the envs directly
+        :return: int array of one action per env
+        """
+        self._refresh()
+        n = len(self.envs)
+        x = np.empty(n, dtype=np.intp)
+        y = np.empty(n, dtype=np.intp)
+        vitals = np.empty((n, 4))
+        in_hand = np.empty(n, dtype=np.intp)
+        for i, env in enumerate(self.envs):
+            agent = env.agent
+            x[i], y[i] = agent.x, agent.y
+            vitals[i] = agent.energy, agent.food, agent.water, agent.health
+            in_hand[i] = agent.what_is_in_hand()
+        return self.decide(x, y, vitals[:, 0], vitals[:, 1], vitals[:, 2], in_hand)
+
+    def decide(self, x, y, energy, food, water, in_hand):
+        """
+        The vectorized part of __call__, using the distance fields of the envs
+        """
+        n = len(x)
+        # food and water fall by 1 in Agent.step() before the action is taken
+        food, water = food - 1, water - 1
+        energy = effective_energy(energy, food + 1, water + 1)
+        actions = np.full(n, REST)
+
+        want_water = water < food
+        fields = np.where(want_water[:, None, None], self.water_fields, self.food_fields)
+        padded = np.full((n, 20, 20), UNREACHABLE, dtype=np.int16)
+        padded[:, 1:-1, 1:-1] = fields
+        env = np.arange(n)
+        here = padded[env, y + 1, x + 1]
+        around = padded[env[:, None], y[:, None] + 1 + MOVE_DY, x[:, None] + 1 + MOVE_DX]
+        best = around.argmin(axis=1)
+        step = MOVE_ACTIONS[best]
+        closer = around[env, best] < here
+
+        hungry = np.minimum(food, water) < self.hungry
+        empty = in_hand == 0
+        go = hungry & empty & (energy >= 2) & closer & (here != 0)
+        pick = hungry & empty & (here == 0) & (energy >= 1)
+        actions[go] = step[go]
+        actions[pick] = PICK_UP
+
+        actions[energy < self.min_energy] = REST
+        # consuming costs no energy
+        actions[((in_hand == HAND_WATER) & (water + 20 <= 100)) | ((in_hand == HAND_FOOD) & (food + 35 <= 100))] = \
+            CONSUME
+        actions[(in_hand == HAND_STONE) & (energy >= 1)] = PUT_DOWN
+        return actions
+
+    def detach(self):
+        for env, listener in zip(self.envs, self._listeners):
+            env.entities.listeners.remove(listener)
+
+
+if __name__ == "__main__":
+    import time
+    from .vector_env import SimpleVectorEnv
+
+    venv = SimpleVectorEnv(16)
+    venv.reset()
+    policy = SurvivalPolicy(venv.envs)
+    steps = 3000
+    lengths = np.zeros(venv.num_envs, dtype=int)
+    finished = []
+    t0 = time.perf_counter()
+    for _ in range(steps):
+        _, _, dones, _ = venv.step(policy())
+        lengths += 1
+        finished.extend(lengths[dones])
+        lengths[dones] = 0
+    elapsed = time.perf_counter() - t0
+    print(f"{steps * venv.num_envs / elapsed:.0f} env steps/sec, {len(finished)} deaths in {steps} turns x "
+          f"{venv.num_envs} envs" + (f", mean episode {np.mean(finished):.0f} turns" if finished else ""))
@@ -0,0 +1,106 @@
+"""
+Communication between agents with single-letter "words"
+
+Every tick, each agent may say one symbol: SILENT (0), or 1 to 26 for 'a' to 'z'.  Its neighbours hear it when they
+can see the tile it stands on: an agent's hearing is a matrix aligned with its sight matrix, holding the symbol said
+on each tile of its sight window (its own included), or SILENT.
+
+Nothing is kept per pair of agents.  A SymbolChannel is an occupancy grid of what is said where, allocated once: each
+tick it is cleared, every speaking agent writes its symbol on its tile (the agent with the lowest index is heard
+when several speak on the same tile), and each listener's matrix is one window gathered out of the grid.  The cost
+grows with the number of agents, not with the number of pairs of agents.
+"""
+import numpy as np
+from .vision import windows
+
+SILENT = 0
+ALPHABET = 26
+
+
+def symbol_of(letter):
+    """
+    :return: the symbol of a letter 'a' to 'z' (or SILENT for None)
+    """
+    if letter is None:
+        return SILENT
+    code = ord(letter.lower()) - ord('a') + 1
+    if not 1 <= code <= ALPHABET:
+        raise ValueError(f"symbols are the letters 'a' to 'z', got {letter!r}")
+    return code
+
+
+def letter_of(symbol):
+    """
+    :return: the letter of a symbol, or '.' for SILENT
+    """
+    return '.' if symbol == SILENT else chr(ord('a') + int(symbol) - 1)
+
+
+def hearing_size(radius):
+    return (2 * radius + 1) ** 2
+
+
+class SymbolChannel:
+    """
+    :param num_agents: agents are numbered 0 .. num_agents - 1
+    :param shape: (rows, columns) of the grid, indexed [y, x] (padded by the caller if listeners near its edge need
+                  a full window)
+    """
+
+    def __init__(self, num_agents, shape):
+        self.num_agents = num_agents
+        # what is said on each tile, and the index of the agent saying it (num_agents where nobody does)
+        self.said = np.zeros(shape, dtype=np.int8)
+        self.speaker = np.full(shape, num_agents, dtype=np.int32)
+        self._offsets = {}
+
+    def clear(self, region=Ellipsis):
+        """
+        Silence the grid (or part of it) for a new tick
+        """
+        self.said[region] = SILENT
+        self.speaker[region] = self.num_agents
+
+    def speak(self, ids, xs, ys, symbols):
+        """
+        :param ids: indices of the agents
+        :param xs: their positions in the grid
+        :param symbols: what they say, SILENT for nothing
+        """
+        symbols = np.asarray(symbols)
+        talking = symbols != SILENT
+        ids, xs, ys, symbols = np.asarray(ids)[talking], np.asarray(xs)[talking], np.asarray(ys)[talking], \
+            symbols[talking]
+        # where several agents talk on one tile, any of them is written first; the others then take the tile if
+        # their index is lower, so the result does not depend on the order of the writes
+        self.speaker[ys, xs] = ids
+        lost = self.speaker[ys, xs] != ids
+        if lost.any():
+            np.minimum.at(self.speaker, (ys[lost], xs[lost]), ids[lost])
+            won = self.speaker[ys, xs] == ids
+            ys, xs, symbols = ys[won], xs[won], symbols[won]
+        self.said[ys, xs] = symbols
+
+    def hear(self, xs, ys, radius):
+        """
+        :param xs: the positions of the listeners in the grid, at least `radius` tiles from its edge
+        :return: int8 <n x 2R+1 x 2R+1> what each listener hears, north row first (as its sight matrix)
+        """
+        width = self.said.shape[1]
+        offsets = self._offsets.get(radius)
+        if offsets is None:
+            span = np.arange(-radius, radius + 1)
+            offsets = self._offsets[radius] = (-span[:, None] * width + span[None, :]).ravel()
+        flat = (np.asarray(ys) * width + np.asarray(xs))[:, None] + offsets
+        side = 2 * radius + 1
+        return np.take(self.said, flat).reshape(-1, side, side)
+
+
+if __name__ == "__main__":
+    channel = SymbolChannel(4, (9, 9))
+    xs, ys = np.array([4, 5, 4, 8]), np.array([4, 4, 6, 8])
+    symbols = [symbol_of(c) for c in 'hiyz']
+    channel.speak(np.arange(4), xs, ys, symbols)
+    heard = channel.hear(xs[:1], ys[:1], 2)[0]
+    print("agent 0 at (4, 4) hears ('z' at (8, 8) is out of range):")
+    print('\n'.join(' '.join(letter_of(s) for s in row) for row in heard))
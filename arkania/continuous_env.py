@@ -1,16 +1,66 @@
 """
 The continuous version
-TODO: Implement this later... eventually
+
+Agents, predators, plants and stones live at float positions in a square world of `size` x `size` tiles, with y
+pointing north as in SimpleEnv.  Every entity is a row in a set of numpy arrays (position, velocity, kind, plant
+stage) and all motion is integrated as one vectorized update per turn.  Proximity questions (what can be picked up,
+what collides, what is in sight) go through a SpatialHash rebuilt once per turn, so they cost a handful of candidates
+per entity instead of a pairwise check against every other entity.
 """
 
 import numpy as np
 import gym
+from .entities import KIND_PLANT, KIND_STONE, PLANT_RIPE, PLANT_GROW_TICKS
+from .sensors import cast_rays, ray_directions
+from .spatial import SpatialHash
 # from gym.utils import colorize, EzPickle
 
+KIND_AGENT = 4
+KIND_PREDATOR = 5
+
+WORLD_SIZE = 18.0
+BODY_RADIUS = 0.3           # agents, predators and stones push each other apart closer than 2 x this
+PICK_RADIUS = 0.6           # reach of the agent when eating
+VISION_RADIUS = 5.0
+VISION_SLOTS = 16           # number of nearest entities reported in the state
+CELL_SIZE = 1.0
+
+AGENT_ACCEL = 0.25
+AGENT_MAX_SPEED = 1.0
+PREDATOR_SPEED = 0.6
+PREDATOR_SIGHT = 6.0
+DAMPING = 0.8               # fraction of the velocity kept from one turn to the next
+PREDATOR_DAMAGE = 10.0
+FOOD_VALUE = 30.0
+
 
 class ContinuousEnv(gym.Env):
+    """
+    Action-Space - array of 3 floats
+      ax, ay   - acceleration of the agent, each in [-1, 1]
+      interact - when > 0.5, eat the nearest ripe plant within PICK_RADIUS
+
+    State-Space - a dictionary:
+      health, food - as in SimpleEnv (0 to 100)
+      position - (x, y) of the agent
+      velocity - (vx, vy) of the agent
+      nearby - <VISION_SLOTS x 4> float32 rows (dx, dy, kind, stage) of the nearest entities within VISION_RADIUS,
+               nearest first, relative to the agent; unused rows have kind KIND_NONE (0)
+      rays - (only with num_rays) <num_rays x 2> float32 rows (distance, hit kind) of rays cast evenly around the
+             agent, the first one pointing east, up to VISION_RADIUS; the edge of the world is hit kind HIT_WALL (6)
+
+    Rewards are 1 for each turn survived and -1000 for death, as in SimpleEnv.
+    """
 
-    def __init__(self):
+    def __init__(self, num_plants=12, num_stones=0, num_predators=0, size=WORLD_SIZE, seed=2021, num_rays=0):
+        self.num_plants = num_plants
+        self.num_stones = num_stones
+        self.num_predators = num_predators
+        self.size = size
+        self.seed = seed
+        self.num_rays = num_rays
+        self.rng = None
+        self.hash = SpatialHash(size, size, CELL_SIZE)
         self.reset()
 
     def _destroy(self):
@@ -18,7 +68,11 @@ class ContinuousEnv(gym.Env):
         clean up memory and resources
         :return:
         """
-        pass
+        self.pos = np.zeros((0, 2), dtype=np.float32)
+        self.vel = np.zeros((0, 2), dtype=np.float32)
+        self.kind = np.zeros(0, dtype=np.uint8)
+        self.stage = np.zeros(0, dtype=np.int8)
+        self.counter = np.zeros(0, dtype=np.int16)
 
     def reset(self):
         """
@@ -26,7 +80,119 @@ class ContinuousEnv(gym.Env):
         :return:
         """
         self._destroy()
-        # initialize world
+        self.rng = np.random.default_rng(self.seed)
+        # initialize world: the agent is entity 0, then predators, stones and plants
+        kinds = ([KIND_AGENT] + [KIND_PREDATOR] * self.num_predators + [KIND_STONE] * self.num_stones +
+                 [KIND_PLANT] * self.num_plants)
+        n = len(kinds)
+        self.kind = np.array(kinds, dtype=np.uint8)
+        self.pos = self.rng.uniform(0, self.size, (n, 2)).astype(np.float32)
+        self.pos[0] = self.size / 2
+        self.vel = np.zeros((n, 2), dtype=np.float32)
+        self.stage = np.where(self.kind == KIND_PLANT, self.rng.integers(0, PLANT_RIPE + 1, n), 0).astype(np.int8)
+        self.counter = np.zeros(n, dtype=np.int16)
+        self.predators = np.flatnonzero(self.kind == KIND_PREDATOR)
+        self.plants = np.flatnonzero(self.kind == KIND_PLANT)
+        self.solid = np.isin(self.kind, [KIND_AGENT, KIND_PREDATOR, KIND_STONE])
+        self.moving = self.kind != KIND_PLANT
+
+        self.health = 100.0
+        self.food = 100.0
+        self.age = 0
+        self.hash.build(self.pos)
+        return self._get_state()
+
+    #-----------------------------------------------------------------------------------------------
+    def _steer(self, action):
+        action = np.asarray(action, dtype=np.float32)
+        self.vel[0] += AGENT_ACCEL * np.clip(action[:2], -1, 1)
+        speed = np.hypot(*self.vel[0])
+        if speed > AGENT_MAX_SPEED:
+            self.vel[0] *= AGENT_MAX_SPEED / speed
+
+        preds = self.predators
+        if len(preds):
+            to_agent = self.pos[0] - self.pos[preds]
+            dist = np.maximum(np.hypot(to_agent[:, 0], to_agent[:, 1]), 1e-6)
+            wander = self.rng.uniform(-1, 1, (len(preds), 2)).astype(np.float32)
+            desired = np.where((dist < PREDATOR_SIGHT)[:, None], to_agent / dist[:, None], wander)
+            self.vel[preds] = PREDATOR_SPEED * desired
+
+    def _integrate(self):
+        moving = self.moving
+        self.pos[moving] += self.vel[moving]
+        self.vel[moving] *= DAMPING
+        # bounce off the edges of the world
+        low = self.pos < 0
+        high = self.pos > self.size
+        self.pos[low] = -self.pos[low]
+        self.pos[high] = 2 * self.size - self.pos[high]
+        self.vel[low | high] *= -1
+        np.clip(self.pos, 0, self.size, out=self.pos)
+
+    def _collide(self):
+        """
+        Push overlapping solid entities apart, each by half of the overlap
+        """
+        i, j = self.hash.pairs(2 * BODY_RADIUS, self.solid)
+        if len(i) == 0:
+            return
+        d = self.pos[j] - self.pos[i]
+        dist = np.maximum(np.hypot(d[:, 0], d[:, 1]), 1e-6)
+        push = ((2 * BODY_RADIUS - dist) / (2 * dist))[:, None] * d
+        np.add.at(self.pos, i, -push)
+        np.add.at(self.pos, j, push)
+        np.clip(self.pos, 0, self.size, out=self.pos)
+
+    def _grow_plants(self):
+        plants = self.plants
+        counter = self.counter[plants] + 1
+        grown = counter > PLANT_GROW_TICKS
+        counter[grown] = 0
+        self.counter[plants] = counter
+        grown = plants[grown]
+        self.stage[grown] = np.minimum(self.stage[grown] + 1, PLANT_RIPE)
+
+    def _interact(self):
+        near = self.hash.query(self.pos[0, 0], self.pos[0, 1], PICK_RADIUS)
+        edible = near[(self.kind[near] == KIND_PLANT) & (self.stage[near] == PLANT_RIPE)]
+        if len(edible) == 0:
+            return
+        d = self.pos[edible] - self.pos[0]
+        item = edible[np.argmin((d * d).sum(axis=1))]
+        self.food = min(100.0, self.food + FOOD_VALUE)
+        self.stage[item] = 0
+        self.counter[item] = 0
+
+    def get_rays(self, agents=(0,), num_rays=None):
+        """
+        Ray-cast vision for several entities at once (see sensors.py)
+        :param agents: entity indices to cast from
+        :return: <len(agents) x K> distances and hit kinds
+        """
+        agents = np.asarray(agents)
+        dirs = ray_directions(num_rays or self.num_rays)
+        return cast_rays(self.hash, self.kind, self.pos[agents], dirs, VISION_RADIUS, BODY_RADIUS, self.size,
+                         skip=agents)
+
+    def _get_state(self):
+        near = self.hash.query(self.pos[0, 0], self.pos[0, 1], VISION_RADIUS)
+        near = near[near != 0]
+        d = self.pos[near] - self.pos[0]
+        closest = np.argsort((d * d).sum(axis=1), kind='stable')[:VISION_SLOTS]
+        nearby = np.zeros((VISION_SLOTS, 4), dtype=np.float32)
+        nearby[:len(closest), :2] = d[closest]
+        nearby[:len(closest), 2] = self.kind[near[closest]]
+        nearby[:len(closest), 3] = self.stage[near[closest]]
+        state = {'health': self.health,
+                 'food': self.food,
+                 'position': self.pos[0].copy(),
+                 'velocity': self.vel[0].copy(),
+                 'nearby': nearby}
+        if self.num_rays:
+            dist, hit = self.get_rays()
+            state['rays'] = np.stack([dist[0], hit[0]], axis=1).astype(np.float32)
+        return state
 
     def step(self, action):
         """
@@ -34,12 +200,42 @@ class ContinuousEnv(gym.Env):
         :param action:
         :return:
         """
-        state = [1, 2, 3]
-        reward = 0
+        self.age += 1
+        self._steer(action)
+        self._integrate()
+        self.hash.build(self.pos)
+        self._collide()
+        self.hash.build(self.pos)
+        self._grow_plants()
+
+        hits = self.hash.query(self.pos[0, 0], self.pos[0, 1], 2 * BODY_RADIUS)
+        self.health -= PREDATOR_DAMAGE * np.count_nonzero(self.kind[hits] == KIND_PREDATOR)
+        if action[2] > 0.5:
+            self._interact()
+        self.food -= 0.1
+        if self.food <= 0:
+            self.food = 0.0
+            self.health -= 25 / 80
+
+        state = self._get_state()
+        reward = 1
         done = False
+        if self.health <= 0:
+            reward = -1000
+            done = True
         debug = {}
-        return np.array(state), reward, done, debug
+        return state, reward, done, debug
 
     def render(self, mode='human'):
         pass
 
+
+if __name__ == "__main__":
+    env = ContinuousEnv(num_plants=40, num_stones=10, num_predators=2)
+    total = 0
+    for t in range(500):
+        state, reward, done, _ = env.step(np.array([np.cos(t / 20), np.sin(t / 20), 1.0]))
+        total += reward
+        if done:
+            break
+    print(f"survived {t + 1} turns, reward {total}, health {state['health']:.1f}, food {state['food']:.1f}")
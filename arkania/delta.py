@@ -0,0 +1,209 @@
+"""
+Delta compression of SimpleEnv observations
+
+Observations are handled in the flat layout of vector_env.flatten_state():
+    [health, energy, food, water, in_hand, sight[0, 0], ... sight[2N, 2N]]
+The first five values are the scalars, the rest are the sight cells.
+
+Every record starts with (kind u8, frame index u32) and is one of
+    KEYFRAME  scalars f32[5], sight i8[(2N+1)^2]
+    DELTA     changed-scalars bitmask u8, f32 for each changed scalar, number of runs u16,
+              runs (start u16, length u16)[runs], the new values of the cells in every run i8[sum of lengths]
+A DELTA record only makes sense applied to the observation of the frame right before it, so a keyframe is written
+every `keyframe_interval` frames (and whenever one is asked for), which is where decoding can start from.
+"""
+import struct
+from collections.abc import Mapping
+import numpy as np
+from .vector_env import VITALS, SIGHT_SIZE, observation_size, flatten_state
+
+KEYFRAME = 0
+DELTA = 1
+
+RECORD = struct.Struct('<BI')
+RUNS = struct.Struct('<H')
+LENGTH = struct.Struct('<I')
+
+NUM_SCALARS = len(VITALS) + 1
+# the scalar indices whose bit is set, for every changed-scalars bitmask
+SCALARS = [[i for i in range(NUM_SCALARS) if mask >> i & 1] for mask in range(1 << NUM_SCALARS)]
+
+
+def changed_runs(cells):
+    """
+    :param cells: increasing list of the indices of the cells that changed
+    :return: list of (start, length) of the runs of consecutive cells
+    """
+    runs = []
+    for c in cells:
+        if runs and runs[-1][0] + runs[-1][1] == c:
+            runs[-1][1] += 1
+        else:
+            runs.append([c, 1])
+    return runs
+
+
+class DeltaEncoder:
+    def __init__(self, keyframe_interval=100, sight_size=SIGHT_SIZE):
+        self.keyframe_interval = keyframe_interval
+        self.size = observation_size(sight_size)
+        self.index = 0
+        self.prev = None
+        self._row = np.empty(self.size, dtype=np.float32)
+
+    def keyframe(self):
+        """
+        Make the next record a keyframe (e.g. at the start of an episode)
+        """
+        self.prev = None
+
+    def encode(self, state):
+        """
+        :param state: a SimpleEnv state dictionary, or an observation row in the flat layout
+        :return: the record for this observation, as bytes
+        """
+        if isinstance(state, Mapping):
+            row = flatten_state(state, self._row)
+        else:
+            row = np.asarray(state, dtype=np.float32)
+        index = self.index
+        self.index += 1
+        if self.prev is None or index % self.keyframe_interval == 0:
+            self.prev = row.copy()
+            return b''.join([RECORD.pack(KEYFRAME, index), row[:NUM_SCALARS].astype('<f4').tobytes(),
+                             row[NUM_SCALARS:].astype(np.int8).tobytes()])
+
+        prev = self.prev
+        changed = np.flatnonzero(prev != row)
+        prev[:] = row
+        split = np.searchsorted(changed, NUM_SCALARS)
+        scalars, cells = changed[:split], changed[split:] - NUM_SCALARS
+        mask = 0
+        for i in scalars.tolist():
+            mask |= 1 << i
+        runs = changed_runs(cells.tolist())
+        # the cells of the runs, in order, are exactly the changed cells
+        return b''.join([RECORD.pack(DELTA, index), bytes([mask]), row[scalars].astype('<f4').tobytes(),
+                         RUNS.pack(len(runs)), np.array(runs, dtype='<u2').tobytes(),
+                         row[NUM_SCALARS + cells].astype(np.int8).tobytes()])
+
+
+class DeltaDecoder:
+    def __init__(self, sight_size=SIGHT_SIZE):
+        self.size = observation_size(sight_size)
+        self.index = None
+        self.row = np.zeros(self.size, dtype=np.float32)
+
+    def decode(self, record):
+        """
+        Apply one record
+        :return: the observation row (re-used by the next call)
+        """
+        kind, index = RECORD.unpack_from(record)
+        offset = RECORD.size
+        row = self.row
+        if kind == KEYFRAME:
+            row[:NUM_SCALARS] = np.frombuffer(record, '<f4', NUM_SCALARS, offset)
+            offset += 4 * NUM_SCALARS
+            row[NUM_SCALARS:] = np.frombuffer(record, np.int8, self.size - NUM_SCALARS, offset)
+        elif kind == DELTA:
+            if self.index is None or index != self.index + 1:
+                raise ValueError(f"delta for frame {index} does not follow frame {self.index}")
+            mask = record[offset]
+            offset += 1
+            scalars = SCALARS[mask]
+            row[scalars] = np.frombuffer(record, '<f4', len(scalars), offset)
+            offset += 4 * len(scalars)
+            num_runs, = RUNS.unpack_from(record, offset)
+            offset += RUNS.size
+            runs = np.frombuffer(record, '<u2', 2 * num_runs, offset).reshape(num_runs, 2).tolist()
+            offset += 4 * num_runs
+            cells = [NUM_SCALARS + c for start, length in runs for c in range(start, start + length)]
+            row[cells] = np.frombuffer(record, np.int8, len(cells), offset)
+        else:
+            raise ValueError(f"unknown record kind {kind}")
+        self.index = index
+        return row
+
+    def state(self):
+        """
+        :return: the current observation as a state dictionary (the keys of SimpleEnv's state that are encoded)
+        """
+        state = {key: self.row[i] for i, key in enumerate(VITALS)}
+        state['in_hand'] = int(self.row[len(VITALS)])
+        side = int(round(np.sqrt(self.size - NUM_SCALARS)))
+        state['sight'] = self.row[NUM_SCALARS:].astype(int).reshape(side, side)
+        return state
+
+
+#-----------------------------------------------------------------------------------------------
+class DeltaLog:
+    """
+    A recorded stream of observations with random access: log[i] decodes from the keyframe at or before frame i.
+    """
+
+    def __init__(self, keyframe_interval=100, sight_size=SIGHT_SIZE):
+        self.sight_size = sight_size
+        self.encoder = DeltaEncoder(keyframe_interval, sight_size)
+        self.records = []
+        self.keyframes = []
+
+    def __len__(self):
+        return len(self.records)
+
+    def nbytes(self):
+        return sum(len(r) for r in self.records)
+
+    def append(self, state):
+        record = self.encoder.encode(state)
+        if record[0] == KEYFRAME:
+            self.keyframes.append(len(self.records))
+        self.records.append(record)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self.records)
+        if not 0 <= i < len(self.records):
+            raise IndexError(i)
+        start = self.keyframes[np.searchsorted(self.keyframes, i, side='right') - 1]
+        decoder = DeltaDecoder(self.sight_size)
+        for record in self.records[start:i + 1]:
+            row = decoder.decode(record)
+        return row.copy()
+
+    def tobytes(self):
+        return b''.join(LENGTH.pack(len(r)) + r for r in self.records)
+
+    @classmethod
+    def frombytes(cls, data, keyframe_interval=100, sight_size=SIGHT_SIZE):
+        log = cls(keyframe_interval, sight_size)
+        offset = 0
+        while offset < len(data):
+            size, = LENGTH.unpack_from(data, offset)
+            record = bytes(data[offset + LENGTH.size:offset + LENGTH.size + size])
+            offset += LENGTH.size + size
+            if record[0] == KEYFRAME:
+                log.keyframes.append(len(log.records))
+            log.records.append(record)
+        log.encoder.index = len(log.records)
+        return log
+
+
+if __name__ == "__main__":
+    import random
+    from .simple_env import SimpleEnv
+
+    env = SimpleEnv()
+    log = DeltaLog()
+    state = env.reset()
+    log.append(state)
+    full = [flatten_state(state)]
+    for _ in range(1000):
+        state, _, done, _ = env.step(random.randrange(8))
+        log.append(state)
+        full.append(flatten_state(state))
+        if done:
+            break
+    assert all(np.array_equal(log[i], full[i]) for i in range(len(log)))
+    keyframe_bytes = RECORD.size + 4 * NUM_SCALARS + full[0].size - NUM_SCALARS
+    print(f"{len(log)} frames: {log.nbytes()} bytes as deltas, {len(log) * keyframe_bytes} bytes as keyframes")
@@ -14,6 +14,7 @@ import time
 from gym.envs.classic_control.rendering import Geom, Viewer
 import pyglet
 from pyglet.gl import *
+from .atlas import get_atlas, SpriteTile
 # from gym.utils import colorize, EzPickle
 
 VIEWPORT_W = 800
@@ -55,27 +56,17 @@ turn_left = [WEST, NORTH, EAST, SOUTH]
 turn_right = [EAST, SOUTH, WEST, NORTH]
 
 
-class Tile(Geom):
-    def __init__(self, subimg, x, y, width, height, light=1.0):
-        super().__init__()
-        self.width = width
-        self.height = height
-        self.x = x
-        self.y = y
-        self.set_color(light, light, light)
-        self.flip = False
-        self.img = subimg
-
-    def render1(self):
-        self.img.blit(self.x, self.y, width=self.width, height=self.height)
-
-
 class Tileset:
+    """
+    The sprites, as regions of the atlas shared by all the envs (see atlas.py)
+    """
+
     def __init__(self):
-        self.tiles = []
-        for i in range(1, 25 + 1):
-            fname = f"graphics/sprites/Simple_Tiles{i}.png"
-            self.tiles.append(pyglet.image.load(fname))
+        self.atlas = get_atlas()
+
+    @property
+    def tiles(self):
+        return self.atlas.regions[-1]
 
     def draw(self, viewer, tile_id, x, y, offset_x=0, offset_y=0, light=1.0):
         """
@@ -89,8 +80,8 @@ class Tileset:
         :param light: the brightness of light
         :return: N/A
         """
-        tile_img = self.tiles[int(tile_id)]
-        viewer.add_onetime(Tile(tile_img, 12 + x * 32 + offset_x, 12 + y * 32 + offset_y, 32, 32, light))
+        region = self.atlas.region(tile_id, light)
+        viewer.add_onetime(SpriteTile(region, 12 + x * 32 + offset_x, 12 + y * 32 + offset_y, 32, 32))
 
 
 class Stone:
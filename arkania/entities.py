@@ -0,0 +1,288 @@
+"""
+Struct-of-arrays storage for the items that live in an Arkania world (plants, food and stones)
+
+Every entity is a slot (row) in a set of typed numpy columns instead of a python object with its own __dict__.
+Slots freed by consuming or destroying an item are recycled through a free-list, so harvesting food over and
+over again does not grow the columns.  The registry also keeps per-tile occupancy grids, so asking "what is on
+this tile?" does not require a scan over every entity.
+"""
+import numpy as np
+
+KIND_NONE = 0
+KIND_PLANT = 1
+KIND_FOOD = 2
+KIND_STONE = 3
+
+NOT_HELD = -1
+OFF_MAP = -1
+
+PLANT_RIPE = 3
+PLANT_GROW_TICKS = 50
+
+
+class EntityRegistry:
+    """
+    Columns (indexed by slot):
+      kind    - KIND_NONE for a free slot, otherwise KIND_PLANT / KIND_FOOD / KIND_STONE
+      uid     - the id handed out when the entity was created
+      x, y    - position in the world, or OFF_MAP (-1) while the item is held
+      stage   - plant growth stage (0 to 3)
+      counter - plant growth counter
+      vx, vy  - velocity of a thrown stone
+      in_air  - number of turns a thrown stone remains in the air
+      held_by - uid of the agent holding the item, or NOT_HELD (-1)
+
+    Grids (indexed by [y, x]):
+      plant_stage - stage of the plant on the tile, -1 if there is none
+      food_count  - number of food items lying on the tile
+      stone_count - number of stones lying on the tile
+
+    Callables in `listeners` are called as listener(xs, ys) with arrays of the tiles whose grid values just changed,
+    so caches derived from the grids can be updated incrementally.  clear() does not notify them.
+    """
+
+    def __init__(self, env=None, width=18, height=18, capacity=64):
+        self.env = env
+        self.width = width
+        self.height = height
+        self.kind = np.zeros(capacity, dtype=np.uint8)
+        self.uid = np.zeros(capacity, dtype=np.int32)
+        self.x = np.full(capacity, OFF_MAP, dtype=np.int16)
+        self.y = np.full(capacity, OFF_MAP, dtype=np.int16)
+        self.stage = np.zeros(capacity, dtype=np.int8)
+        self.counter = np.zeros(capacity, dtype=np.int16)
+        self.vx = np.zeros(capacity, dtype=np.int8)
+        self.vy = np.zeros(capacity, dtype=np.int8)
+        self.in_air = np.zeros(capacity, dtype=np.int8)
+        self.held_by = np.full(capacity, NOT_HELD, dtype=np.int32)
+        self.plant_stage = np.full((height, width), -1, dtype=np.int8)
+        self.food_count = np.zeros((height, width), dtype=np.int16)
+        self.stone_count = np.zeros((height, width), dtype=np.int16)
+        self.count = 0
+        self._high_water = 0
+        self._free = []
+        self._plants = None
+        self.listeners = []
+
+    @property
+    def capacity(self):
+        return len(self.kind)
+
+    def nbytes(self):
+        """
+        :return: bytes used by the columns and the grids
+        """
+        columns = [self.kind, self.uid, self.x, self.y, self.stage, self.counter, self.vx, self.vy, self.in_air,
+                   self.held_by, self.plant_stage, self.food_count, self.stone_count]
+        return sum(c.nbytes for c in columns)
+
+    def bind_grids(self, plant_stage, food_count, stone_count):
+        """
+        Keep the grids in the given arrays from now on (such as rows of arrays holding the grids of a batch of envs),
+        starting from their current contents
+        """
+        plant_stage[...] = self.plant_stage
+        food_count[...] = self.food_count
+        stone_count[...] = self.stone_count
+        self.plant_stage, self.food_count, self.stone_count = plant_stage, food_count, stone_count
+
+    def clear(self):
+        """
+        Remove every entity, keeping the allocated columns for re-use
+        """
+        self.kind[:] = KIND_NONE
+        self.x[:] = OFF_MAP
+        self.y[:] = OFF_MAP
+        self.held_by[:] = NOT_HELD
+        self.plant_stage[:] = -1
+        self.food_count[:] = 0
+        self.stone_count[:] = 0
+        self.count = 0
+        self._high_water = 0
+        self._free = []
+        self._plants = None
+
+    def _grow(self):
+        old = self.capacity
+        new = max(2 * old, 16)
+        for name, fill in [('kind', KIND_NONE), ('uid', 0), ('x', OFF_MAP), ('y', OFF_MAP), ('stage', 0),
+                           ('counter', 0), ('vx', 0), ('vy', 0), ('in_air', 0), ('held_by', NOT_HELD)]:
+            col = getattr(self, name)
+            bigger = np.full(new, fill, dtype=col.dtype)
+            bigger[:old] = col
+            setattr(self, name, bigger)
+
+    #-----------------------------------------------------------------------------------------------
+    def add(self, kind, uid, x, y, stage=0, held_by=NOT_HELD):
+        """
+        Allocate a slot (re-using a freed one when possible) and return its index
+        """
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._high_water == self.capacity:
+                self._grow()
+            slot = self._high_water
+            self._high_water += 1
+        self.kind[slot] = kind
+        self.uid[slot] = uid
+        self.x[slot] = x
+        self.y[slot] = y
+        self.stage[slot] = stage
+        self.counter[slot] = 0
+        self.vx[slot] = 0
+        self.vy[slot] = 0
+        self.in_air[slot] = 0
+        self.held_by[slot] = held_by
+        self.count += 1
+        if kind == KIND_PLANT:
+            self._plants = None
+        self._place(slot)
+        return slot
+
+    def remove(self, slot):
+        """
+        Free a slot so it can be re-used by the next call to add()
+        """
+        self._lift(slot)
+        if self.kind[slot] == KIND_PLANT:
+            self._plants = None
+        self.kind[slot] = KIND_NONE
+        self.x[slot] = OFF_MAP
+        self.y[slot] = OFF_MAP
+        self.held_by[slot] = NOT_HELD
+        self.count -= 1
+        self._free.append(slot)
+
+    def move(self, slot, x, y):
+        self._lift(slot)
+        self.x[slot] = x
+        self.y[slot] = y
+        self._place(slot)
+
+    def hold(self, slot, holder_uid):
+        """
+        Take an item off the ground and into the hand of an agent
+        """
+        self._lift(slot)
+        self.x[slot] = OFF_MAP
+        self.y[slot] = OFF_MAP
+        self.held_by[slot] = holder_uid
+
+    def drop(self, slot, x, y):
+        """
+        Put a held item back on the ground
+        """
+        self.held_by[slot] = NOT_HELD
+        self.x[slot] = x
+        self.y[slot] = y
+        self._place(slot)
+
+    def set_stage(self, slot, stage, counter=0):
+        self.stage[slot] = stage
+        self.counter[slot] = counter
+        if self.kind[slot] == KIND_PLANT and self._on_map(slot):
+            self.plant_stage[self.y[slot], self.x[slot]] = stage
+            self._changed(self.x[slot], self.y[slot])
+
+    #-----------------------------------------------------------------------------------------------
+    def _changed(self, xs, ys):
+        if self.listeners:
+            xs, ys = np.atleast_1d(xs), np.atleast_1d(ys)
+            for listener in self.listeners:
+                listener(xs, ys)
+
+    def _on_map(self, slot):
+        x, y = self.x[slot], self.y[slot]
+        return self.held_by[slot] == NOT_HELD and 0 <= x < self.width and 0 <= y < self.height
+
+    def _place(self, slot):
+        if not self._on_map(slot):
+            return
+        x, y = self.x[slot], self.y[slot]
+        kind = self.kind[slot]
+        if kind == KIND_PLANT:
+            self.plant_stage[y, x] = self.stage[slot]
+        elif kind == KIND_FOOD:
+            self.food_count[y, x] += 1
+        elif kind == KIND_STONE:
+            self.stone_count[y, x] += 1
+        self._changed(x, y)
+
+    def _lift(self, slot):
+        if not self._on_map(slot):
+            return
+        x, y = self.x[slot], self.y[slot]
+        kind = self.kind[slot]
+        if kind == KIND_PLANT:
+            self.plant_stage[y, x] = -1
+        elif kind == KIND_FOOD:
+            self.food_count[y, x] -= 1
+        elif kind == KIND_STONE:
+            self.stone_count[y, x] -= 1
+        self._changed(x, y)
+
+    #-----------------------------------------------------------------------------------------------
+    def slots(self, kind, on_ground=True):
+        """
+        :param kind: KIND_PLANT, KIND_FOOD or KIND_STONE
+        :param on_ground: only return items that are not held by an agent
+        :return: array of slot indices in increasing order
+        """
+        n = self._high_water
+        mask = self.kind[:n] == kind
+        if on_ground:
+            mask &= self.held_by[:n] == NOT_HELD
+        return np.flatnonzero(mask)
+
+    def find(self, kind, x, y):
+        """
+        :return: the slot of an item of the given kind lying on tile (x, y), or -1 if there is none
+        """
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return -1
+        if kind == KIND_PLANT and self.plant_stage[y, x] < 0:
+            return -1
+        if kind == KIND_FOOD and self.food_count[y, x] == 0:
+            return -1
+        if kind == KIND_STONE and self.stone_count[y, x] == 0:
+            return -1
+        n = self._high_water
+        hits = np.flatnonzero((self.kind[:n] == kind) & (self.x[:n] == x) & (self.y[:n] == y) &
+                              (self.held_by[:n] == NOT_HELD))
+        return int(hits[0]) if len(hits) else -1
+
+    def step_plants(self, ticks=1):
+        """
+        Advance the growth counter of every plant by a number of turns.  A plant grows one stage each time its
+        counter goes past PLANT_GROW_TICKS, so `ticks` turns are applied in closed form rather than one at a time.
+        """
+        if self._plants is None:
+            self._plants = np.flatnonzero(self.kind[:self._high_water] == KIND_PLANT)
+        plants = self._plants
+        if len(plants) == 0 or ticks <= 0:
+            return
+        if ticks == 1:
+            counter = self.counter[plants] + 1
+            growth = counter > PLANT_GROW_TICKS
+            counter[growth] = 0
+            grown = growth
+        else:
+            period = PLANT_GROW_TICKS + 1
+            counter = self.counter[plants].astype(np.int64)
+            # a counter already past the limit wraps to 0 (and grows the plant) on the very next turn
+            overdue = counter > PLANT_GROW_TICKS
+            counter[overdue] = -1
+            counter += ticks
+            growth = counter // period + overdue
+            counter %= period
+            grown = growth > 0
+        self.counter[plants] = counter
+        if grown.any():
+            growth = growth[grown]
+            grown = plants[grown]
+            self.stage[grown] = np.minimum(PLANT_RIPE, self.stage[grown] + growth.astype(np.int64))
+            on_map = self.held_by[grown] == NOT_HELD
+            grown = grown[on_map]
+            self.plant_stage[self.y[grown], self.x[grown]] = self.stage[grown]
+            self._changed(self.x[grown], self.y[grown])
@@ -0,0 +1,260 @@
+"""
+Streaming episode statistics for vector envs
+
+EpisodeStats wraps a vector env (SimpleVectorEnv, RemoteVectorEnv, ...) and keeps one running accumulator per env
+in arrays: the length and return of the current episode, and the number of turns it started with each vital below
+25.  They are updated with a few array operations per step, whatever the number of envs.  Only when an episode ends
+does it produce a summary record, which goes into that env's debug dictionary as 'episode' and into the aggregate
+statistics:
+  - RunningStats (Welford) for the count, mean, standard deviation, minimum and maximum of every metric
+  - optionally, P2Quantile sketches of chosen quantiles of every metric, in constant memory
+  - the number of deaths by cause
+
+The cause of a death is worked out from the observation the agent acted on and its action, since the vector env
+has already reset the env by the time it returns: a vital that ran out, a step into a hazard (off a cliff, into
+water or the dark forest), a swallowed stone or eating or drinking too much.
+"""
+import numpy as np
+from .actions import MOVE_NORTH, MOVE_WEST, CONSUME
+from .simple_env import HAND_STONE
+from .vector_env import VITALS, IN_HAND
+
+# a vital below this makes energy drain faster (see Agent.step)
+LOW = 25.0
+
+CAUSES = ('thirst', 'starvation', 'hazard', 'stone', 'overeating', 'other')
+CAUSE_THIRST, CAUSE_STARVATION, CAUSE_HAZARD, CAUSE_STONE, CAUSE_OVEREATING, CAUSE_OTHER = range(len(CAUSES))
+
+METRICS = ('length', 'return') + tuple(f'below_{v}' for v in VITALS)
+
+# columns of the flat observation (see flatten_state)
+HEALTH, FOOD, WATER = (VITALS.index(name) for name in ('health', 'food', 'water'))
+
+
+def death_causes(obs, actions):
+    """
+    :param obs: <n x observation_size> the observations the dead agents acted on
+    :param actions: <n> the actions they took
+    :return: <n> int index into CAUSES
+    """
+    obs = np.asarray(obs)
+    actions = np.asarray(actions)
+    health, water, food = obs[:, HEALTH], obs[:, WATER], obs[:, FOOD]
+    # what running out of water and food costs at the start of the turn, before the action
+    vitals_loss = (water <= 1) * (100 / 80) + (food <= 1) * (25 / 80)
+    return np.select([health - vitals_loss <= 0,
+                      (actions == CONSUME) & (obs[:, IN_HAND] == HAND_STONE),
+                      actions == CONSUME,
+                      (actions >= MOVE_NORTH) & (actions <= MOVE_WEST)],
+                     [np.where(water <= 1, CAUSE_THIRST, CAUSE_STARVATION), CAUSE_STONE, CAUSE_OVEREATING,
+                      CAUSE_HAZARD], CAUSE_OTHER)
+
+
+class RunningStats:
+    """
+    Count, mean, variance, minimum and maximum of a stream of values, updated a batch at a time (Welford's algorithm,
+    with Chan's formula for merging a batch)
+    :param size: number of separate streams kept side by side (a batch is then <k x size>)
+    """
+
+    def __init__(self, size=1):
+        self.count = 0
+        self.mean = np.zeros(size)
+        self.m2 = np.zeros(size)
+        self.min = np.full(size, np.inf)
+        self.max = np.full(size, -np.inf)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(self.mean))
+        n = len(values)
+        if n == 0:
+            return
+        mean = values.mean(axis=0)
+        m2 = ((values - mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * (n / total)
+        self.m2 += m2 + delta * delta * (self.count * n / total)
+        self.count = total
+        np.minimum(self.min, values.min(axis=0), out=self.min)
+        np.maximum(self.max, values.max(axis=0), out=self.max)
+
+    @property
+    def var(self):
+        return self.m2 / self.count if self.count else np.zeros_like(self.m2)
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+    def to_dict(self, i=0):
+        """
+        :return: the statistics of stream i
+        """
+        return {'count': self.count, 'mean': float(self.mean[i]), 'std': float(self.std[i]),
+                'min': float(self.min[i]), 'max': float(self.max[i])}
+
+
+class P2Quantile:
+    """
+    Streaming estimate of one quantile with the P-square algorithm (Jain & Chlamtac, 1985): five markers whose
+    heights are adjusted with a piecewise-parabolic fit as values arrive, in constant memory and time per value
+    :param p: the quantile, between 0 and 1
+    """
+
+    def __init__(self, p):
+        if not 0 < p < 1:
+            raise ValueError(f"the quantile must be between 0 and 1, got {p}")
+        self.p = p
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        q = self.heights
+        if len(q) < 5:
+            q.append(float(x))
+            q.sort()
+            return
+        n = self.positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                h = q[i] + d / (n[i + 1] - n[i - 1]) * ((n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                                                        (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < h < q[i + 1]:
+                    h = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = h
+                n[i] += d
+
+    def update(self, values):
+        for x in np.asarray(values, dtype=np.float64).ravel().tolist():
+            self.add(x)
+
+    @property
+    def value(self):
+        if not self.heights:
+            return np.nan
+        if len(self.heights) < 5:
+            return float(np.quantile(self.heights, self.p))
+        return self.heights[2]
+
+
+class EpisodeStats:
+    """
+    :param venv: the vector env to wrap; its step() must return (obs, rewards, dones, infos) and reset done envs
+    :param quantiles: quantiles to sketch for every metric, e.g. (0.5, 0.9), or None.  A sketch takes each value in
+                      Python, so they cost about 2 us per quantile and metric at every episode end.
+    :param records: True to put each finished episode's record into infos[i]['episode']
+    """
+
+    def __init__(self, venv, quantiles=None, records=True):
+        self.venv = venv
+        self.num_envs = venv.num_envs
+        self.records = records
+        n = self.num_envs
+        self.lengths = np.zeros(n, dtype=np.int64)
+        self.returns = np.zeros(n, dtype=np.float64)
+        self.below = np.zeros((n, len(VITALS)), dtype=np.int64)
+        self._obs = None
+        self.stats = RunningStats(len(METRICS))
+        self.quantiles = {name: [P2Quantile(p) for p in quantiles or ()] for name in METRICS}
+        self.cause_counts = np.zeros(len(CAUSES), dtype=np.int64)
+
+    def __getattr__(self, name):
+        return getattr(self.venv, name)
+
+    @property
+    def episodes(self):
+        return int(self.cause_counts.sum())
+
+    def reset(self):
+        self._obs = self.venv.reset()
+        self.lengths[:] = 0
+        self.returns[:] = 0
+        self.below[:] = 0
+        return self._obs
+
+    def step(self, actions):
+        if self._obs is None:
+            raise RuntimeError("EpisodeStats.step() was called before reset()")
+        obs, rewards, dones, infos = self.venv.step(actions)
+        self.lengths += 1
+        self.returns += rewards
+        self.below += self._obs[:, :len(VITALS)] < LOW
+        if dones.any():
+            self._finish(np.flatnonzero(dones), np.asarray(actions), infos)
+        self._obs = obs
+        return obs, rewards, dones, infos
+
+    def _finish(self, done, actions, infos):
+        causes = death_causes(self._obs[done], actions[done])
+        lengths, returns, below = self.lengths[done], self.returns[done], self.below[done]
+        # <k x METRICS>, in the order of METRICS
+        values = np.column_stack([lengths, returns, below])
+        self.stats.update(values)
+        for j, name in enumerate(METRICS):
+            for sketch in self.quantiles[name]:
+                sketch.update(values[:, j])
+        self.cause_counts += np.bincount(causes, minlength=len(CAUSES))
+
+        if self.records:
+            for i, length, ret, counts, cause in zip(done.tolist(), lengths.tolist(), returns.tolist(), below.tolist(),
+                                                     causes.tolist()):
+                record = dict(zip(METRICS, [length, ret] + counts))
+                record['cause'] = CAUSES[cause]
+                infos[i]['episode'] = record
+
+        self.lengths[done] = 0
+        self.returns[done] = 0
+        self.below[done] = 0
+
+    def summary(self):
+        """
+        :return: dict with the number of episodes, the statistics of every metric (count, mean, std, min, max and the
+                 quantiles as 'q50', 'q90', ...) and the number of deaths by cause
+        """
+        out = {'episodes': self.episodes}
+        for j, name in enumerate(METRICS):
+            s = self.stats.to_dict(j)
+            for sketch in self.quantiles[name]:
+                s[f'q{100 * sketch.p:g}'] = sketch.value
+            out[name] = s
+        out['causes'] = dict(zip(CAUSES, self.cause_counts.tolist()))
+        return out
+
+    def close(self):
+        self.venv.close()
+
+
+if __name__ == "__main__":
+    from .vector_env import SimpleVectorEnv
+
+    rng = np.random.default_rng(0)
+    venv = EpisodeStats(SimpleVectorEnv(32), quantiles=(0.1, 0.5, 0.9))
+    venv.reset()
+    for _ in range(1000):
+        venv.step(rng.choice([0, 0, 0, 1, 2, 3, 4, 5, 6, 7], venv.num_envs))
+    summary = venv.summary()
+    print(f"{summary['episodes']} episodes, deaths by cause {summary['causes']}")
+    for name in METRICS:
+        s = summary[name]
+        print(f"{name:14s} mean {s['mean']:8.1f}  std {s['std']:7.1f}  q10 {s['q10']:7.1f}  q50 {s['q50']:7.1f}  "
+              f"q90 {s['q90']:7.1f}")
@@ -0,0 +1,335 @@
+"""
+A stateless step function for SimpleEnv
+
+    state, obs, reward, done = step_fn(state, actions)
+
+`state` is a WorldState: a tuple of fixed-shape arrays holding everything SimpleEnv.step() reads or changes, for a
+batch of n worlds (leading axis).  step_fn() never modifies its input; it is written with array primitives only
+(elementwise arithmetic, where, and gathers), so the same code runs on NumPy or, when JAX is installed, as one
+jax.jit-compiled function (which can also be jax.vmap-ed over further batch axes).  Every branch of an action is
+computed for the whole batch and the results are selected with where(), so there is no python control flow that
+depends on the data.
+
+The result matches SimpleEnv.step() exactly, including the floating point vitals.  JAX computes in float32 by default,
+so make_step_fn('jax') switches on 64-bit mode (jax_enable_x64) before compiling.
+
+Differences from the object world: items are counted per tile (food_count, stone_count) instead of tracked one by one,
+which is all SimpleEnv observes of them, and the map cannot change (set_tile has no equivalent).
+"""
+from collections import namedtuple
+from functools import partial
+import numpy as np
+from .actions import REST, MOVE_NORTH, MOVE_EAST, MOVE_SOUTH, MOVE_WEST, PICK_UP, PUT_DOWN, CONSUME
+from .entities import KIND_PLANT, PLANT_RIPE, PLANT_GROW_TICKS
+from .simple_env import BEACH_TILES, ROCK, FOREST, WATER, NORTH, EAST, SOUTH, WEST, HAND_EMPTY, HAND_FOOD, \
+    HAND_WATER, HAND_STONE
+from .vision import SIGHT_PLANT_1, SIGHT_FOOD, SIGHT_STONE
+
+try:
+    import jax
+    import jax.numpy as jnp
+except ImportError:
+    jax = None
+    jnp = None
+
+SIGHT_SIZE = 2
+
+# indexed by action: the move of MOVE_NORTH .. MOVE_WEST, and 0 for every other action
+ACTION_DX = np.array([0, 0, 1, 0, -1, 0, 0, 0, 0, 0, 0, 0])
+ACTION_DY = np.array([0, 1, 0, -1, 0, 0, 0, 0, 0, 0, 0, 0])
+ACTION_FACING = np.array([0, NORTH, EAST, SOUTH, WEST, 0, 0, 0, 0, 0, 0, 0])
+
+WorldState = namedtuple('WorldState', [
+    'tiles',            # <n x 18 x 18> int8 tile ids, indexed [y, x]
+    'codes',            # <n x 22 x 22> int8 sight codes of the terrain, padded by SIGHT_SIZE
+    'x', 'y',           # <n> position of the agent
+    'facing',           # <n> NORTH / EAST / SOUTH / WEST
+    'in_hand',          # <n> in_hand code
+    'health', 'energy', 'food', 'water',    # <n> float64
+    'age',              # <n>
+    'plant_x', 'plant_y', 'plant_stage', 'plant_counter',  # <n x plants>
+    'food_count', 'stone_count',            # <n x 18 x 18> items lying on each tile
+])
+
+
+def state_from_envs(envs):
+    """
+    :param envs: SimpleEnv instances with the same number of plants (or a single SimpleEnv)
+    :return: a NumPy WorldState of their current worlds
+    """
+    if not isinstance(envs, (list, tuple)):
+        envs = [envs]
+    plants = [env.entities.slots(KIND_PLANT) for env in envs]
+    if len({len(p) for p in plants}) != 1:
+        raise ValueError("every env of a WorldState needs the same number of plants")
+    agents = [env.agent for env in envs]
+
+    def column(values, dtype):
+        return np.array(values, dtype=dtype)
+
+    def plant_column(name):
+        return np.stack([getattr(env.entities, name)[p] for env, p in zip(envs, plants)])
+
+    return WorldState(
+        tiles=np.stack([env.map for env in envs]).astype(np.int8),
+        codes=np.stack([env._terrain_codes(SIGHT_SIZE) for env in envs]),
+        x=column([a.x for a in agents], np.int64),
+        y=column([a.y for a in agents], np.int64),
+        facing=column([a.facing for a in agents], np.int64),
+        in_hand=column([a.what_is_in_hand() for a in agents], np.int64),
+        health=column([a.health for a in agents], np.float64),
+        energy=column([a.energy for a in agents], np.float64),
+        food=column([a.food for a in agents], np.float64),
+        water=column([a.water for a in agents], np.float64),
+        age=column([a.age for a in agents], np.int64),
+        plant_x=plant_column('x').astype(np.int64),
+        plant_y=plant_column('y').astype(np.int64),
+        plant_stage=plant_column('stage').astype(np.int64),
+        plant_counter=plant_column('counter').astype(np.int64),
+        food_count=np.stack([env.entities.food_count for env in envs]).astype(np.int64),
+        stone_count=np.stack([env.entities.stone_count for env in envs]).astype(np.int64),
+    )
+
+
+#-----------------------------------------------------------------------------------------------
+# The rules of a turn for arrays of agents, one entry per agent.  They return new arrays, and are shared with the
+# sharded world (sharded.py), which applies them to its rows of the agent table.
+def vitals_tick(xp, health, energy, food, water):
+    """
+    Agent.step(): the cost of one turn, before the action
+    :return: health, energy, food, water
+    """
+    energy = xp.maximum(energy, 0.0)
+    water = water - 1
+    food = food - 1
+    energy = energy - (water < 25.0)
+    water_empty = water <= 0
+    water = xp.where(water_empty, 0.0, water)
+    health = health - water_empty * (100 / 80)
+    energy = energy - (food < 25.0)
+    food_empty = food <= 0
+    food = xp.where(food_empty, 0.0, food)
+    health = health - food_empty * (25 / 80)
+    return health, energy, food, water
+
+
+def rest(xp, health, energy, food, water):
+    """
+    :return: health, energy, food, water
+    """
+    food = food + 0.5
+    water = water + 0.5
+    fed = (food >= 25) & (water >= 25)
+    health = xp.minimum(health + fed, 100.0)
+    energy = xp.minimum(energy + xp.where(fed, 3.0, 2.0), 100.0)
+    return health, energy, food, water
+
+
+def move(xp, action, x, y, facing, health, energy, width, height, tile_at):
+    """
+    A step forward, blocked by ROCK, and deadly into FOREST, WATER or off the map
+    :param tile_at: function (xs, ys) -> the tile ids at those positions (which are always on the map)
+    :return: x, y, facing, health, energy
+    """
+    can = energy >= 2
+    nx, ny = x + xp.asarray(ACTION_DX)[action], y + xp.asarray(ACTION_DY)[action]
+    off_map = (nx < 0) | (nx >= width) | (ny < 0) | (ny >= height)
+    ahead = tile_at(xp.clip(nx, 0, width - 1), xp.clip(ny, 0, height - 1))
+    moved = can & ~off_map & (ahead != ROCK)
+    dies = can & (off_map | (ahead == FOREST) | (ahead == WATER))
+    return (xp.where(moved, nx, x), xp.where(moved, ny, y), xp.where(can, xp.asarray(ACTION_FACING)[action], facing),
+            xp.where(dies, 0.0, health), xp.where(can, energy - 2, energy))
+
+
+def consume(xp, health, energy, food, water, in_hand):
+    """
+    :return: health, energy, food, water, in_hand
+    """
+    drink = in_hand == HAND_WATER
+    eat = in_hand == HAND_FOOD
+    stone = in_hand == HAND_STONE
+    water_after = xp.where(drink, water + 20, water)
+    food_after = xp.where(eat, food + 35, food)
+    # too much water or food costs half of the excess in health and energy
+    excess = xp.where(drink & (water_after > 100), (water_after - 100) / 2, 0.0) + \
+        xp.where(eat & (food_after > 100), (food_after - 100) / 2, 0.0) + xp.where(stone, 45.0, 0.0)
+    return (health - excess, energy - excess, xp.where(eat, xp.minimum(food_after, 100.0), food),
+            xp.where(drink, xp.minimum(water_after, 100.0), water), xp.full_like(in_hand, HAND_EMPTY))
+
+
+def grow_plants(xp, stage, counter):
+    """
+    :return: stage, counter of the plants after a turn
+    """
+    counter = counter + 1
+    grown = counter > PLANT_GROW_TICKS
+    return xp.where(grown, xp.minimum(stage + 1, PLANT_RIPE), stage), xp.where(grown, 0, counter)
+
+
+#-----------------------------------------------------------------------------------------------
+def _vitals_tick(xp, s):
+    health, energy, food, water = vitals_tick(xp, s.health, s.energy, s.food, s.water)
+    return s._replace(health=health, energy=energy, food=food, water=water, age=s.age + 1)
+
+
+def _tile_mask(xp, s, x, y):
+    """
+    :return: <n x 18 x 18> True at tile (x[i], y[i]) of world i
+    """
+    height, width = s.tiles.shape[1:]
+    return (xp.arange(height)[:, None] == y[:, None, None]) & (xp.arange(width)[None, :] == x[:, None, None])
+
+
+def _rest(xp, s):
+    health, energy, food, water = rest(xp, s.health, s.energy, s.food, s.water)
+    return s._replace(health=health, energy=energy, food=food, water=water)
+
+
+def _move(xp, s, action, n):
+    height, width = s.tiles.shape[1:]
+    x, y, facing, health, energy = move(xp, action, s.x, s.y, s.facing, s.health, s.energy, width, height,
+                                        lambda xs, ys: s.tiles[xp.arange(n), ys, xs])
+    return s._replace(x=x, y=y, facing=facing, health=health, energy=energy)
+
+
+def _pick_up(xp, s, n):
+    """
+    Agent.pick_up(): a ripe plant is always harvested, but what ends up in the hand is water on a beach, else a
+    stone, else food (and food picked up from the ground is lost when a stone replaces it)
+    """
+    can = s.energy >= 1
+    act = can & (s.in_hand == HAND_EMPTY)
+    here = xp.arange(n), s.y, s.x
+    beach = (s.tiles[here][:, None] == xp.asarray(BEACH_TILES)).any(axis=1)
+    harvest = act[:, None] & (s.plant_x == s.x[:, None]) & (s.plant_y == s.y[:, None]) & \
+        (s.plant_stage == PLANT_RIPE)
+    take_food = act & ~beach & (s.food_count[here] > 0)
+    take_stone = act & ~beach & (s.stone_count[here] > 0)
+    in_hand = xp.where(take_food | harvest.any(axis=1), HAND_FOOD, s.in_hand)
+    in_hand = xp.where(take_stone, HAND_STONE, in_hand)
+    in_hand = xp.where(act & beach, HAND_WATER, in_hand)
+    tile = _tile_mask(xp, s, s.x, s.y)
+    return s._replace(energy=xp.where(can, s.energy - 1, s.energy),
+                      in_hand=in_hand,
+                      plant_stage=xp.where(harvest, 0, s.plant_stage),
+                      plant_counter=xp.where(harvest, 0, s.plant_counter),
+                      food_count=s.food_count - (tile & take_food[:, None, None]),
+                      stone_count=s.stone_count - (tile & take_stone[:, None, None]))
+
+
+def _put_down(xp, s):
+    can = s.energy >= 1
+    tile = _tile_mask(xp, s, s.x, s.y)
+    drop_food = can & (s.in_hand == HAND_FOOD)
+    drop_stone = can & (s.in_hand == HAND_STONE)
+    return s._replace(energy=xp.where(can, s.energy - 1, s.energy),
+                      in_hand=xp.where(can, HAND_EMPTY, s.in_hand),
+                      food_count=s.food_count + (tile & drop_food[:, None, None]),
+                      stone_count=s.stone_count + (tile & drop_stone[:, None, None]))
+
+
+def _consume(xp, s):
+    health, energy, food, water, in_hand = consume(xp, s.health, s.energy, s.food, s.water, s.in_hand)
+    return s._replace(health=health, energy=energy, food=food, water=water, in_hand=in_hand)
+
+
+def _select(xp, which, a, b):
+    """
+    :return: the WorldState that is a where `which` (one entry per world) is True, else b
+    """
+    def pick(u, v):
+        return xp.where(which.reshape(which.shape + (1,) * (u.ndim - 1)), u, v)
+    return WorldState(*[u if u is v else pick(u, v) for u, v in zip(a, b)])
+
+
+def _grow_plants(xp, s):
+    stage, counter = grow_plants(xp, s.plant_stage, s.plant_counter)
+    return s._replace(plant_stage=stage, plant_counter=counter)
+
+
+def observe(xp, s):
+    """
+    :return: the state dictionary of SimpleEnv without its optional entries, batched
+    """
+    n = s.x.shape[0]
+    height, width = s.tiles.shape[1:]
+    offsets = xp.arange(2 * SIGHT_SIZE + 1)
+    # row r of the sight matrix is y + SIGHT_SIZE - r (north first), column c is x - SIGHT_SIZE + c
+    wy = (s.y[:, None] + SIGHT_SIZE - offsets)[:, :, None]
+    wx = (s.x[:, None] - SIGHT_SIZE + offsets)[:, None, :]
+    b = xp.arange(n)[:, None, None]
+    sight = s.codes[b, wy + SIGHT_SIZE, wx + SIGHT_SIZE]
+
+    on_map = (wx >= 0) & (wx < width) & (wy >= 0) & (wy < height)
+    cy, cx = xp.clip(wy, 0, height - 1), xp.clip(wx, 0, width - 1)
+    plant = (s.plant_x[:, None, None, :] == wx[..., None]) & (s.plant_y[:, None, None, :] == wy[..., None])
+    stage = (plant * (s.plant_stage[:, None, None, :] + 1)).sum(axis=-1) - 1
+    sight = xp.where(stage >= 0, SIGHT_PLANT_1 + stage, sight)
+    sight = xp.where(on_map & (s.food_count[b, cy, cx] > 0), SIGHT_FOOD, sight)
+    sight = xp.where(on_map & (s.stone_count[b, cy, cx] > 0), SIGHT_STONE, sight)
+    return {'health': s.health, 'energy': s.energy, 'food': s.food, 'water': s.water, 'in_hand': s.in_hand,
+            'sight': sight}
+
+
+def _step(xp, state, actions):
+    actions = xp.asarray(actions)
+    n = actions.shape[0]
+    s = _vitals_tick(xp, state)
+
+    moving = (actions >= MOVE_NORTH) & (actions <= MOVE_WEST)
+    s = _select(xp, actions == REST, _rest(xp, s), s)
+    s = _select(xp, moving, _move(xp, s, actions, n), s)
+    s = _select(xp, actions == PICK_UP, _pick_up(xp, s, n), s)
+    s = _select(xp, actions == PUT_DOWN, _put_down(xp, s), s)
+    s = _select(xp, actions == CONSUME, _consume(xp, s), s)
+    # throwing is not implemented in SimpleEnv either
+    s = _grow_plants(xp, s)
+
+    done = s.health <= 0
+    reward = xp.where(done, -1000, 1)
+    return s, observe(xp, s), reward, done
+
+
+def step_fn(state, actions):
+    """
+    One turn of every world in a WorldState, with NumPy
+    :param actions: <n> int actions
+    :return: the next WorldState, the observations (a dict of batched arrays like SimpleEnv's state), rewards and
+             dones
+    """
+    return _step(np, state, actions)
+
+
+def make_step_fn(backend='auto'):
+    """
+    :param backend: 'numpy', 'jax' (a jax.jit-compiled step_fn, which enables float64 in JAX) or 'auto' (JAX when
+                    it is installed)
+    :return: a function with the signature of step_fn
+    """
+    if backend == 'auto':
+        backend = 'numpy' if jax is None else 'jax'
+    if backend == 'numpy':
+        return step_fn
+    if backend != 'jax':
+        raise ValueError(f"unknown backend {backend!r}, expected 'numpy', 'jax' or 'auto'")
+    if jax is None:
+        raise ImportError("the jax backend needs JAX (pip install jax)")
+    jax.config.update('jax_enable_x64', True)
+    return jax.jit(partial(_step, jnp))
+
+
+if __name__ == "__main__":
+    from .simple_env import SimpleEnv
+
+    rng = np.random.default_rng(0)
+    env = SimpleEnv()
+    state = state_from_envs(env)
+    for t in range(300):
+        action = int(rng.choice([REST, REST, MOVE_NORTH, MOVE_EAST, MOVE_SOUTH, MOVE_WEST, PICK_UP, PUT_DOWN, CONSUME]))
+        expected, reward, done, _ = env.step(action)
+        state, obs, rewards, dones = step_fn(state, [action])
+        assert all(np.array_equal(obs[key][0], expected[key]) for key in obs), t
+        assert rewards[0] == reward and dones[0] == done, t
+        if done:
+            break
+    print(f"step_fn matched SimpleEnv.step for {t + 1} turns")
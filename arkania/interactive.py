@@ -0,0 +1,170 @@
+"""
+Playing SimpleEnv from the keyboard, and replaying recorded games, on a fixed tick rate
+
+The runner takes its input from the pyglet window the env renders into.  Key presses are buffered as they arrive,
+without blocking, and the env is stepped on a fixed clock: each tick takes the next buffered action, so keys pressed
+between two ticks are played on the ticks that follow, in order.  The window is only redrawn after a tick changed
+the world, not on every pass of the loop.
+
+Keys:
+    W / D / S / A       move north / east / south / west
+    E                   pick up
+    X                   put down
+    C                   consume
+    R                   rest
+    arrow keys          throw
+    P                   pause / resume
+    ESC                 quit
+
+Every action played is logged, and save_log() writes the log as JSON.  Since SimpleEnv.reset() always builds the same
+world, replaying the log (replay(), or `python example.py --replay game.json`) shows the same game again, at a
+multiple of the tick rate.
+"""
+import collections
+import json
+import time
+import pyglet
+from pyglet.window import key
+from .actions import REST, MOVE_NORTH, MOVE_EAST, MOVE_SOUTH, MOVE_WEST, PICK_UP, PUT_DOWN, CONSUME, THROW_NORTH, \
+    THROW_EAST, THROW_SOUTH, THROW_WEST
+
+KEY_ACTIONS = {
+    key.W: MOVE_NORTH,
+    key.D: MOVE_EAST,
+    key.S: MOVE_SOUTH,
+    key.A: MOVE_WEST,
+    key.E: PICK_UP,
+    key.X: PUT_DOWN,
+    key.C: CONSUME,
+    key.R: REST,
+    key.UP: THROW_NORTH,
+    key.RIGHT: THROW_EAST,
+    key.DOWN: THROW_SOUTH,
+    key.LEFT: THROW_WEST,
+}
+
+TICK_RATE = 4.0
+
+# the longest the loop sleeps between looking at the window's events, in seconds
+MAX_SLEEP = 0.01
+
+
+class InteractiveRunner:
+    """
+    :param env: a SimpleEnv (or any env with step(), reset() and a gym Viewer after render())
+    :param tick_rate: env steps per second
+    :param idle_action: the action played on a tick without buffered input, or None to wait for the next key (the
+                        game is then turn-based, but the ticks still set its pace)
+    :param actions: actions to play instead of the keyboard (a replay); the runner stops after the last one
+    :param max_buffered: keys pressed while this many actions are waiting to be played are ignored
+    """
+
+    def __init__(self, env, tick_rate=TICK_RATE, idle_action=None, actions=None, max_buffered=8):
+        if tick_rate <= 0:
+            raise ValueError(f"tick_rate must be positive, got {tick_rate}")
+        self.env = env
+        self.tick_rate = tick_rate
+        self.idle_action = idle_action
+        self.max_buffered = max_buffered
+        self.scripted = actions is not None
+        self.pending = collections.deque(actions or ())
+        self.log = []
+        self.state = None
+        self.total_reward = 0
+        self.done = False
+        self.paused = False
+        self.running = False
+        self.dirty = True
+        self.frames = 0
+
+    def on_key_press(self, symbol, modifiers):
+        if symbol == key.ESCAPE:
+            self.running = False
+        elif symbol == key.P:
+            self.paused = not self.paused
+        elif symbol in KEY_ACTIONS and not self.scripted and len(self.pending) < self.max_buffered:
+            # a full buffer ignores the new key, so the keys that are played stay in the order they were pressed
+            self.pending.append(KEY_ACTIONS[symbol])
+        # ESC would otherwise close the window before the loop has finished with it
+        return pyglet.event.EVENT_HANDLED
+
+    def tick(self, dt=None):
+        """
+        Play the next action, if there is one (called by the clock tick_rate times per second)
+        """
+        if self.done or self.paused:
+            return
+        if self.pending:
+            action = self.pending.popleft()
+        elif self.scripted:
+            self.running = False
+            return
+        elif self.idle_action is not None:
+            action = self.idle_action
+        else:
+            return
+        self.state, reward, self.done, _ = self.env.step(action)
+        self.log.append(int(action))
+        self.total_reward += reward
+        self.dirty = True
+
+    def redraw(self):
+        if self.dirty:
+            self.env.render()
+            self.frames += 1
+            self.dirty = False
+
+    def run(self, max_seconds=None):
+        """
+        Reset the env and play until ESC, the end of the episode (or of the replay), the window being closed or
+        max_seconds
+        :return: the number of turns played
+        """
+        self.state = self.env.reset()
+        self.redraw()
+        window = self.env.viewer.window
+        window.push_handlers(on_key_press=self.on_key_press)
+        pyglet.clock.schedule_interval(self.tick, 1.0 / self.tick_rate)
+        self.running = True
+        deadline = None if max_seconds is None else time.perf_counter() + max_seconds
+        try:
+            while self.running and self.env.viewer.isopen and not self.done:
+                window.dispatch_events()
+                pyglet.clock.tick()
+                self.redraw()
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+                sleep = pyglet.clock.get_sleep_time(True)
+                time.sleep(MAX_SLEEP if sleep is None else min(max(sleep, 0.0), MAX_SLEEP))
+            self.redraw()
+        finally:
+            pyglet.clock.unschedule(self.tick)
+            window.remove_handlers(on_key_press=self.on_key_press)
+            self.running = False
+        return len(self.log)
+
+    def save_log(self, path):
+        """
+        Write the actions played so far as JSON, for replay()
+        """
+        with open(path, 'w') as f:
+            json.dump({'tick_rate': self.tick_rate, 'actions': self.log}, f)
+
+
+def load_log(path):
+    """
+    :return: (actions, tick_rate) of a log written by InteractiveRunner.save_log()
+    """
+    with open(path) as f:
+        log = json.load(f)
+    return log['actions'], log.get('tick_rate', TICK_RATE)
+
+
+def replay(env, actions, tick_rate=TICK_RATE, speed=8.0):
+    """
+    Play recorded actions in the env's window, `speed` times faster than tick_rate (P pauses, ESC stops)
+    :return: the runner, with the rewards and the final state of the replay
+    """
+    runner = InteractiveRunner(env, tick_rate * speed, actions=actions)
+    runner.run()
+    return runner
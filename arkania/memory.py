@@ -0,0 +1,70 @@
+"""
+Per-agent exploration memory (fog-of-war)
+
+For every agent two layers are kept, both indexed [y, x] in world coordinates:
+  seen      - packed bitset, one bit per tile (little bit order along x), set once the tile has been observed
+  last_seen - uint8 sight code of the tile the last time it was observed, UNKNOWN (255) if it never was
+
+Updates only touch the window that was just observed, never the whole map.
+"""
+import numpy as np
+
+UNKNOWN = 255
+
+
+class ExplorationMemory:
+    def __init__(self, num_agents, width, height):
+        self.num_agents = num_agents
+        self.width = width
+        self.height = height
+        self.seen = np.zeros((num_agents, height, (width + 7) // 8), dtype=np.uint8)
+        self.last_seen = np.full((num_agents, height, width), UNKNOWN, dtype=np.uint8)
+
+    def nbytes(self):
+        return self.seen.nbytes + self.last_seen.nbytes
+
+    def clear(self, agent=None):
+        """
+        Forget everything, for one agent or (by default) for all of them
+        """
+        if agent is None:
+            agent = slice(None)
+        self.seen[agent] = 0
+        self.last_seen[agent] = UNKNOWN
+
+    def update(self, agent, x, y, window):
+        """
+        Record one observation
+        :param agent: index of the agent
+        :param x: x position of the agent
+        :param y: y position of the agent
+        :param window: the agent's <2N+1 x 2N+1> sight (or fov) matrix, north in row 0, unseen cells negative
+        """
+        self.update_batch([agent], [x], [y], np.asarray(window)[None])
+
+    def update_batch(self, agents, xs, ys, windows):
+        """
+        Record one observation for each of several agents at once
+        :param windows: <n x 2N+1 x 2N+1> sight (or fov) matrices
+        """
+        windows = np.asarray(windows)
+        size = windows.shape[-1] // 2
+        span = np.arange(-size, size + 1)
+        agents = np.asarray(agents)[:, None, None]
+        wx = np.asarray(xs)[:, None, None] + span[None, None, :]
+        wy = np.asarray(ys)[:, None, None] - span[None, :, None]
+        valid = (windows >= 0) & (wx >= 0) & (wx < self.width) & (wy >= 0) & (wy < self.height)
+
+        a, cx, cy = [v[valid] for v in np.broadcast_arrays(agents, wx, wy)]
+        self.last_seen[a, cy, cx] = windows[valid]
+        np.bitwise_or.at(self.seen, (a, cy, cx >> 3), (1 << (cx & 7)).astype(np.uint8))
+
+    def seen_mask(self, agent):
+        """
+        :return: the seen bitset of one agent unpacked to a boolean <height x width> array
+        """
+        bits = np.unpackbits(self.seen[agent], axis=-1, bitorder='little')
+        return bits[:, :self.width].astype(bool)
+
+    def explored_fraction(self, agent):
+        return self.seen_mask(agent).mean()
@@ -0,0 +1,69 @@
+"""
+State dictionaries whose expensive entries are only computed when they are read
+
+A controller that only looks at the vitals should not pay for the sight matrix on every step.  SimpleEnv(lazy_state=True)
+returns a LazyState instead of a dict: a read-only mapping with the same keys, where the expensive entries are Deferred
+functions that run on first access and are then stored.  The functions capture the agent's pose at that tick, and the
+world they read is versioned, so an entry read late (after later steps) is still the one of its tick, as long as the
+world has not changed in between; otherwise reading it raises a RuntimeError instead of returning the wrong tick.
+"""
+from collections.abc import Mapping
+
+
+class Deferred:
+    """
+    An entry of a LazyState that has not been computed yet
+    """
+    __slots__ = ('fn',)
+
+    def __init__(self, fn):
+        self.fn = fn
+
+
+def resolve(entries):
+    """
+    :return: a plain dict of entries, with every Deferred entry computed
+    """
+    return {key: value.fn() if type(value) is Deferred else value for key, value in entries.items()}
+
+
+class LazyState(Mapping):
+    """
+    :param entries: dict of the state's entries, in order, some of them Deferred
+    :param is_current: optional function, False once the Deferred entries can no longer be computed for their tick
+    """
+
+    def __init__(self, entries, is_current=None):
+        self._entries = entries
+        self._is_current = is_current
+
+    def __getitem__(self, key):
+        value = self._entries[key]
+        if type(value) is Deferred:
+            if self._is_current is not None and not self._is_current():
+                raise RuntimeError(f"'{key}' of this state was not read before the world changed; read it before "
+                                   f"stepping on, or call to_dict() on the state")
+            value = self._entries[key] = value.fn()
+        return value
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def is_computed(self, key):
+        return type(self._entries[key]) is not Deferred
+
+    def to_dict(self):
+        """
+        :return: a plain dict with every entry computed
+        """
+        return {key: self[key] for key in self._entries}
+
+    def __repr__(self):
+        return 'LazyState({' + ', '.join(f"{key!r}: {'<deferred>' if type(value) is Deferred else repr(value)}"
+                                         for key, value in self._entries.items()) + '})'
@@ -0,0 +1,174 @@
+"""
+Long-range, low-resolution sight from summed-area tables
+
+A foveated observation is the full-resolution sight window in the center plus rings of pooled cells around it.  Ring
+k is the 3 x 3 grid of blocks of side (2N+1) * scale^(k-1) centered on the agent, without its middle block (which is
+covered by the rings inside it), so each ring adds 8 cells that see `scale` times further than the ring before.  A
+cell reports how many of its tiles fall into each category (water, food, danger, ...), or the fraction of them.
+
+Every count is read from a summed-area table with four lookups, whatever the size of the block.  The table of a
+world is the sum of two:
+  - the table of its terrain, padded far enough for the outermost ring, which only depends on the map and is shared
+    by every env using the same Terrain
+  - the table of what the objects change: for each tile with an object, its category minus the category of the
+    terrain under it.  It only covers the map, and is updated from the EntityRegistry listeners by adding the change
+    of a tile to the part of the table below and to the right of it.
+"""
+import numpy as np
+from .vision import SIGHT_BEACH, SIGHT_ROCK, SIGHT_DROPOFF, SIGHT_WATER, SIGHT_DARK_FOREST, SIGHT_PLANT_1, \
+    SIGHT_PLANT_RIPE, SIGHT_FOOD, SIGHT_STONE, SIGHT_PREDATOR, NUM_SIGHT_CODES, overlay_objects
+
+# the categories counted in each pooled cell, and the sight codes that fall into each of them
+CATEGORIES = (('water', (SIGHT_BEACH,)),
+              ('food', (SIGHT_PLANT_RIPE, SIGHT_FOOD)),
+              ('plants', (SIGHT_PLANT_1, SIGHT_PLANT_1 + 1, SIGHT_PLANT_1 + 2)),
+              ('danger', (SIGHT_DROPOFF, SIGHT_WATER, SIGHT_DARK_FOREST, SIGHT_PREDATOR)),
+              ('rock', (SIGHT_ROCK,)),
+              ('stone', (SIGHT_STONE,)))
+NUM_CATEGORIES = len(CATEGORIES)
+
+# category membership of each sight code, <NUM_SIGHT_CODES x NUM_CATEGORIES>
+CODE_CATEGORIES = np.zeros((NUM_SIGHT_CODES, NUM_CATEGORIES), dtype=np.int8)
+for _i, (_name, _codes) in enumerate(CATEGORIES):
+    CODE_CATEGORIES[list(_codes), _i] = 1
+
+RINGS = 2
+SCALE = 3
+
+
+def category_planes(codes):
+    """
+    :param codes: array of sight codes
+    :return: int8 <... x NUM_CATEGORIES>, 1 where the code belongs to the category (codes outside 0-14 belong to none)
+    """
+    codes = np.asarray(codes)
+    valid = (codes >= 0) & (codes < NUM_SIGHT_CODES)
+    return np.where(valid[..., None], CODE_CATEGORIES[np.where(valid, codes, 0)], 0).astype(np.int8)
+
+
+def summed_area_table(planes, dtype=np.int32):
+    """
+    :param planes: <rows x columns x C>
+    :return: <rows + 1 x columns + 1 x C>, [i, j] = sum of planes[:i, :j]
+    """
+    rows, cols = planes.shape[:2]
+    table = np.zeros((rows + 1, cols + 1) + planes.shape[2:], dtype=dtype)
+    np.cumsum(np.cumsum(planes, axis=0, dtype=dtype), axis=1, out=table[1:, 1:])
+    return table
+
+
+_rings = {}
+
+
+def ring_cells(size=2, rings=RINGS, scale=SCALE):
+    """
+    :param size: the center window is 2 * size + 1 tiles wide
+    :return: <rings * 8 x 4> int array of the pooled cells (x0, x1, y0, y1), inclusive tile offsets from the agent,
+             ring by ring and within a ring north row first, west to east (as in a sight matrix)
+    """
+    key = (size, rings, scale)
+    if key in _rings:
+        return _rings[key]
+    if scale % 2 == 0:
+        raise ValueError(f"scale must be odd so the blocks stay centered on the agent, got {scale}")
+    cells = []
+    for k in range(rings):
+        block = (2 * size + 1) * scale ** k
+        half = block // 2
+        for j in (1, 0, -1):
+            for i in (-1, 0, 1):
+                if i or j:
+                    cells.append((i * block - half, i * block + half, j * block - half, j * block + half))
+    cells = np.array(cells, dtype=np.intp).reshape(-1, 4)
+    cells.flags.writeable = False
+    _rings[key] = cells
+    return cells
+
+
+def reach(cells):
+    """
+    :return: the furthest any of the cells reaches from the agent, in tiles
+    """
+    return int(np.abs(cells).max()) if len(cells) else 0
+
+
+_corners = {}
+
+
+def corner_index(width, height, pad, cells):
+    """
+    Flat indices of the four corners of every cell, for every position of the agent in a width x height map, into a
+    terrain table padded by `pad` and into an object table of the map only (where the cells are clipped to the map),
+    so that a query is one gather per table.  Cached, and shared by every env.
+    :return: two int32 <height x width x 4 x m> arrays, corners in the order [r1, c1], [r0, c1], [r1, c0], [r0, c0]
+    """
+    key = (width, height, pad, cells.tobytes())
+    index = _corners.get(key)
+    if index is None:
+        ys, xs = np.mgrid[0:height, 0:width]
+        ys, xs = ys[:, :, None], xs[:, :, None]
+        x0, x1 = xs + cells[:, 0], xs + cells[:, 1] + 1
+        y0, y1 = ys + cells[:, 2], ys + cells[:, 3] + 1
+
+        def corners(r0, r1, c0, c1, columns):
+            return np.stack([r1 * columns + c1, r0 * columns + c1, r1 * columns + c0, r0 * columns + c0],
+                            axis=2).astype(np.int32)
+
+        terrain = corners(y0 + pad, y1 + pad, x0 + pad, x1 + pad, width + 2 * pad + 1)
+        objects = corners(np.clip(y0, 0, height), np.clip(y1, 0, height), np.clip(x0, 0, width),
+                          np.clip(x1, 0, width), width + 1)
+        index = _corners[key] = (terrain, objects)
+    return index
+
+
+class PeripheryTables:
+    """
+    Summed-area tables of the categories of a SimpleEnv world (see the module docstring), for pooled cells reaching
+    up to `pad` tiles beyond the edge of the map
+    """
+
+    def __init__(self, env, pad):
+        self.env = env
+        self.pad = pad
+        reg = env.entities
+        self.delta = np.zeros((reg.height, reg.width, NUM_CATEGORIES), dtype=np.int8)
+        self.table = np.zeros((reg.height + 1, reg.width + 1, NUM_CATEGORIES), dtype=np.int16)
+        self.rebuild()
+        reg.listeners.append(self.on_change)
+
+    def rebuild(self):
+        """
+        Recompute the object table from scratch, needed when the terrain changes (e.g. on reset)
+        """
+        env = self.env
+        terrain = env._terrain_codes(0)
+        self.delta[...] = category_planes(env.sight_world(0)) - category_planes(terrain)
+        self.table[...] = summed_area_table(self.delta, dtype=np.int16)
+
+    def detach(self):
+        self.env.entities.listeners.remove(self.on_change)
+
+    def on_change(self, xs, ys):
+        reg = self.env.entities
+        tiles = np.unique(np.asarray(ys) * reg.width + np.asarray(xs))
+        ys, xs = tiles // reg.width, tiles % reg.width
+        terrain = self.env._terrain_codes(0)[ys, xs]
+        codes = overlay_objects(terrain.copy(), reg.plant_stage[ys, xs], reg.food_count[ys, xs],
+                                reg.stone_count[ys, xs])
+        delta = category_planes(codes) - category_planes(terrain)
+        change = delta - self.delta[ys, xs]
+        self.delta[ys, xs] = delta
+        for x, y, c in zip(xs.tolist(), ys.tolist(), change):
+            if c.any():
+                self.table[y + 1:, x + 1:] += c
+
+    def counts(self, x, y, cells):
+        """
+        :param cells: <m x 4> cells (x0, x1, y0, y1) relative to (x, y), e.g. from ring_cells()
+        :return: <m x NUM_CATEGORIES> int number of tiles of each category in each cell
+        """
+        reg = self.env.entities
+        terrain, objects = corner_index(reg.width, reg.height, self.pad, cells)
+        t = self.env.terrain.category_table(self.pad).reshape(-1, NUM_CATEGORIES)[terrain[y, x]]
+        o = self.table.reshape(-1, NUM_CATEGORIES)[objects[y, x]]
+        return (t[0] - t[1] - t[2] + t[3]) + (o[0] - o[1] - o[2] + o[3])
@@ -0,0 +1,118 @@
+"""
+Placing entities on distinct free tiles
+
+Each entity type has a region it may be placed in (a rectangle of tiles, optionally narrowed by a mask such as "not
+on water").  Every region keeps its free tiles as a sparse set: an array holding a permutation of the region's tiles,
+where the first `size` entries are the free ones, and the position of every tile in that array.  Taking k tiles is one
+draw of k distinct positions below `size` followed by swapping them past the end of the free part, and a tile taken
+through one region is swapped out of every other region that contains it.  Nothing is ever retried, so the cost of a
+placement depends only on k, however full the region is, and clear() is a copy of two small arrays.
+"""
+import random as rnd
+import numpy as np
+
+
+class Region:
+    """
+    The tiles x0..x1, y0..y1 (inclusive, like random.randint) where `allowed` (an optional boolean map indexed
+    [y, x]) is True
+    """
+
+    def __init__(self, x0, x1, y0, y1, allowed=None):
+        self.x0, self.x1, self.y0, self.y1 = x0, x1, y0, y1
+        self.allowed = allowed
+
+    def tiles(self, width, height):
+        """
+        :return: the flat indices (y * width + x) of the tiles in the region, in row order
+        """
+        inside = np.zeros((height, width), dtype=bool)
+        inside[self.y0:self.y1 + 1, self.x0:self.x1 + 1] = True
+        if self.allowed is not None:
+            inside &= self.allowed
+        return np.flatnonzero(inside)
+
+
+class FreeTiles:
+    """
+    Sparse set of the free tiles of one region
+    """
+
+    def __init__(self, tiles, num_tiles):
+        self.initial = np.asarray(tiles, dtype=np.intp)
+        self.initial_pos = np.full(num_tiles, -1, dtype=np.intp)
+        self.initial_pos[self.initial] = np.arange(len(self.initial))
+        self.tiles = self.initial.copy()
+        self.pos = self.initial_pos.copy()
+        self.size = len(self.tiles)
+
+    def clear(self):
+        self.tiles[:] = self.initial
+        self.pos[:] = self.initial_pos
+        self.size = len(self.tiles)
+
+    def remove(self, tiles):
+        """
+        Take tiles out of the free part; tiles that are outside the region or not free are ignored
+        """
+        idx = self.pos[tiles]
+        idx = np.unique(idx[(idx >= 0) & (idx < self.size)])
+        if len(idx) == 0:
+            return
+        new_size = self.size - len(idx)
+        # the free tiles at the end that are not being removed fill the holes left below new_size
+        in_tail = np.zeros(len(idx), dtype=bool)
+        in_tail[idx[idx >= new_size] - new_size] = True
+        fillers = np.arange(new_size, self.size)[~in_tail]
+        holes = idx[idx < new_size]
+        taken, kept = self.tiles[holes], self.tiles[fillers]
+        self.tiles[holes], self.tiles[fillers] = kept, taken
+        self.pos[kept], self.pos[taken] = holes, fillers
+        self.size = new_size
+
+
+class Placement:
+    """
+    Free tiles of a width x height world, per named region, e.g.
+        Placement(18, 18, {KIND_PLANT: Region(1, 16, 4, 15)})
+    The free tiles only cover placement at reset: after clear(), they account for the tiles taken since, but not for
+    entities that are later put down, picked up or moved.
+    """
+
+    def __init__(self, width, height, regions):
+        self.width = width
+        self.height = height
+        self.regions = dict(regions)
+        self.free = {name: FreeTiles(region.tiles(width, height), width * height)
+                     for name, region in self.regions.items()}
+
+    def clear(self):
+        """
+        Make every tile free again
+        """
+        for free in self.free.values():
+            free.clear()
+
+    def num_free(self, name):
+        return self.free[name].size
+
+    def take(self, name, k, random=rnd):
+        """
+        Take k distinct free tiles of a region, chosen uniformly at random
+        :param random: the random.Random (or the random module) to draw from
+        :return: arrays of the x and y of the tiles
+        """
+        free = self.free[name]
+        if k > free.size:
+            raise ValueError(f"cannot place {k} entities in region {name!r}, only {free.size} free tiles left")
+        tiles = free.tiles[random.sample(range(free.size), k)]
+        self.occupy(tiles)
+        return tiles % self.width, tiles // self.width
+
+    def occupy(self, tiles):
+        """
+        Mark flat tile indices as taken in every region
+        """
+        tiles = np.atleast_1d(tiles)
+        for free in self.free.values():
+            free.remove(tiles)
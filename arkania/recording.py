@@ -0,0 +1,203 @@
+"""
+Writing rendered frames to disk on a background thread
+
+A FrameWriter owns a bounded queue and a worker thread.  The env loop hands it frames with submit(), which never
+waits: when the queue is full, the frame is dropped (and counted).  There is no backpressure on the env, so a slow
+encoder costs frames rather than env steps.  The worker encodes to one of:
+    png  - a numbered PNG sequence in a directory (no dependencies)
+    gif  - an animated GIF (needs Pillow)
+    mp4  - H.264 video (needs an ffmpeg binary on the PATH)
+"""
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import threading
+import zlib
+import numpy as np
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+FORMATS = ('png', 'gif', 'mp4')
+
+
+def write_png(path, frame):
+    """
+    :param frame: <height x width x 3> uint8 RGB array, top row first (as returned by render('rgb_array'))
+    """
+    height, width = frame.shape[:2]
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = np.asarray(frame, dtype=np.uint8)[:, :, :3].reshape(height, -1)
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)))
+        f.write(chunk(b'IEND', b''))
+
+
+def format_of(path):
+    """
+    :return: the format implied by a path: its extension, or 'png' for a directory
+    """
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    return ext if ext in ('gif', 'mp4') else 'png'
+
+
+def check_format(fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format {fmt!r}, expected one of {FORMATS}")
+    if fmt == 'gif' and Image is None:
+        raise ImportError("writing GIFs needs Pillow (pip install pillow)")
+    if fmt == 'mp4' and shutil.which('ffmpeg') is None:
+        raise RuntimeError("writing MP4 needs an ffmpeg binary on the PATH")
+
+
+class PngSequence:
+    def __init__(self, path, fps):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.count = 0
+
+    def write(self, frame):
+        write_png(os.path.join(self.path, f"frame_{self.count:06d}.png"), frame)
+        self.count += 1
+
+    def close(self):
+        pass
+
+
+class GifWriter:
+    def __init__(self, path, fps):
+        self.path = path
+        self.duration = int(round(1000 / fps))
+        self.frames = []
+
+    def write(self, frame):
+        # quantize as the frames arrive so only the small palette images are kept until the end
+        self.frames.append(Image.fromarray(frame[:, :, :3]).quantize(256))
+
+    def close(self):
+        if self.frames:
+            self.frames[0].save(self.path, save_all=True, append_images=self.frames[1:], duration=self.duration,
+                                loop=0)
+        self.frames = []
+
+
+class Mp4Writer:
+    def __init__(self, path, fps):
+        self.path = path
+        self.fps = fps
+        self.proc = None
+
+    def write(self, frame):
+        if self.proc is None:
+            height, width = frame.shape[:2]
+            self.proc = subprocess.Popen(
+                ['ffmpeg', '-loglevel', 'error', '-y', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+                 '-s', f"{width}x{height}", '-r', str(self.fps), '-i', '-',
+                 '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p', '-vcodec', 'libx264', self.path],
+                stdin=subprocess.PIPE)
+        self.proc.stdin.write(np.ascontiguousarray(frame[:, :, :3]).tobytes())
+
+    def close(self):
+        if self.proc is not None:
+            self.proc.stdin.close()
+            self.proc.wait()
+            self.proc = None
+
+
+WRITERS = {'png': PngSequence, 'gif': GifWriter, 'mp4': Mp4Writer}
+
+
+class FrameWriter:
+    """
+    Encodes frames on a background thread.  Call open() to start a new output file, submit() for every frame and
+    close() at the end.  At most `max_queue` frames wait in the queue, and submit() drops a frame when they are all
+    taken.  The open and close commands never take a slot, so they are never dropped, and open() returns at once;
+    close() blocks until the worker has encoded everything queued before it and finished.
+    """
+
+    def __init__(self, fps=20, max_queue=64):
+        self.fps = fps
+        self.queue = queue.Queue()
+        self.slots = threading.BoundedSemaphore(max_queue)
+        self.submitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.error = None
+        self._closed = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def open(self, path, fmt=None):
+        """
+        Finish the current output (if any) and send the following frames to path
+        """
+        fmt = fmt or format_of(path)
+        check_format(fmt)
+        self.queue.put(('open', path, fmt))
+
+    def submit(self, frame):
+        """
+        Queue a frame without waiting
+        :param frame: an RGB array, or a callable returning one, which is only called when the frame will be kept
+                      (so a frame that would be dropped is not even rendered)
+        :return: False if the queue was full and the frame was dropped
+        :raises: the encoder's error, once it has failed (the frame is counted as dropped)
+        """
+        self.submitted += 1
+        if self.error is not None:
+            self.dropped += 1
+            raise self.error
+        if not self.slots.acquire(blocking=False):
+            self.dropped += 1
+            return False
+        if callable(frame):
+            try:
+                frame = frame()
+            except BaseException:
+                self.slots.release()
+                raise
+        self.queue.put(('frame', frame))
+        return True
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.queue.put(('close',))
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def _run(self):
+        writer = None
+        while True:
+            item = self.queue.get()
+            kind = item[0]
+            try:
+                if kind == 'frame':
+                    self.slots.release()
+                    if writer is not None:
+                        writer.write(item[1])
+                        self.written += 1
+                else:
+                    if writer is not None:
+                        writer.close()
+                        writer = None
+                    if kind == 'open':
+                        writer = WRITERS[item[2]](item[1], self.fps)
+            except Exception as e:
+                # keep draining the queue so the env loop never stalls; the error is raised from submit() and close()
+                self.error = self.error or e
+                writer = None
+            if kind == 'close':
+                return
@@ -0,0 +1,135 @@
+"""
+Rollout driver that overlaps env stepping with batched policy inference
+
+The envs are split into two groups (A and B).  While group A steps on a worker thread, the policy runs on the
+batched observations of group B, and then the roles swap:
+
+    worker thread:  | step A | step B | step A | step B | ...
+    main thread:    | policy B | policy A | policy B | ...
+
+The policy callback takes a (num_envs x observation_size) float32 array and returns one integer action per row.
+Stepping SimpleEnv holds the GIL, so the overlap comes from policies that release it (numpy, torch, ...) or from
+groups whose step() waits on I/O, such as RemoteVectorEnv.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .vector_env import SimpleVectorEnv
+
+
+class RolloutStats:
+    def __init__(self):
+        self.steps = 0
+        self.wall_time = 0.0
+        self.env_busy = 0.0
+        self.policy_busy = 0.0
+        self.episode_returns = []
+        self.episode_lengths = []
+
+    @property
+    def steps_per_sec(self):
+        return self.steps / self.wall_time if self.wall_time > 0 else 0.0
+
+    @property
+    def env_idle(self):
+        """
+        Seconds the env worker spent waiting for actions
+        """
+        return max(self.wall_time - self.env_busy, 0.0)
+
+    @property
+    def policy_idle(self):
+        """
+        Seconds the policy spent waiting for observations
+        """
+        return max(self.wall_time - self.policy_busy, 0.0)
+
+    def __str__(self):
+        wall = max(self.wall_time, 1e-9)
+        return (f"{self.steps} steps in {self.wall_time:.2f}s ({self.steps_per_sec:.0f} steps/sec), "
+                f"env idle {100 * self.env_idle / wall:.1f}%, policy idle {100 * self.policy_idle / wall:.1f}%, "
+                f"{len(self.episode_returns)} episodes")
+
+
+class PipelinedRollout:
+    def __init__(self, policy, num_envs=16, groups=None, on_step=None, **env_kwargs):
+        """
+        :param policy: callable mapping a batch of flat observations to a batch of actions
+        :param num_envs: total number of envs, split evenly between the two groups (at least 2)
+        :param groups: optionally, a pair of already constructed vector envs to use instead
+        :param on_step: optional callback on_step(group_index, obs, actions, rewards, dones, next_obs)
+        """
+        if groups is None:
+            if num_envs < 2:
+                raise ValueError(f"the envs are split into two groups, so at least 2 are needed, got {num_envs}")
+            half = num_envs // 2
+            groups = (SimpleVectorEnv(half, **env_kwargs), SimpleVectorEnv(num_envs - half, **env_kwargs))
+        self.groups = groups
+        self.policy = policy
+        self.on_step = on_step
+        self.stats = RolloutStats()
+        self._returns = [np.zeros(g.num_envs) for g in groups]
+        self._lengths = [np.zeros(g.num_envs, dtype=int) for g in groups]
+        self._obs = None
+        self._worker = ThreadPoolExecutor(max_workers=1)
+
+    def _act(self, obs):
+        t0 = time.perf_counter()
+        actions = np.asarray(self.policy(obs))
+        self.stats.policy_busy += time.perf_counter() - t0
+        return actions
+
+    def _step(self, group, actions):
+        t0 = time.perf_counter()
+        result = self.groups[group].step(actions)
+        return result, time.perf_counter() - t0
+
+    def _finish(self, group, actions, future):
+        (next_obs, rewards, dones, _), busy = future.result()
+        self.stats.env_busy += busy
+        self.stats.steps += len(rewards)
+        if self.on_step is not None:
+            self.on_step(group, self._obs[group], actions, rewards, dones, next_obs)
+
+        self._returns[group] += rewards
+        self._lengths[group] += 1
+        for i in np.flatnonzero(dones):
+            self.stats.episode_returns.append(float(self._returns[group][i]))
+            self.stats.episode_lengths.append(int(self._lengths[group][i]))
+        self._returns[group][dones] = 0
+        self._lengths[group][dones] = 0
+        self._obs[group] = next_obs
+
+    def run(self, steps):
+        """
+        Step every env `steps` times
+        :return: the RolloutStats accumulated over all calls to run()
+        """
+        if steps <= 0:
+            return self.stats
+        t_start = time.perf_counter()
+        if self._obs is None:
+            self._obs = [g.reset() for g in self.groups]
+
+        actions = self._act(self._obs[0])
+        pending = (0, actions, self._worker.submit(self._step, 0, actions))
+        for t in range(2 * steps - 1):
+            group = (t + 1) % 2
+            actions = self._act(self._obs[group])
+            self._finish(*pending)
+            pending = (group, actions, self._worker.submit(self._step, group, actions))
+        self._finish(*pending)
+
+        self.stats.wall_time += time.perf_counter() - t_start
+        return self.stats
+
+    def close(self):
+        self._worker.shutdown()
+        for g in self.groups:
+            g.close()
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    rollout = PipelinedRollout(lambda obs: rng.integers(0, 8, size=len(obs)), num_envs=32)
+    print(rollout.run(500))
@@ -0,0 +1,87 @@
+"""
+Ray-cast vision for the continuous world
+
+Each agent casts K rays, and each ray reports the distance to the first thing it hits and what that was: an entity
+(a circle of `radius` around its position, reported by its kind) or the edge of the world (HIT_WALL).  All agents and
+rays are evaluated together: the spatial hash gives every agent the entities within reach of its rays, then every
+(candidate, ray) pair is one ray / circle intersection test in a single numpy expression.
+
+Cost target: 64 agents x 32 rays in a world of 1000 entities under 1 ms per step (benchmarks/bench_sensors.py).
+"""
+import numpy as np
+from .entities import KIND_NONE
+
+HIT_WALL = 6
+
+
+def ray_directions(num_rays, headings=None):
+    """
+    :param num_rays: rays spread evenly over the full circle, the first one along the heading
+    :param headings: optional heading (radians, 0 = east, counter-clockwise) of each agent
+    :return: <K x 2> unit vectors, or <m x K x 2> with headings
+    """
+    angles = 2 * np.pi * np.arange(num_rays) / num_rays
+    if headings is not None:
+        angles = np.asarray(headings)[:, None] + angles[None, :]
+    return np.stack([np.cos(angles), np.sin(angles)], axis=-1).astype(np.float32)
+
+
+def wall_distance(origins, dirs, size):
+    """
+    :return: <m x K> distance along each ray to the edge of a size x size world
+    """
+    o = origins[:, None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(dirs > 0, (size - o) / dirs, np.where(dirs < 0, -o / dirs, np.inf))
+    return t.min(axis=-1)
+
+
+def cast_rays(spatial_hash, kinds, origins, dirs, max_dist, radius, size, skip=None):
+    """
+    :param spatial_hash: a SpatialHash built over the entity positions
+    :param kinds: kind of every indexed entity
+    :param origins: <m x 2> positions the rays start from
+    :param dirs: <K x 2> or <m x K x 2> unit ray directions (see ray_directions)
+    :param max_dist: length of the rays
+    :param radius: radius of the entities
+    :param size: size of the (square) world
+    :param skip: optional entity index of each origin, so an agent does not see itself
+    :return: <m x K> float32 distances (max_dist where nothing is hit) and <m x K> uint8 hit kinds
+             (KIND_NONE where nothing is hit)
+    """
+    origins = np.asarray(origins, dtype=np.float32)
+    m = len(origins)
+    dirs = np.broadcast_to(dirs, (m,) + np.shape(dirs)[-2:])
+    num_rays = dirs.shape[1]
+    dist = np.full((m, num_rays), np.inf, dtype=np.float32)
+    hit = np.zeros((m, num_rays), dtype=np.uint8)
+
+    q, e = spatial_hash.neighbors(origins, max_dist + radius)
+    if skip is not None:
+        keep = e != np.asarray(skip)[q]
+        q, e = q[keep], e[keep]
+    if len(q):
+        rel = spatial_hash.pos[e] - origins[q]
+        along = np.einsum('pd,pkd->pk', rel, dirs[q])
+        off2 = (rel * rel).sum(axis=1)[:, None] - along * along
+        inside = radius * radius - off2
+        t = along - np.sqrt(np.maximum(inside, 0))
+        t = np.where((inside >= 0) & (along + np.sqrt(np.maximum(inside, 0)) >= 0), np.maximum(t, 0), np.inf)
+
+        # pairs come ordered by query, so the nearest hit of every ray is a min over a contiguous segment
+        starts = np.flatnonzero(np.r_[True, q[1:] != q[:-1]])
+        owners = q[starts]
+        nearest = np.minimum.reduceat(t, starts, axis=0)
+        dist[owners] = nearest
+        segment = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(q)]))
+        p, k = np.nonzero((t == nearest[segment]) & np.isfinite(t))
+        hit[q[p], k] = kinds[e[p]]
+
+    walls = wall_distance(origins, dirs, size)
+    wall_first = walls < dist
+    dist[wall_first] = walls[wall_first]
+    hit[wall_first] = HIT_WALL
+    beyond = dist > max_dist
+    dist[beyond] = max_dist
+    hit[beyond] = KIND_NONE
+    return dist, hit
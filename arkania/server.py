@@ -0,0 +1,294 @@
+"""
+Asyncio server that hosts a pool of SimpleEnv instances, and a matching client that looks like a vector env
+
+Wire format - every frame is a little-endian u32 byte length followed by the body.  Every body starts with the
+header (op u8, seq u32, n u16) and is followed by column arrays:
+
+    HELLO  server -> client   n = number of envs in the pool, then sight_size u16, flags u8
+    RESET  client -> server   env indices u16[n]
+    STEP   client -> server   env indices u16[n], actions u8[n]
+    OBS    server -> client   env indices u16[n], rewards f32[n], dones u8[n], vitals f32[n, 4], in_hand u8[n],
+                              sight i8[n, (2N+1)^2]
+    DELTA  server -> client   (instead of OBS when the HELLO flags have FLAG_DELTA set) env indices u16[n],
+                              rewards f32[n], dones u8[n], record lengths u16[n], then one delta.py record per env
+
+A client may send any number of RESET / STEP frames before reading the replies (pipelining); the server answers
+them in order, and each OBS frame carries the seq of the request it answers.  Envs that finish an episode during a
+STEP are reset by the server, as in SimpleVectorEnv.
+
+Run a server with:
+    python -m arkania.server --port 5555 --num-envs 64
+    python -m arkania.server --unix /tmp/arkania.sock --num-envs 64
+    python -m arkania.server --port 5555 --num-envs 64 --delta
+"""
+import argparse
+import asyncio
+import socket
+import struct
+import numpy as np
+from .delta import DeltaEncoder, DeltaDecoder
+from .simple_env import SimpleEnv
+from .vector_env import VITALS, SIGHT_SIZE, observation_size
+
+OP_HELLO = 0
+OP_RESET = 1
+OP_STEP = 2
+OP_OBS = 3
+OP_DELTA = 4
+
+FLAG_DELTA = 1
+
+LENGTH = struct.Struct('<I')
+HEADER = struct.Struct('<BIH')
+SIGHT = struct.Struct('<HB')
+
+MAX_ENVS = 0xFFFF
+
+
+def encode_obs(seq, indices, rewards, dones, states):
+    n = len(indices)
+    vitals = np.array([[s[k] for k in VITALS] for s in states], dtype=np.float32).reshape(n, len(VITALS))
+    in_hand = np.array([s['in_hand'] for s in states], dtype=np.uint8)
+    sight = np.array([s['sight'] for s in states], dtype=np.int8).reshape(n, -1)
+    body = b''.join([HEADER.pack(OP_OBS, seq, n),
+                     np.asarray(indices, dtype='<u2').tobytes(),
+                     np.asarray(rewards, dtype='<f4').tobytes(),
+                     np.asarray(dones, dtype=np.uint8).tobytes(),
+                     vitals.astype('<f4').tobytes(),
+                     in_hand.tobytes(),
+                     sight.tobytes()])
+    return LENGTH.pack(len(body)) + body
+
+
+def decode_obs(body, sight_size=SIGHT_SIZE):
+    """
+    :return: seq, env indices, rewards, dones and flat observations (n x observation_size)
+    """
+    op, seq, n = HEADER.unpack_from(body)
+    if op != OP_OBS:
+        raise ValueError(f"expected an OBS frame, got op {op}")
+    cells = (2 * sight_size + 1) ** 2
+    offset = HEADER.size
+    indices = np.frombuffer(body, '<u2', n, offset)
+    offset += 2 * n
+    rewards = np.frombuffer(body, '<f4', n, offset)
+    offset += 4 * n
+    dones = np.frombuffer(body, np.uint8, n, offset).astype(bool)
+    offset += n
+    vitals = np.frombuffer(body, '<f4', n * len(VITALS), offset).reshape(n, len(VITALS))
+    offset += 4 * n * len(VITALS)
+    in_hand = np.frombuffer(body, np.uint8, n, offset)
+    offset += n
+    sight = np.frombuffer(body, np.int8, n * cells, offset).reshape(n, cells)
+
+    obs = np.empty((n, observation_size(sight_size)), dtype=np.float32)
+    obs[:, :len(VITALS)] = vitals
+    obs[:, len(VITALS)] = in_hand
+    obs[:, len(VITALS) + 1:] = sight
+    return seq, indices, rewards, dones, obs
+
+
+def encode_delta(seq, indices, rewards, dones, records):
+    body = b''.join([HEADER.pack(OP_DELTA, seq, len(indices)),
+                     np.asarray(indices, dtype='<u2').tobytes(),
+                     np.asarray(rewards, dtype='<f4').tobytes(),
+                     np.asarray(dones, dtype=np.uint8).tobytes(),
+                     np.array([len(r) for r in records], dtype='<u2').tobytes()] + records)
+    return LENGTH.pack(len(body)) + body
+
+
+def decode_delta(body, decoders, out):
+    """
+    Apply the records of a DELTA frame to the decoder of each env, writing the observations into rows of out
+    :return: seq, env indices, rewards and dones
+    """
+    op, seq, n = HEADER.unpack_from(body)
+    if op != OP_DELTA:
+        raise ValueError(f"expected a DELTA frame, got op {op}")
+    offset = HEADER.size
+    indices = np.frombuffer(body, '<u2', n, offset)
+    offset += 2 * n
+    rewards = np.frombuffer(body, '<f4', n, offset)
+    offset += 4 * n
+    dones = np.frombuffer(body, np.uint8, n, offset).astype(bool)
+    offset += n
+    lengths = np.frombuffer(body, '<u2', n, offset)
+    offset += 2 * n
+    for i, length in zip(indices, lengths):
+        out[i] = decoders[i].decode(body[offset:offset + length])
+        offset += length
+    return seq, indices, rewards, dones
+
+
+def encode_request(op, seq, indices, actions=None):
+    parts = [HEADER.pack(op, seq, len(indices)), np.asarray(indices, dtype='<u2').tobytes()]
+    if actions is not None:
+        parts.append(np.asarray(actions, dtype=np.uint8).tobytes())
+    body = b''.join(parts)
+    return LENGTH.pack(len(body)) + body
+
+
+#-----------------------------------------------------------------------------------------------
+class EnvServer:
+    def __init__(self, num_envs=16, delta=False, keyframe_interval=100, **env_kwargs):
+        """
+        :param delta: send observations as DELTA frames, only what changed since the previous observation of each env
+        :param keyframe_interval: with delta, number of steps between full observations of an env
+        """
+        if num_envs > MAX_ENVS:
+            raise ValueError(f"at most {MAX_ENVS} envs can be served")
+        self.envs = [SimpleEnv(**env_kwargs) for _ in range(num_envs)]
+        self.delta = delta
+        self.keyframe_interval = keyframe_interval
+        self.server = None
+
+    def _encode(self, encoders, seq, indices, rewards, dones, states):
+        if encoders is None:
+            return encode_obs(seq, indices, rewards, dones, states)
+        records = [encoders[i].encode(state) for i, state in zip(indices, states)]
+        return encode_delta(seq, indices, rewards, dones, records)
+
+    def _reset(self, encoders, seq, indices):
+        states = [self.envs[i].reset() for i in indices]
+        if encoders is not None:
+            for i in indices:
+                encoders[i].keyframe()
+        zeros = np.zeros(len(indices))
+        return self._encode(encoders, seq, indices, zeros, zeros, states)
+
+    def _step(self, encoders, seq, indices, actions):
+        n = len(indices)
+        rewards = np.zeros(n, dtype=np.float32)
+        dones = np.zeros(n, dtype=bool)
+        states = []
+        for j in range(n):
+            i = indices[j]
+            state, rewards[j], dones[j], _ = self.envs[i].step(int(actions[j]))
+            if dones[j]:
+                state = self.envs[i].reset()
+            states.append(state)
+        return self._encode(encoders, seq, indices, rewards, dones, states)
+
+    async def handle(self, reader, writer):
+        # every connection has its own delta streams, starting from keyframes, since each one is encoded against
+        # what that client has received
+        encoders = [DeltaEncoder(self.keyframe_interval) for _ in self.envs] if self.delta else None
+        body = HEADER.pack(OP_HELLO, 0, len(self.envs)) + SIGHT.pack(SIGHT_SIZE, FLAG_DELTA if self.delta else 0)
+        writer.write(LENGTH.pack(len(body)) + body)
+        try:
+            while True:
+                size, = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+                body = await reader.readexactly(size)
+                op, seq, n = HEADER.unpack_from(body)
+                indices = np.frombuffer(body, '<u2', n, HEADER.size)
+                if op == OP_RESET:
+                    writer.write(self._reset(encoders, seq, indices))
+                elif op == OP_STEP:
+                    actions = np.frombuffer(body, np.uint8, n, HEADER.size + 2 * n)
+                    writer.write(self._step(encoders, seq, indices, actions))
+                else:
+                    raise ValueError(f"unexpected op {op}")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=5555, path=None):
+        """
+        Start listening on a TCP port, or on a unix socket if a path is given
+        """
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle, path=path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host=host, port=port)
+        return self.server
+
+    async def serve_forever(self, host='127.0.0.1', port=5555, path=None):
+        await self.start(host, port, path)
+        async with self.server:
+            await self.server.serve_forever()
+
+
+def run_server(num_envs=16, host='127.0.0.1', port=5555, path=None, delta=False, keyframe_interval=100):
+    asyncio.run(EnvServer(num_envs, delta, keyframe_interval).serve_forever(host, port, path))
+
+
+#-----------------------------------------------------------------------------------------------
+class RemoteVectorEnv:
+    """
+    Client for an EnvServer with the same interface as SimpleVectorEnv.
+
+    step() sends the actions as several frames of at most `chunk` envs each before reading any reply, so the server
+    starts stepping the first chunk while the rest are still on their way.
+    """
+
+    def __init__(self, host='127.0.0.1', port=5555, path=None, chunk=None):
+        if path is not None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(path)
+        else:
+            self.sock = socket.create_connection((host, port))
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.sock.makefile('rb')
+        self.bytes_received = 0
+        body = self._read()
+        op, _, self.num_envs = HEADER.unpack_from(body)
+        if op != OP_HELLO:
+            raise ValueError(f"expected a HELLO frame, got op {op}")
+        self.sight_size, flags = SIGHT.unpack_from(body, HEADER.size)
+        self.observation_size = observation_size(self.sight_size)
+        self.decoders = [DeltaDecoder(self.sight_size) for _ in range(self.num_envs)] if flags & FLAG_DELTA else None
+        self.chunk = chunk or self.num_envs
+        self.seq = 0
+        self._obs = np.zeros((self.num_envs, self.observation_size), dtype=np.float32)
+
+    def _read(self):
+        size, = LENGTH.unpack(self.file.read(LENGTH.size))
+        self.bytes_received += LENGTH.size + size
+        return self.file.read(size)
+
+    def _request(self, op, actions=None):
+        frames = []
+        for start in range(0, self.num_envs, self.chunk):
+            indices = np.arange(start, min(start + self.chunk, self.num_envs))
+            self.seq = (self.seq + 1) & 0xFFFFFFFF
+            frames.append(encode_request(op, self.seq, indices, None if actions is None else actions[indices]))
+        self.sock.sendall(b''.join(frames))
+
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        dones = np.zeros(self.num_envs, dtype=bool)
+        for _ in frames:
+            if self.decoders is not None:
+                _, indices, r, d = decode_delta(self._read(), self.decoders, self._obs)
+            else:
+                _, indices, r, d, obs = decode_obs(self._read(), self.sight_size)
+                self._obs[indices] = obs
+            rewards[indices] = r
+            dones[indices] = d
+        return self._obs.copy(), rewards, dones
+
+    def reset(self):
+        obs, _, _ = self._request(OP_RESET)
+        return obs
+
+    def step(self, actions):
+        obs, rewards, dones = self._request(OP_STEP, np.asarray(actions, dtype=np.uint8))
+        return obs, rewards, dones, [{} for _ in range(self.num_envs)]
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a pool of SimpleEnv instances")
+    parser.add_argument('--num-envs', type=int, default=16)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5555)
+    parser.add_argument('--unix', default=None, help="path of a unix socket to listen on instead of TCP")
+    parser.add_argument('--delta', action='store_true', help="send only what changed in each observation")
+    parser.add_argument('--keyframe-interval', type=int, default=100,
+                        help="with --delta, steps between full observations of an env")
+    args = parser.parse_args()
+    run_server(args.num_envs, args.host, args.port, args.unix, args.delta, args.keyframe_interval)
@@ -0,0 +1,563 @@
+"""
+One large SimpleEnv-style world split into rectangular shards, each stepped by its own process
+
+The world is a grid of copies of the SimpleEnv map with many agents in it, living by the same rules as the agent of
+SimpleEnv (vitals, moves, picking up, putting down, consuming, growing plants).  The rules are the ones of
+functional.py, applied to the rows of the agent table, except for picking up and putting down, which change tiles
+and run one agent at a time.  A Shard owns a rectangle of the world: the terrain, the plants, the items on the ground
+and the agents standing there.  Each shard keeps its grids padded by a halo as wide as the sight radius, so every
+sight window it builds is local.
+
+Everything the shards share lives in one block of shared memory:
+  - the agent table, where each row is written only by the shard that owns the agent
+  - the actions, observations, rewards and dones of every agent
+  - the world grids, through which the halos are exchanged: after a tick, each shard writes the bands along the
+    edges of its rectangle, and after a barrier it reads the bands of its neighbours into its halo
+
+An agent that moves out of a rectangle migrates by changing the owner in its row; the new owner picks it up after the
+barrier.  Items never cross an edge on their own: food and stones only move in an agent's hand, and thrown stones do
+not exist yet (throwing does nothing in SimpleEnv).
+
+With communication=True, agents can also say a symbol each tick (see communication.py): the step takes one symbol
+per agent next to the actions, and each observation ends with what the agent hears in its sight window.  What is
+said on each tile is one more grid, exchanged through the halos like the others, but only after one more barrier, once
+the agents that changed shards on the tick have arrived at their new owners.
+
+Agents only ever touch the tile they stand on, so two agents that interact are always in the same shard, and each
+shard handles its agents in order of their index.  A sharded run is therefore identical to a single-process run
+(GridWorld) with the same seed, whatever the number of shards.
+
+The processes are forked (Linux), so they share the mapping of the block created by the parent.
+"""
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+from .actions import REST, MOVE_NORTH, MOVE_WEST, PICK_UP, PUT_DOWN, CONSUME
+from .entities import PLANT_RIPE
+from .functional import vitals_tick, rest, move, consume, grow_plants
+from .simple_env import build_map, BEACH_TILES, ROCK, FOREST, WATER, NORTH, HAND_EMPTY, HAND_FOOD, HAND_WATER, \
+    HAND_STONE
+from .vector_env import VITALS, SIGHT_SIZE, observation_size
+from .vision import padded_terrain_codes, windows, overlay_objects
+from .communication import SymbolChannel, SILENT, hearing_size
+
+# columns of the agent table
+A_X, A_Y, A_FACING, A_IN_HAND, A_HEALTH, A_ENERGY, A_FOOD, A_WATER, A_AGE, A_ALIVE, A_OWNER = range(11)
+NUM_COLUMNS = 11
+
+PLANTS_PER_BLOCK = 12
+
+# the grids a shard's neighbours need in its halo
+HALO_GRIDS = ('plant_stage', 'food_count', 'stone_count')
+
+# commands from the driver to the shard processes
+CMD_STOP = 0
+CMD_STEP = 1
+CMD_RESET = 2
+CMD_STORE = 3
+
+
+def make_world(blocks=(2, 2), num_agents=64, seed=2021):
+    """
+    :param blocks: (columns, rows) of copies of the SimpleEnv map
+    :return: dict of the arrays of a new world: tiles, plant_stage, plant_counter, food_count, stone_count (all
+             indexed [y, x]) and agents (<num_agents x NUM_COLUMNS>)
+    """
+    rng = np.random.default_rng(seed)
+    block = build_map()
+    tiles = np.tile(block, (blocks[1], blocks[0]))
+    height, width = tiles.shape
+    plant_stage = np.full((height, width), -1, dtype=np.int16)
+    # plants go in the same part of every block as in SimpleEnv.reset()
+    region = np.flatnonzero(np.pad(np.ones((12, 16), dtype=bool), ((4, 2), (1, 1))).ravel())
+    for by in range(blocks[1]):
+        for bx in range(blocks[0]):
+            cells = rng.choice(region, PLANTS_PER_BLOCK, replace=False)
+            ys, xs = by * block.shape[0] + cells // block.shape[1], bx * block.shape[1] + cells % block.shape[1]
+            plant_stage[ys, xs] = rng.integers(0, PLANT_RIPE + 1, PLANTS_PER_BLOCK)
+
+    safe = np.flatnonzero(~np.isin(tiles, [ROCK, FOREST, WATER]).ravel())
+    cells = rng.choice(safe, num_agents, replace=False)
+    agents = np.zeros((num_agents, NUM_COLUMNS))
+    agents[:, A_X], agents[:, A_Y] = cells % width, cells // width
+    agents[:, A_FACING] = NORTH
+    agents[:, [A_HEALTH, A_ENERGY, A_FOOD, A_WATER]] = 100.0
+    agents[:, A_ALIVE] = 1
+    return {'tiles': tiles,
+            'plant_stage': plant_stage,
+            'plant_counter': np.zeros((height, width), dtype=np.int16),
+            'food_count': np.zeros((height, width), dtype=np.int16),
+            'stone_count': np.zeros((height, width), dtype=np.int16),
+            'agents': agents}
+
+
+def shard_layout(num_shards):
+    """
+    :return: (columns, rows) of a grid of num_shards shards, as close to square as possible
+    """
+    rows = int(np.sqrt(num_shards))
+    while num_shards % rows:
+        rows -= 1
+    return num_shards // rows, rows
+
+
+def shard_edges(size, parts):
+    return np.linspace(0, size, parts + 1).round().astype(int)
+
+
+def _select(which, new, old):
+    """
+    :return: the arrays of `new` where `which` is True, else those of `old`
+    """
+    return tuple(np.where(which, u, v) for u, v in zip(new, old))
+
+
+class Partition:
+    """
+    The rectangles of a width x height world split into a grid of shards, numbered row by row from the south-west
+    """
+
+    def __init__(self, width, height, num_shards):
+        self.columns, self.rows = shard_layout(num_shards)
+        self.x_edges = shard_edges(width, self.columns)
+        self.y_edges = shard_edges(height, self.rows)
+        if np.any(np.diff(self.x_edges) < 1) or np.any(np.diff(self.y_edges) < 1):
+            raise ValueError(f"a {width} x {height} world is too small for {num_shards} shards")
+
+    def rect(self, index):
+        """
+        :return: (x0, x1, y0, y1) of the shard, half-open
+        """
+        i, j = index % self.columns, index // self.columns
+        return self.x_edges[i], self.x_edges[i + 1], self.y_edges[j], self.y_edges[j + 1]
+
+    def owner(self, xs, ys):
+        i = np.searchsorted(self.x_edges, xs, side='right') - 1
+        j = np.searchsorted(self.y_edges, ys, side='right') - 1
+        return j * self.columns + i
+
+
+class Shard:
+    """
+    The part of the world in one rectangle, with its grids padded by a halo of `halo` tiles
+    :param arrays: the shared arrays (see SharedWorld), which the shard reads from and writes to
+    """
+
+    def __init__(self, arrays, partition, index, halo=SIGHT_SIZE):
+        self.arrays = arrays
+        self.partition = partition
+        self.index = index
+        self.halo = halo
+        self.x0, self.x1, self.y0, self.y1 = partition.rect(index)
+        self.height, self.width = arrays['tiles'].shape
+        self.load()
+
+    def _padded(self, world, fill):
+        """
+        :return: the shard's window of a world array, padded by the halo, with `fill` beyond the edge of the world
+        """
+        h = self.halo
+        out = np.full((self.y1 - self.y0 + 2 * h, self.x1 - self.x0 + 2 * h), fill, dtype=world.dtype)
+        ys, ye = max(self.y0 - h, 0), min(self.y1 + h, self.height)
+        xs, xe = max(self.x0 - h, 0), min(self.x1 + h, self.width)
+        out[ys - self.y0 + h:ye - self.y0 + h, xs - self.x0 + h:xe - self.x0 + h] = world[ys:ye, xs:xe]
+        return out
+
+    def load(self):
+        """
+        Take the shard's part of the world (and its halo) from the shared arrays, e.g. after a reset
+        """
+        a = self.arrays
+        h = self.halo
+        self.tiles = self._padded(a['tiles'], -1)
+        codes = padded_terrain_codes(a['tiles'], h)
+        self.codes = codes[self.y0:self.y1 + 2 * h, self.x0:self.x1 + 2 * h].copy()
+        self.plant_stage = self._padded(a['plant_stage'], -1)
+        self.plant_counter = self._padded(a['plant_counter'], 0)
+        self.food_count = self._padded(a['food_count'], 0)
+        self.stone_count = self._padded(a['stone_count'], 0)
+        self.beach = np.isin(self.tiles, BEACH_TILES)
+        self.interior = (slice(h, h + self.y1 - self.y0), slice(h, h + self.x1 - self.x0))
+        self.channel = None
+        if 'said' in a:
+            self.channel = SymbolChannel(len(a['agents']), self.tiles.shape)
+            self.said = self.channel.said
+
+    def agents(self, died=False):
+        """
+        :return: indices of the agents owned by the shard, in increasing order (with died=True, also the ones that died
+                 on the last tick)
+        """
+        table = self.arrays['agents']
+        alive = table[:, A_ALIVE] > 0
+        if died:
+            alive |= self.arrays['dones'] & (self.arrays['rewards'] < 0)
+        return np.flatnonzero(alive & (table[:, A_OWNER] == self.index))
+
+    #-----------------------------------------------------------------------------------------------
+    def tick(self):
+        """
+        Step the agents the shard owns and its plants by one turn
+        """
+        arrays = self.arrays
+        table = arrays['agents']
+        ids = self.ids
+        a = table[ids]
+        actions = arrays['actions'][ids]
+        h = self.halo
+        x, y = a[:, A_X].astype(np.intp), a[:, A_Y].astype(np.intp)
+        health, energy, food, water = a[:, A_HEALTH], a[:, A_ENERGY], a[:, A_FOOD], a[:, A_WATER]
+        in_hand, facing = a[:, A_IN_HAND], a[:, A_FACING]
+
+        health, energy, food, water = vitals_tick(np, health, energy, food, water)
+        age = a[:, A_AGE] + 1
+        health, energy, food, water = _select(actions == REST, rest(np, health, energy, food, water),
+                                              (health, energy, food, water))
+        x, y, facing, health, energy = _select(
+            (actions >= MOVE_NORTH) & (actions <= MOVE_WEST),
+            move(np, actions, x, y, facing, health, energy, self.width, self.height,
+                 lambda xs, ys: self.tiles[ys - self.y0 + h, xs - self.x0 + h]),
+            (x, y, facing, health, energy))
+        health, energy, food, water, in_hand = _select(actions == CONSUME,
+                                                       consume(np, health, energy, food, water, in_hand),
+                                                       (health, energy, food, water, in_hand))
+
+        # picking up and putting down change the tile, so they run one agent at a time, in order
+        for i in np.flatnonzero(((actions == PICK_UP) | (actions == PUT_DOWN)) & (energy >= 1)).tolist():
+            energy[i] -= 1
+            ly, lx = y[i] - self.y0 + h, x[i] - self.x0 + h
+            if actions[i] == PUT_DOWN:
+                if in_hand[i] == HAND_FOOD:
+                    self.food_count[ly, lx] += 1
+                elif in_hand[i] == HAND_STONE:
+                    self.stone_count[ly, lx] += 1
+                in_hand[i] = HAND_EMPTY
+            elif in_hand[i] == HAND_EMPTY:
+                if self.plant_stage[ly, lx] == PLANT_RIPE:
+                    self.plant_stage[ly, lx] = 0
+                    self.plant_counter[ly, lx] = 0
+                    in_hand[i] = HAND_FOOD
+                if self.beach[ly, lx]:
+                    in_hand[i] = HAND_WATER
+                else:
+                    if self.food_count[ly, lx] > 0:
+                        self.food_count[ly, lx] -= 1
+                        in_hand[i] = HAND_FOOD
+                    if self.stone_count[ly, lx] > 0:
+                        self.stone_count[ly, lx] -= 1
+                        in_hand[i] = HAND_STONE
+
+        stage, counter = self.plant_stage[self.interior], self.plant_counter[self.interior]
+        plants = stage >= 0
+        stage[plants], counter[plants] = grow_plants(np, stage[plants], counter[plants])
+
+        died = health <= 0
+        a[:, A_X], a[:, A_Y], a[:, A_FACING], a[:, A_IN_HAND] = x, y, facing, in_hand
+        a[:, A_HEALTH], a[:, A_ENERGY], a[:, A_FOOD], a[:, A_WATER], a[:, A_AGE] = health, energy, food, water, age
+        a[died, A_ALIVE] = 0
+        a[:, A_OWNER] = self.partition.owner(x, y)
+        table[ids] = a
+        arrays['rewards'][ids] = np.where(died, -1000.0, 1.0)
+        arrays['dones'][ids] = died
+
+    def speak(self):
+        """
+        Write what is said on each tile of the rectangle.  The agents speak from where they stand after the turn, so
+        this waits until the agents that moved in from other shards are known (after tick() and a barrier).
+        """
+        h = self.halo
+        table = self.arrays['agents']
+        ids = self.agents()
+        self.channel.clear(self.interior)
+        self.channel.speak(ids, table[ids, A_X].astype(np.intp) - self.x0 + h,
+                           table[ids, A_Y].astype(np.intp) - self.y0 + h, self.arrays['symbols'][ids])
+
+    def publish(self, names=HALO_GRIDS):
+        """
+        Write the bands along the edges of the rectangle, which the neighbours need for their halos, to the shared grids
+        """
+        h = self.halo
+        rows, cols = self.y1 - self.y0, self.x1 - self.x0
+        bands = [(slice(0, min(h, rows)), slice(0, cols)), (slice(max(rows - h, 0), rows), slice(0, cols)),
+                 (slice(0, rows), slice(0, min(h, cols))), (slice(0, rows), slice(max(cols - h, 0), cols))]
+        for name in names:
+            local, world = getattr(self, name)[self.interior], self.arrays[name]
+            for r, c in bands:
+                world[self.y0 + r.start:self.y0 + r.stop, self.x0 + c.start:self.x0 + c.stop] = local[r, c]
+
+    def gather(self, names=HALO_GRIDS):
+        """
+        Read the neighbours' bands from the shared grids into the halo
+        """
+        h = self.halo
+        ys, ye = max(self.y0 - h, 0), min(self.y1 + h, self.height)
+        xs, xe = max(self.x0 - h, 0), min(self.x1 + h, self.width)
+        bands = [(slice(ys, self.y0), slice(xs, xe)), (slice(self.y1, ye), slice(xs, xe)),
+                 (slice(self.y0, self.y1), slice(xs, self.x0)), (slice(self.y0, self.y1), slice(self.x1, xe))]
+        for name in names:
+            local, world = getattr(self, name), self.arrays[name]
+            for r, c in bands:
+                local[r.start - self.y0 + h:r.stop - self.y0 + h, c.start - self.x0 + h:c.stop - self.x0 + h] = \
+                    world[r, c]
+
+    def observe(self):
+        """
+        Write the observation (in the flat layout of SimpleVectorEnv) of every agent the shard owns, and take the list
+        of the agents to step next
+        """
+        table = self.arrays['agents']
+        ids = self.agents(died=True)
+        # the agents to step on the next tick, read now: while they tick, the shards write the table
+        self.ids = ids[table[ids, A_ALIVE] > 0]
+        h = self.halo
+        xs = table[ids, A_X].astype(np.intp) - self.x0 + h
+        ys = table[ids, A_Y].astype(np.intp) - self.y0 + h
+        sight = windows(self.codes, 0, xs, ys, h)
+        overlay_objects(sight, windows(self.plant_stage, 0, xs, ys, h), windows(self.food_count, 0, xs, ys, h),
+                        windows(self.stone_count, 0, xs, ys, h))
+        obs = self.arrays['obs']
+        obs[ids, :len(VITALS)] = table[ids][:, [A_HEALTH, A_ENERGY, A_FOOD, A_WATER]]
+        obs[ids, len(VITALS)] = table[ids, A_IN_HAND]
+        obs[ids, len(VITALS) + 1:observation_size()] = sight.reshape(len(ids), hearing_size(h))
+        if self.channel is not None:
+            heard = self.channel.hear(xs, ys, h)
+            obs[ids, observation_size():] = heard.reshape(len(ids), hearing_size(h))
+
+    def store(self):
+        """
+        Write the whole rectangle to the shared grids (for a snapshot of the world)
+        """
+        for name in ('plant_stage', 'plant_counter', 'food_count', 'stone_count'):
+            self.arrays[name][self.y0:self.y1, self.x0:self.x1] = getattr(self, name)[self.interior]
+
+
+#-----------------------------------------------------------------------------------------------
+class SharedWorld:
+    """
+    The arrays of a world and of the agents' actions and observations, in one block of shared memory
+    :param communication: also the agents' symbols, the grid of what is said where, and what they hear at the end
+                          of the observations
+    """
+
+    def __init__(self, world, communication=False):
+        height, width = world['tiles'].shape
+        n = len(world['agents'])
+        grid = (height, width)
+        obs_size = observation_size() + (hearing_size(SIGHT_SIZE) if communication else 0)
+        self.layout = [('tiles', grid, np.int8), ('plant_stage', grid, np.int16), ('plant_counter', grid, np.int16),
+                       ('food_count', grid, np.int16), ('stone_count', grid, np.int16),
+                       ('agents', (n, NUM_COLUMNS), np.float64), ('actions', (n,), np.int64),
+                       ('obs', (n, obs_size), np.float32), ('rewards', (n,), np.float64),
+                       ('dones', (n,), bool), ('control', (1,), np.int64)]
+        if communication:
+            self.layout += [('symbols', (n,), np.int8), ('said', grid, np.int8)]
+        sizes = [int(np.prod(shape)) * np.dtype(dtype).itemsize for _, shape, dtype in self.layout]
+        # keep every array 8-byte aligned
+        offsets = np.concatenate([[0], np.cumsum([(s + 7) // 8 * 8 for s in sizes])])
+        self.shm = shared_memory.SharedMemory(create=True, size=int(offsets[-1]))
+        self.arrays = {name: np.ndarray(shape, dtype, self.shm.buf, int(offset))
+                       for (name, shape, dtype), offset in zip(self.layout, offsets)}
+        self.write(world)
+
+    def write(self, world):
+        for name, array in world.items():
+            self.arrays[name][...] = array
+        self.arrays['rewards'][...] = 0
+        self.arrays['dones'][...] = False
+        if 'said' in self.arrays:
+            self.arrays['symbols'][...] = SILENT
+            self.arrays['said'][...] = SILENT
+
+    def close(self):
+        self.arrays = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _assign_owners(arrays, partition):
+    agents = arrays['agents']
+    agents[:, A_OWNER] = partition.owner(agents[:, A_X].astype(np.intp), agents[:, A_Y].astype(np.intp))
+
+
+def snapshot(arrays):
+    state = {name: arrays[name].copy() for name in ('plant_stage', 'plant_counter', 'food_count', 'stone_count')}
+    # which shard owns an agent depends on the partition, not on the world
+    state['agents'] = arrays['agents'][:, :A_OWNER].copy()
+    return state
+
+
+class GridWorld:
+    """
+    The whole world stepped in this process, as a single shard.  The reference for ShardedWorld.
+
+    step(actions, symbols=None) takes one action per agent (ignored for dead agents), with communication=True
+    optionally one symbol per agent, and returns:
+      obs - <num_agents x observation_size> float32, in the flat layout of SimpleVectorEnv, followed with
+            communication=True by the <(2N+1)^2> symbols the agent hears (see communication.py)
+      rewards - 1 for each agent alive after the turn, -1000 on the turn an agent dies, 0 after that
+      dones - True for the agents that are dead
+    """
+
+    def __init__(self, blocks=(2, 2), num_agents=64, seed=2021, world=None, communication=False):
+        self.blocks = blocks
+        self.num_agents = num_agents
+        self.seed = seed
+        self.communication = communication
+        self._world = world
+        self.shared = None
+        self.reset()
+
+    def _new_world(self):
+        if self._world is not None:
+            return {name: np.array(value) for name, value in self._world.items()}
+        return make_world(self.blocks, self.num_agents, self.seed)
+
+    def reset(self):
+        world = self._new_world()
+        if self.shared is None:
+            self.shared = SharedWorld(world, self.communication)
+            self.partition = Partition(world['tiles'].shape[1], world['tiles'].shape[0], 1)
+        else:
+            self.shared.write(world)
+        self.num_agents = len(world['agents'])
+        _assign_owners(self.shared.arrays, self.partition)
+        self.shard = Shard(self.shared.arrays, self.partition, 0)
+        self.shard.observe()
+        return self.shared.arrays['obs'].copy()
+
+    def _set_inputs(self, actions, symbols):
+        arrays = self.shared.arrays
+        arrays['actions'][...] = actions
+        if symbols is not None:
+            if not self.communication:
+                raise ValueError("symbols need a world created with communication=True")
+            arrays['symbols'][...] = symbols
+        elif self.communication:
+            arrays['symbols'][...] = SILENT
+        arrays['rewards'][arrays['dones']] = 0.0
+
+    def step(self, actions, symbols=None):
+        arrays = self.shared.arrays
+        self._set_inputs(actions, symbols)
+        self.shard.tick()
+        if self.communication:
+            self.shard.speak()
+        self.shard.observe()
+        return arrays['obs'].copy(), arrays['rewards'].copy(), arrays['dones'].copy()
+
+    def snapshot(self):
+        """
+        :return: copies of the grids and the agent table (without the owners)
+        """
+        self.shard.store()
+        return snapshot(self.shared.arrays)
+
+    def close(self):
+        if self.shared is not None:
+            self.shared.close()
+            self.shared = None
+
+
+def _shard_worker(arrays, partition, index, barrier):
+    shard = Shard(arrays, partition, index)
+    control = arrays['control']
+    try:
+        while True:
+            barrier.wait()
+            command = control[0]
+            if command == CMD_STOP:
+                return
+            if command == CMD_STEP:
+                shard.tick()
+                shard.publish()
+                barrier.wait()
+                shard.gather()
+                if shard.channel is not None:
+                    shard.speak()
+                    shard.publish(('said',))
+                    barrier.wait()
+                    shard.gather(('said',))
+                shard.observe()
+            elif command == CMD_RESET:
+                shard.load()
+                shard.observe()
+            elif command == CMD_STORE:
+                shard.store()
+            barrier.wait()
+    except Exception:
+        barrier.abort()
+        raise
+
+
+class ShardedWorld(GridWorld):
+    """
+    The same world as GridWorld, split into num_shards rectangles stepped by as many processes
+    """
+
+    def __init__(self, num_shards=4, blocks=(2, 2), num_agents=64, seed=2021, world=None, communication=False):
+        self.num_shards = num_shards
+        self.workers = []
+        super().__init__(blocks, num_agents, seed, world, communication)
+
+    def _start(self, world):
+        self.shared = SharedWorld(world, self.communication)
+        self.partition = Partition(world['tiles'].shape[1], world['tiles'].shape[0], self.num_shards)
+        _assign_owners(self.shared.arrays, self.partition)
+        ctx = mp.get_context('fork')
+        self.barrier = ctx.Barrier(self.num_shards + 1)
+        self.workers = [ctx.Process(target=_shard_worker, args=(self.shared.arrays, self.partition, i, self.barrier),
+                                    daemon=True) for i in range(self.num_shards)]
+        for w in self.workers:
+            w.start()
+
+    def _command(self, command, phases=1):
+        self.shared.arrays['control'][0] = command
+        for _ in range(phases + 1):
+            self.barrier.wait()
+
+    def reset(self):
+        world = self._new_world()
+        self.num_agents = len(world['agents'])
+        if self.shared is None:
+            self._start(world)
+        else:
+            self.shared.write(world)
+            _assign_owners(self.shared.arrays, self.partition)
+        self._command(CMD_RESET)
+        return self.shared.arrays['obs'].copy()
+
+    def step(self, actions, symbols=None):
+        arrays = self.shared.arrays
+        self._set_inputs(actions, symbols)
+        self._command(CMD_STEP, phases=3 if self.communication else 2)
+        return arrays['obs'].copy(), arrays['rewards'].copy(), arrays['dones'].copy()
+
+    def snapshot(self):
+        self._command(CMD_STORE)
+        return snapshot(self.shared.arrays)
+
+    def close(self):
+        if self.workers:
+            if not self.barrier.broken:
+                self.shared.arrays['control'][0] = CMD_STOP
+                self.barrier.wait()
+            for w in self.workers:
+                w.join()
+            self.workers = []
+        super().close()
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    actions = rng.choice([REST, REST, REST, MOVE_NORTH, 2, 3, MOVE_WEST, PICK_UP, PUT_DOWN, CONSUME], (200, 256))
+    single = GridWorld(blocks=(4, 4), num_agents=256)
+    sharded = ShardedWorld(4, blocks=(4, 4), num_agents=256)
+    for a in actions:
+        obs1, rewards1, dones1 = single.step(a)
+        obs4, rewards4, dones4 = sharded.step(a)
+        assert np.array_equal(obs1, obs4) and np.array_equal(rewards1, rewards4) and np.array_equal(dones1, dones4)
+    same = all(np.array_equal(u, v) for u, v in zip(single.snapshot().values(), sharded.snapshot().values()))
+    print(f"4 shards {'match' if same else 'DIFFER FROM'} one process after {len(actions)} turns, "
+          f"{int(dones1.sum())} of 256 agents dead")
+    sharded.close()
+    single.close()
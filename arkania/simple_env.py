@@ -7,6 +7,7 @@ Inferface:
     step() - execute a single timestep
     render() - render the world in its current state
 """
+import math
 import numpy as np
 import random as rnd
 import gym
@@ -14,6 +15,14 @@ import time
 from gym.envs.classic_control.rendering import Geom, Viewer
 import pyglet
 from pyglet.gl import *
+from .entities import EntityRegistry, KIND_PLANT, KIND_FOOD, KIND_STONE, NOT_HELD, OFF_MAP, PLANT_RIPE
+from .actions import action_mask
+from .memory import ExplorationMemory
+from .vision import padded_terrain_codes, field_of_view, overlay_objects, SightPlanes
+from .atlas import get_atlas, SpriteTile
+from .placement import Placement, Region
+from .observation import Deferred, LazyState, resolve
+from .periphery import PeripheryTables, ring_cells, reach, category_planes, summed_area_table, RINGS, SCALE
 # from gym.utils import colorize, EzPickle
 
 VIEWPORT_W = 800
@@ -51,6 +60,10 @@ FOOD_IN_HAND = 28
 
 NUM_SPRITES = 29
 
+BEACH_TILES = [BEACH_E, BEACH_N_OLD, BEACH_S, BEACH_NE, BEACH_SE, BEACH_N]
+
+FOV_RADIUS = 6
+
 
 PLANT = 101
 
@@ -59,31 +72,27 @@ EAST = 1
 SOUTH = 2
 WEST = 3
 
+# what the agent holds, as observed in the state's 'in_hand' (see Agent.what_is_in_hand)
+HAND_EMPTY = 0
+HAND_FOOD = 1
+HAND_WATER = 2
+HAND_STONE = 3
+
 turn_left = [WEST, NORTH, EAST, SOUTH]
 turn_right = [EAST, SOUTH, WEST, NORTH]
 
 
-class Tile(Geom):
-    def __init__(self, subimg, x, y, width, height, light=1.0):
-        super().__init__()
-        self.width = width
-        self.height = height
-        self.x = x
-        self.y = y
-        self.set_color(light, light, light)
-        self.flip = False
-        self.img = subimg
-
-    def render1(self):
-        self.img.blit(self.x, self.y, width=self.width, height=self.height)
-
-
 class Tileset:
+    """
+    The sprites, as regions of the atlas shared by all the envs (see atlas.py)
+    """
+
     def __init__(self):
-        self.tiles = []
-        for i in range(1, NUM_SPRITES + 1):
-            fname = f"arkania/graphics/sprites/Simple_Tiles{i}.png"
-            self.tiles.append(pyglet.image.load(fname))
+        self.atlas = get_atlas()
+
+    @property
+    def tiles(self):
+        return self.atlas.regions[-1]
 
     def draw(self, viewer, tile_id, x, y, offset_x=0, offset_y=0, light=1.0):
         """
@@ -97,34 +106,207 @@ class Tileset:
         :param light: the brightness of light
         :return: N/A
         """
-        tile_img = self.tiles[int(tile_id)]
-        viewer.add_onetime(Tile(tile_img, 12 + x * 32 + offset_x, 12 + y * 32 + offset_y, 32, 32, light))
+        region = self.atlas.region(tile_id, light)
+        viewer.add_onetime(SpriteTile(region, 12 + x * 32 + offset_x, 12 + y * 32 + offset_y, 32, 32))
+
+
+def build_map():
+    """
+    :return: the tile ids of the SimpleEnv world, indexed [y, x]
+    """
+    tile_map = np.zeros((18, 18), dtype=np.int8)
+    for r in range(18):
+        for c in range(18):
+            tile_map[r, c] = GRASS
+    for r in range(4, 16):
+        tile_map[r, 0] = CLIFF_W
+        tile_map[r, 17] = CLIFF_E
+    for c in range(0, 18):
+        tile_map[0, c] = ROCK
+        tile_map[17, c] = FOREST
+        tile_map[16, c] = FORESTEDGE
+    for i in range(0, 3):
+        tile_map[i + 1, 0] = ROCK
+        tile_map[i + 1, 4] = ROCK
+        tile_map[3, i] = ROCK
+
+        tile_map[i + 1, 17] = ROCK
+        tile_map[i + 1, 13] = ROCK
+        tile_map[3, 17 - i] = ROCK
+    for i in range(5, 13):
+        tile_map[1, i] = WATER
+        tile_map[2, i] = WATER
+        tile_map[3, i] = BEACH_N
+    tile_map[15, 0] = CLIFF_SW
+    tile_map[15, 17] = CLIFF_SE
+    return tile_map
+
+
+DARK_AREAS = [(1, 1, 4),
+              (1, 2, 3),
+              (1, 3, 2),
+              (2, 1, 3),
+              (2, 2, 2),
+              (2, 3, 1),
+              (3, 3, 1)]
+
+# where reset() may place each kind of entity (tiles x0..x1, y0..y1)
+PLACEMENT_REGIONS = {KIND_PLANT: Region(1, 16, 4, 15),
+                     KIND_STONE: Region(1, 16, 4, 15)}
+
+
+class Terrain:
+    """
+    The layers of a world that only depend on its map: tile ids, where the beach is, and the padded sight codes of the
+    terrain.  A shared Terrain is read-only (its arrays are not writeable) and is used by every env with that map;
+    an env that changes a tile first takes a private copy (see SimpleEnv.set_tile).
+    """
+
+    def __init__(self, tile_map, shared=False):
+        self.map = tile_map
+        self.shared = shared
+        # counts the changes made by set_tile, for caches of what is derived from the map outside of the Terrain
+        self.version = 0
+        self.beach = np.isin(tile_map, BEACH_TILES)
+        self._codes = {}
+        self._tables = {}
+        if shared:
+            self.map.flags.writeable = False
+            self.beach.flags.writeable = False
+
+    def codes(self, pad):
+        """
+        Sight codes of the terrain, padded by `pad` cells on every side
+        """
+        codes = self._codes.get(pad)
+        if codes is None:
+            codes = padded_terrain_codes(self.map, pad)
+            codes.flags.writeable = not self.shared
+            self._codes[pad] = codes
+        return codes
+
+    def category_table(self, pad):
+        """
+        Summed-area table of the periphery categories of the terrain, padded by `pad` cells on every side
+        """
+        table = self._tables.get(pad)
+        if table is None:
+            table = summed_area_table(category_planes(self.codes(pad)))
+            table.flags.writeable = not self.shared
+            self._tables[pad] = table
+        return table
+
+    def copy(self):
+        return Terrain(self.map.copy())
+
+    def set_tile(self, x, y, tile):
+        if self.shared:
+            raise ValueError("a shared Terrain can not be changed, take a copy() first")
+        self.map[y, x] = tile
+        self.beach[y, x] = tile in BEACH_TILES
+        self.version += 1
+        self._codes = {}
+        self._tables = {}
+
+    def nbytes(self):
+        return self.map.nbytes + self.beach.nbytes + sum(c.nbytes for c in self._codes.values()) + \
+            sum(t.nbytes for t in self._tables.values())
+
+
+_terrain = None
+
+
+def shared_terrain():
+    """
+    :return: the read-only Terrain of the standard SimpleEnv map, built once per process
+    """
+    global _terrain
+    if _terrain is None:
+        _terrain = Terrain(build_map(), shared=True)
+    return _terrain
+
+
+class EntityView:
+    """
+    A thin handle on one slot of an EntityRegistry.  All of the state lives in the registry's columns, so a view
+    is only a (registry, slot) pair and can be created and thrown away cheaply.
+    """
+    __slots__ = ('registry', 'slot')
+
+    @classmethod
+    def of(cls, registry, slot):
+        view = object.__new__(cls)
+        view.registry = registry
+        view.slot = slot
+        return view
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.registry is other.registry and self.slot == other.slot
+
+    def __hash__(self):
+        return hash((id(self.registry), self.slot))
+
+    @property
+    def env(self):
+        return self.registry.env
+
+    @property
+    def uid(self):
+        return int(self.registry.uid[self.slot])
+
+    @property
+    def x(self):
+        return int(self.registry.x[self.slot])
 
+    @x.setter
+    def x(self, value):
+        self.registry.move(self.slot, value, self.registry.y[self.slot])
+
+    @property
+    def y(self):
+        return int(self.registry.y[self.slot])
+
+    @y.setter
+    def y(self, value):
+        self.registry.move(self.slot, self.registry.x[self.slot], value)
+
+
+class Stone(EntityView):
+    __slots__ = ()
 
-class Stone:
     def __init__(self, env, uid, x, y):
-        self.uid = uid
-        self.env = env
-        self.x = x
-        self.y = y
-        self.vx = 0
-        self.vy = 0
-        self.in_air = 0
+        self.registry = env.entities
+        self.slot = self.registry.add(KIND_STONE, uid, x, y)
+
+    @property
+    def vx(self):
+        return int(self.registry.vx[self.slot])
+
+    @property
+    def vy(self):
+        return int(self.registry.vy[self.slot])
+
+    @property
+    def in_air(self):
+        return int(self.registry.in_air[self.slot])
 
     def throw(self, x, y, direction):
-        self.x = x
-        self.y = y
-        self.vx = 0
-        self.vy = 0
-        self.in_air = 2  # number of turns that it stays in air
+        reg = self.registry
+        if reg.held_by[self.slot] != NOT_HELD:
+            reg.drop(self.slot, x, y)
+        else:
+            reg.move(self.slot, x, y)
+        reg.vx[self.slot] = 0
+        reg.vy[self.slot] = 0
+        reg.in_air[self.slot] = 2  # number of turns that it stays in air
         if direction == NORTH:
-            self.vy = 1
+            reg.vy[self.slot] = 1
         elif direction == SOUTH:
-            self.vy = -1
+            reg.vy[self.slot] = -1
         elif direction == EAST:
-            self.vx = 1
+            reg.vx[self.slot] = 1
         elif direction == WEST:
-            self.vx = -1
+            reg.vx[self.slot] = -1
 
     def draw(self):
         self.env.tiles.draw(self.env.viewer, STONE, self.x, self.y, light=self.env.light)
@@ -147,12 +329,12 @@ class Stone:
                 nxt_y = self.y + self.vy
 
 
-class Food:
+class Food(EntityView):
+    __slots__ = ()
+
     def __init__(self, env, uid, x, y):
-        self.uid = uid
-        self.env = env
-        self.x = x
-        self.y = y
+        self.registry = env.entities
+        self.slot = self.registry.add(KIND_FOOD, uid, x, y)
 
     def draw(self):
         self.env.tiles.draw(self.env.viewer, FOOD, self.x, self.y, light=self.env.light)
@@ -161,15 +343,29 @@ class Food:
         pass
 
 
-class Plant:
+class Plant(EntityView):
+    __slots__ = ()
+    stages = (FOOD_1, FOOD_2, FOOD_3, FOOD_4)
+
     def __init__(self, env, uid, x, y, stage):  # stage is 0 to 3
-        self.env = env
-        self.uid = uid
-        self.x = x
-        self.y = y
-        self.stage = stage
-        self.counter = 0
-        self.stages = [FOOD_1, FOOD_2, FOOD_3, FOOD_4]
+        self.registry = env.entities
+        self.slot = self.registry.add(KIND_PLANT, uid, x, y, stage)
+
+    @property
+    def stage(self):
+        return int(self.registry.stage[self.slot])
+
+    @stage.setter
+    def stage(self, value):
+        self.registry.set_stage(self.slot, value, self.registry.counter[self.slot])
+
+    @property
+    def counter(self):
+        return int(self.registry.counter[self.slot])
+
+    @counter.setter
+    def counter(self, value):
+        self.registry.counter[self.slot] = value
 
     def step(self):
         self.counter += 1
@@ -206,12 +402,12 @@ class Agent:
     #-----------------------------------------------------------------------------------------------
     def what_is_in_hand(self):
         if type(self.in_hand) == int and self.in_hand == WATER:
-            return 2
+            return HAND_WATER
         elif type(self.in_hand) == Food:
-            return 1
+            return HAND_FOOD
         elif type(self.in_hand) == Stone:
-            return 3
-        return 0
+            return HAND_STONE
+        return HAND_EMPTY
 
     def step(self):
         if self.energy < 0:
@@ -236,6 +432,7 @@ class Agent:
     def move_north(self):
         if self.energy >= 2:
             self.energy -= 2
+            self.facing = NORTH
             if self.y == 17:
                 self.health = 0
             else:
@@ -248,6 +445,7 @@ class Agent:
     def move_east(self):
         if self.energy >= 2:
             self.energy -= 2
+            self.facing = EAST
             if self.x == 17:
                 self.health = 0
             else:
@@ -260,6 +458,7 @@ class Agent:
     def move_south(self):
         if self.energy >= 2:
             self.energy -= 2
+            self.facing = SOUTH
             if self.y == 0:
                 self.health = 0
             else:
@@ -272,6 +471,7 @@ class Agent:
     def move_west(self):
         if self.energy >= 2:
             self.energy -= 2
+            self.facing = WEST
             if self.x == 0:
                 self.health = 0
             else:
@@ -281,60 +481,56 @@ class Agent:
                 if ahead in [FOREST, WATER]:
                     self.health = 0
 
+    def _grab(self, item):
+        """
+        Put an item into the hand during pick_up().  Anything grabbed earlier in the same turn is replaced, and a
+        food that gets replaced this way is lost.
+        """
+        if isinstance(self.in_hand, Food):
+            self.in_hand.registry.remove(self.in_hand.slot)
+        self.in_hand = item
+
     def pick_up(self):
         if self.energy >= 1:
             self.energy -= 1
             if self.in_hand is None:
+                reg = self.env.entities
+
                 # check plants ready to harvest
                 found = False
-                for p in self.env.plants:
-                    if p.x == self.x and p.y == self.y and p.stage == 3:
-                        self.env.food_id += 1
-                        self.in_hand = Food(self.env, self.env.food_id, -1, -1)
-                        p.stage = 0
-                        p.counter = 0
-                        break
+                p = reg.find(KIND_PLANT, self.x, self.y)
+                if p >= 0 and reg.stage[p] == PLANT_RIPE:
+                    self.env.food_id += 1
+                    slot = reg.add(KIND_FOOD, self.env.food_id, OFF_MAP, OFF_MAP, held_by=self.uid)
+                    self._grab(Food.of(reg, slot))
+                    reg.set_stage(p, 0)
 
                 # check for water
                 if not found:
-                    if self.env.map[self.y, self.x] in [BEACH_E, BEACH_N_OLD, BEACH_S, BEACH_NE, BEACH_SE, BEACH_N]:
-                        self.in_hand = WATER
+                    if self.env.map[self.y, self.x] in BEACH_TILES:
+                        self._grab(WATER)
                         found = True
 
                 # check for food on ground
                 if not found:
-                    for f in self.env.foods:
-                        if f.x == self.x and f.y == self.y:
-                            self.in_hand = f
-                            f.x = -1
-                            f.y = -1
-                            self.env.foods.remove(f)
-                            break
+                    f = reg.find(KIND_FOOD, self.x, self.y)
+                    if f >= 0:
+                        reg.hold(f, self.uid)
+                        self._grab(Food.of(reg, f))
 
                 # check for stone on ground
                 if not found:
-                    for s in self.env.stones:
-                        if s.x == self.x and s.y == self.y:
-                            self.in_hand = s
-                            s.x = -1
-                            s.y = -1
-                            self.env.stones.remove(s)
-                            break
+                    s = reg.find(KIND_STONE, self.x, self.y)
+                    if s >= 0:
+                        reg.hold(s, self.uid)
+                        self._grab(Stone.of(reg, s))
 
     def put_down(self):
         if self.energy >= 1:
             self.energy -= 1
             if self.in_hand is not None:
-                if type(self.in_hand) == Stone:
-                    s = self.in_hand
-                    s.x = self.x
-                    s.y = self.y
-                    self.env.stones.append(s)
-                if type(self.in_hand) == Food:
-                    f = self.in_hand
-                    f.x = self.x
-                    f.y = self.y
-                    self.env.foods.append(f)
+                if type(self.in_hand) in (Stone, Food):
+                    self.in_hand.registry.drop(self.in_hand.slot, self.x, self.y)
                 self.in_hand = None
 
     def consume_item(self):
@@ -347,6 +543,7 @@ class Agent:
                     self.energy -= (self.water - 100) / 2
                     self.water = 100
             elif type(self.in_hand) == Food:
+                self.in_hand.registry.remove(self.in_hand.slot)
                 self.in_hand = None
                 self.food += 35
                 if self.food > 100:
@@ -354,6 +551,7 @@ class Agent:
                     self.energy -= (self.food - 100) / 2
                     self.food = 100
             elif type(self.in_hand) == Stone:
+                self.in_hand.registry.remove(self.in_hand.slot)
                 self.health -= 45
                 self.energy -= 45
                 self.in_hand = None
@@ -384,6 +582,133 @@ class Agent:
         if self.energy > 100:
             self.energy = 100
 
+    #-----------------------------------------------------------------------------------------------
+    # CLOSED-FORM RESTING
+    #-----------------------------------------------------------------------------------------------
+    @staticmethod
+    def _vital_flags(v):
+        """
+        What step() and rest() will do with a food or water level of v: (below 25, empty, still >= 25 after resting)
+        """
+        empty = v - 1 <= 0
+        return v - 1 < 25.0, empty, not empty and v - 1 + 0.5 >= 25
+
+    @staticmethod
+    def _vital_after(v, ticks):
+        """
+        Food or water level after resting `ticks` turns, while its flags do not change
+        """
+        if v - 1 <= 0:
+            return 0.5
+        return v - 0.5 * ticks
+
+    @classmethod
+    def _vital_segment(cls, v):
+        """
+        :return: number of turns of rest (at least 1) before the flags of a food or water level of v change
+        """
+        if v - 1 <= 0:
+            return math.inf
+        if v >= 26:
+            ticks = math.floor((v - 26) / 0.5) + 1
+        elif v >= 25.5:
+            ticks = math.floor((v - 25.5) / 0.5) + 1
+        else:
+            ticks = math.ceil((v - 1) / 0.5)
+        flags = cls._vital_flags(v)
+        while ticks > 1 and cls._vital_flags(v - 0.5 * (ticks - 1)) != flags:
+            ticks -= 1
+        while cls._vital_flags(v - 0.5 * ticks) == flags:
+            ticks += 1
+        return ticks
+
+    @staticmethod
+    def _ticks_until(start, rate, target, rising):
+        """
+        :return: the first turn k >= 1 at which start + rate * k reaches the target (>= if rising, else <=)
+        """
+        def reached(k):
+            value = start + rate * k
+            return value >= target if rising else value <= target
+
+        if reached(1):
+            return 1
+        if (rate <= 0) if rising else (rate >= 0):
+            return math.inf
+        k = max(math.ceil((target - start) / rate), 1)
+        while k > 1 and reached(k - 1):
+            k -= 1
+        while not reached(k):
+            k += 1
+        return k
+
+    def fast_rest(self, ticks, energy=None, health=None, food=None, water=None):
+        """
+        Same as calling step() and rest() up to `ticks` times, but computed segment by segment in closed form.  Between
+        the thresholds at 25 and 0 every vital changes by a fixed amount each turn, so each segment is a single update.
+        Stops after the first turn on which energy >= `energy`, health >= `health`, food <= `food` or water <= `water`
+        (for the limits that are given), or on which the agent dies.
+        :return: the number of turns rested
+        """
+        rested = 0
+        while rested < ticks:
+            if self.energy < 0 or self.energy > 100 or self.health > 100:
+                # outside of the range where the updates are linear, so take one ordinary turn
+                self.step()
+                self.rest()
+                rested += 1
+            else:
+                rested += self._rest_segment(ticks - rested, energy, health, food, water)
+            if self.health <= 0 or (energy is not None and self.energy >= energy) or \
+                    (health is not None and self.health >= health) or \
+                    (food is not None and self.food <= food) or (water is not None and self.water <= water):
+                break
+        return rested
+
+    def _rest_segment(self, max_ticks, energy, health, food, water):
+        water_low, water_empty, water_ok = self._vital_flags(self.water)
+        food_low, food_empty, food_ok = self._vital_flags(self.food)
+        de = (3 if food_ok and water_ok else 2) - water_low - food_low
+        dh = (1 if food_ok and water_ok else 0) - 100 / 80 * water_empty - 25 / 80 * food_empty
+
+        limits = [max_ticks, self._vital_segment(self.water), self._vital_segment(self.food)]
+        if dh < 0:
+            limits.append(self._ticks_until(self.health, dh, 0, rising=False))
+        if energy is not None and energy <= 100:
+            limits.append(self._ticks_until(self.energy, de, energy, rising=True))
+        if health is not None and health <= 100:
+            limits.append(self._ticks_until(self.health, dh, health, rising=True))
+        if food is not None:
+            limits.append(1 if food_empty and 0.5 <= food else
+                          math.inf if food_empty else self._ticks_until(self.food, -0.5, food, rising=False))
+        if water is not None:
+            limits.append(1 if water_empty and 0.5 <= water else
+                          math.inf if water_empty else self._ticks_until(self.water, -0.5, water, rising=False))
+        n = min(limits)
+
+        self.age += n
+        self.water = self._vital_after(self.water, n)
+        self.food = self._vital_after(self.food, n)
+        self.energy += de * n
+        self.health += dh * n
+        if self.health > 100:
+            self.health = 100
+        if self.energy > 100:
+            self.energy = 100
+        return n
+
+
+class AgentPose:
+    """
+    Where the agent stood and which way it faced at one tick, for the entries of a LazyState that are computed later
+    """
+    __slots__ = ('x', 'y', 'facing')
+
+    def __init__(self, agent):
+        self.x = agent.x
+        self.y = agent.y
+        self.facing = agent.facing
+
 
 class SimpleEnv(gym.Env):
     """
@@ -434,14 +759,53 @@ class SimpleEnv(gym.Env):
              12 = FOOD (on the ground which can be picked up -- yields food)
              13 = STONE (can be picked up, can be thrown)
              14 = PREDATOR (seeks agent, kills agent)
+      fov - (only with fov_radius) like sight, but limited to the vision cone in front of the agent, and with cells
+            hidden behind a ROCK-WALL set to -1.  The agent faces the direction of its last move.
+      seen - (only with memory) packed bitset <18 x 3> of the tiles the agent has observed, indexed [y, x // 8],
+             bit x % 8 (unpack with np.unpackbits(seen, axis=1, bitorder='little'))
+      last_seen - (only with memory) <18 x 18> uint8 sight code of each tile when it was last observed,
+             indexed [y, x], 255 if never observed
+      action_mask - (only with action_mask) boolean array of 12, False for the actions that would do nothing
+             in this state (see actions.py)
+      sight_planes - (only with sight_planes) the sight matrix one-hot encoded, uint8 <15 x 5 x 5> where plane k is 1
+             where sight is k; with sight_planes='packed' the 15 planes are packed into bits, <2 x 5 x 5>
+      periphery - (only with periphery) float32 <2 x 8 x 6> long-range sight around the 5 x 5 sight matrix: for ring
+             k, the 8 blocks 5 * 3^k tiles wide around it (north row first, west to east, skipping the middle), and in
+             each block the fraction of tiles that are water, food, plants, danger, rock and stone (see periphery.py)
+
+    With lazy_state=True the state is a LazyState (see observation.py) instead of a dict: sight, fov and sight_planes
+    are only computed when they are first read.
     """
 
     #-----------------------------------------------------------------------------------------------
-    def __init__(self, seed=2021):
+    def __init__(self, seed=2021, fov_radius=None, memory=False, action_mask=False, sight_planes=False,
+                 lazy_state=False, periphery=False):
+        """
+        :param seed: random seed
+        :param fov_radius: if given, the state also contains 'fov', the field of view of this radius
+        :param memory: if True, the state also contains the agent's exploration memory ('seen' and 'last_seen')
+        :param action_mask: if True, the state also contains 'action_mask'
+        :param sight_planes: if True (or 'packed'), the state also contains 'sight_planes'
+        :param lazy_state: if True, the state is a LazyState that computes sight, fov, sight_planes and periphery on
+                           first access
+        :param periphery: if True, the state also contains 'periphery'
+        """
         self.seed = seed
+        self.fov_radius = fov_radius
+        self.use_action_mask = action_mask
+        self.use_sight_planes = sight_planes
+        self.lazy_state = lazy_state
+        self.use_periphery = periphery
+        self._planes = None
+        self._periphery = None
+        self._version = 0
+        self.memory = ExplorationMemory(1, 18, 18) if memory else None
         self.viewer = None
-        self.map = np.zeros((18, 18), dtype=int)
-        self.objects = np.zeros((18, 18), dtype=int)
+        self.terrain = None
+        self.placement = Placement(18, 18, PLACEMENT_REGIONS)
+        self.entities = EntityRegistry(self, 18, 18)
+        if lazy_state:
+            self.entities.listeners.append(self._world_changed)
         self.tiles = Tileset()
         self.light = 1.0
         self.food_id = 0
@@ -452,80 +816,178 @@ class SimpleEnv(gym.Env):
         self.reset()
 
     #-----------------------------------------------------------------------------------------------
+    @property
+    def map(self):
+        return self.terrain.map
+
+    @property
+    def beach(self):
+        return self.terrain.beach
+
+    def set_tile(self, x, y, tile):
+        """
+        Change one tile of the map.  The first change takes a private copy of the shared terrain (copy-on-write), and
+        the next reset() goes back to the shared one.
+        """
+        if self.terrain.shared:
+            self.terrain = self.terrain.copy()
+        self.terrain.set_tile(x, y, tile)
+        self._version += 1
+        if self._planes is not None:
+            self._planes.rebuild()
+        if self._periphery is not None:
+            self._periphery.rebuild()
+
+    def _terrain_codes(self, pad):
+        """
+        Sight codes of the terrain, padded by `pad` cells on every side
+        """
+        return self.terrain.codes(pad)
+
+    def sight_world(self, pad):
+        """
+        The whole world as sight codes, terrain with the objects on the ground on top of it
+        :param pad: number of cells of off-map terrain to add on every side
+        :return: int8 array indexed [y + pad, x + pad]
+        """
+        world = self._terrain_codes(pad).copy()
+        reg = self.entities
+        overlay_objects(world[pad:pad + reg.height, pad:pad + reg.width], reg.plant_stage, reg.food_count,
+                        reg.stone_count)
+        return world
+
     def get_sight_matrix(self, agent, size=2):
-        tile_map = [0, 6, 5, 1, 1, 1, 1, 1, 2, 2, 4, 3, 7, -1, 14, 13, 8, 9, 10, 11, -1, 1, 2, 2, 12, -99, -99]
-        smat = np.zeros((2 * size + 1, 2 * size + 1), dtype=int)
-        for r in range(2 * size + 1):
-            for c in range(2 * size + 1):
-                x = agent.x - size + c
-                y = agent.y + size - r
-                v = -999
-                if 0 <= x <= 17 and 0 <= y <= 17:
-                    tile = self.map[y, x]
-                    v = tile_map[tile]
-                else:
-                    if x >= 0 and y >= 0:
-                        if x >= y:
-                            v = 5   # DROPOFF
-                        else:
-                            v = 7   # DARK FOREST
-                    elif x < 0 and y >= 0:
-                        if 17-x >= y:
-                            v = 5
-                        else:
-                            v = 7
-                    elif x >= 0 and y < 0:
-                        if 17-x >= y:
-                            v = 4
-                        else:
-                            v = 5
-                    elif x < 0 and y < 0:
-                        if x >= y:
-                            v = 4
-                        else:
-                            v = 5
-                smat[r, c] = v
+        terrain = self._terrain_codes(size)
+        smat = terrain[agent.y:agent.y + 2 * size + 1, agent.x:agent.x + 2 * size + 1][::-1].astype(int)
+
+        # objects on the ground: plants, then food, then stones on top
+        reg = self.entities
+        x_lo, x_hi = max(agent.x - size, 0), min(agent.x + size, reg.width - 1)
+        y_lo, y_hi = max(agent.y - size, 0), min(agent.y + size, reg.height - 1)
+        if x_lo <= x_hi and y_lo <= y_hi:
+            rows = slice(agent.y + size - y_hi, agent.y + size - y_lo + 1)
+            cols = slice(x_lo - agent.x + size, x_hi - agent.x + size + 1)
+            ys, xs = slice(y_lo, y_hi + 1), slice(x_lo, x_hi + 1)
+            overlay_objects(smat[rows, cols], reg.plant_stage[ys, xs][::-1], reg.food_count[ys, xs][::-1],
+                            reg.stone_count[ys, xs][::-1])
 
-        for p in self.plants:
-            r = agent.y - p.y + size
-            c = p.x - agent.x + size
+        # smat[size, size] = 8
 
-            if 0 <= r <= 2*size and 0 <= c <= 2*size:
-                smat[r, c] = 8 + p.stage
+        return smat
 
-        for f in self.foods:
-            r = agent.y - f.y + size
-            c = f.x - agent.x + size
+    def get_sight_planes(self, agent, size=2, packed=False):
+        """
+        The sight matrix as one-hot planes, cut out of a one-hot copy of the world that is kept up to date as objects
+        change, instead of being expanded from get_sight_matrix() on every call
+        :return: uint8 <15 x 2N+1 x 2N+1>, or <2 x 2N+1 x 2N+1> bits with packed=True
+        """
+        if self._planes is None or self._planes.pad < size:
+            if self._planes is not None:
+                self._planes.detach()
+            self._planes = SightPlanes(self, size)
+        return self._planes.window(agent.x, agent.y, size, packed)
 
-            if 0 <= r <= 2*size and 0 <= c <= 2*size:
-                smat[r, c] = 12
+    def get_periphery(self, agent, size=2, rings=RINGS, scale=SCALE, fractions=True):
+        """
+        Foveated long-range sight around the <2N+1 x 2N+1> sight matrix, read from summed-area tables that are kept up
+        to date as objects change (see periphery.py)
+        :return: float32 <rings x 8 x 6> fraction of each block's tiles in each category, or int counts with
+                 fractions=False
+        """
+        cells = ring_cells(size, rings, scale)
+        pad = reach(cells)
+        if self._periphery is None or self._periphery.pad < pad:
+            if self._periphery is not None:
+                self._periphery.detach()
+            self._periphery = PeripheryTables(self, pad)
+        counts = self._periphery.counts(agent.x, agent.y, cells)
+        if fractions:
+            area = (cells[:, 1] - cells[:, 0] + 1) * (cells[:, 3] - cells[:, 2] + 1)
+            counts = (counts / area[:, None]).astype(np.float32)
+        return counts.reshape(rings, 8, -1)
+
+    @property
+    def plants(self):
+        reg = self.entities
+        return [Plant.of(reg, slot) for slot in reg.slots(KIND_PLANT)]
+
+    @property
+    def foods(self):
+        """
+        Food lying on the ground (food held by the agent is not included)
+        """
+        reg = self.entities
+        return [Food.of(reg, slot) for slot in reg.slots(KIND_FOOD)]
 
-        for s in self.stones:
-            r = agent.y - s.y + size
-            c = s.x - agent.x + size
+    @property
+    def stones(self):
+        """
+        Stones lying on the ground (a stone held by the agent is not included)
+        """
+        reg = self.entities
+        return [Stone.of(reg, slot) for slot in reg.slots(KIND_STONE)]
 
-            if 0 <= r <= 2*size and 0 <= c <= 2*size:
-                smat[r, c] = 13
+    def pickable_table(self):
+        """
+        :return: boolean <18 x 18> array (indexed [y, x]) of the tiles where pick_up() would get something
+        """
+        reg = self.entities
+        return self.beach | (reg.food_count > 0) | (reg.stone_count > 0) | (reg.plant_stage == PLANT_RIPE)
 
-        # smat[size, size] = 8
+    def can_pick_up(self, x, y):
+        if not (0 <= x < 18 and 0 <= y < 18):
+            return False
+        reg = self.entities
+        return bool(self.beach[y, x] or reg.food_count[y, x] or reg.stone_count[y, x] or
+                    reg.plant_stage[y, x] == PLANT_RIPE)
 
-        return smat
+    def get_fov_matrix(self, agent, radius=None):
+        """
+        Like get_sight_matrix(), but only the cells inside the agent's vision cone (see sight.dat) that are not hidden
+        behind a ROCK-WALL are filled in.  All other cells are -1.
+        """
+        if radius is None:
+            radius = self.fov_radius or FOV_RADIUS
+        return field_of_view(radius, agent.facing).apply(self.get_sight_matrix(agent, radius))
+
+    def _world_changed(self, xs, ys):
+        self._version += 1
 
     def _get_state(self):
-        state = {'health': self.agent.health,
-                 'energy': self.agent.energy,
-                 'food': self.agent.food,
-                 'water': self.agent.water,
-                 'in_hand': self.agent.what_is_in_hand(),
-                 'sight': self.get_sight_matrix(self.agent)}
-        return state
+        agent = self.agent
+        # the deferred entries read the pose of this tick, not the agent as it is when they are computed
+        pose = AgentPose(agent) if self.lazy_state else agent
+        state = {'health': agent.health,
+                 'energy': agent.energy,
+                 'food': agent.food,
+                 'water': agent.water,
+                 'in_hand': agent.what_is_in_hand(),
+                 'sight': Deferred(lambda: self.get_sight_matrix(pose))}
+        if self.fov_radius:
+            state['fov'] = Deferred(lambda: self.get_fov_matrix(pose))
+        if self.memory is not None:
+            view = 'fov' if self.fov_radius else 'sight'
+            state[view] = state[view].fn()
+            self.memory.update(0, agent.x, agent.y, state[view])
+            state['seen'] = self.memory.seen[0].copy()
+            state['last_seen'] = self.memory.last_seen[0].copy()
+        if self.use_action_mask:
+            state['action_mask'] = action_mask(self)
+        if self.use_sight_planes:
+            state['sight_planes'] = Deferred(lambda: self.get_sight_planes(pose,
+                                                                           packed=self.use_sight_planes == 'packed'))
+        if self.use_periphery:
+            state['periphery'] = Deferred(lambda: self.get_periphery(pose))
+        if not self.lazy_state:
+            return resolve(state)
+        version = self._version
+        return LazyState(state, lambda: self._version == version)
 
     #-----------------------------------------------------------------------------------------------
-    def step(self, action):
+    def _tick(self, action):
         """
-        Takes one step of action in the environment and returns the resulting state and reward information
-        :param action:
-        :return:
+        Advance the world by one turn without building the state
+        :return: reward, is_done
         """
 
         self.agent.step()
@@ -556,27 +1018,58 @@ class SimpleEnv(gym.Env):
         elif action == 11:
             self.agent.throw_west()
 
-        for p in self.plants:
-            p.step()
-
-        for s in self.stones:
-            s.step()
+        # stones and food on the ground are inert for now, so only the plants need stepping
+        self.entities.step_plants()
 
-        for f in self.foods:
-            f.step()
+        if self.agent.health <= 0:
+            return -1000, True
+        return 1, False
 
+    def step(self, action):
+        """
+        Takes one step of action in the environment and returns the resulting state and reward information
+        :param action:
+        :return:
+        """
+        reward, is_done = self._tick(action)
         state = self._get_state()
 
         # this can eventually be a log of information about 'why' different things happened in response to actions
         debug = {}
 
-        # Results
-        reward = 1
+        return state, reward, is_done, debug
+
+    def step_many(self, actions):
+        """
+        Takes one step for each action in a sequence, but only builds the state after the last one.  Stops early if
+        the agent dies.
+        :param actions: iterable of actions, one per turn
+        :return: the final state, the summed reward, is_done, and a debug dictionary with the number of 'ticks' run
+        """
+        total = 0
+        ticks = 0
         is_done = False
+        for action in actions:
+            reward, is_done = self._tick(action)
+            total += reward
+            ticks += 1
+            if is_done:
+                break
+        return self._get_state(), total, is_done, {'ticks': ticks}
+
+    def fast_forward_rest(self, ticks, energy=None, health=None, food=None, water=None):
+        """
+        Rest (action 0) for up to `ticks` turns in closed form, with exactly the same outcome as calling step(0) in a
+        loop.  Optionally stops after the first turn on which energy >= `energy`, health >= `health`,
+        food <= `food` or water <= `water`.  Stops when the agent dies.
+        :return: the final state, the summed reward, is_done, and a debug dictionary with the number of 'ticks' run
+        """
+        rested = self.agent.fast_rest(ticks, energy, health, food, water)
+        self.entities.step_plants(rested)
+
         if self.agent.health <= 0:
-            reward = -1000
-            is_done = True
-        return state, reward, is_done, debug
+            return self._get_state(), rested - 1 - 1000, True, {'ticks': rested}
+        return self._get_state(), rested, False, {'ticks': rested}
 
     #-----------------------------------------------------------------------------------------------
     def render(self, mode='human'):
@@ -706,6 +1199,14 @@ class SimpleEnv(gym.Env):
 
         return self.viewer.render(return_rgb_array=mode == 'rgb_array')
 
+    def close(self):
+        """
+        Close the window opened by render(), if any (a later render() opens a new one)
+        """
+        if self.viewer is not None:
+            self.viewer.close()
+            self.viewer = None
+
     #-----------------------------------------------------------------------------------------------
     def reset(self):
         """
@@ -714,73 +1215,41 @@ class SimpleEnv(gym.Env):
 
         rnd.seed(42)
 
+        self._version += 1
+        if self.memory is not None:
+            self.memory.clear()
         self.season = 0
         self.day = 0
         self.time = 0
+        # the registry is cleared below, so the ids can start over (they are int32 there)
+        self.food_id = 0
 
         # BACKGROUND TILES
-        for r in range(18):
-            for c in range(18):
-                self.map[r, c] = GRASS
-        for r in range(4, 16):
-            self.map[r, 0] = CLIFF_W
-            self.map[r, 17] = CLIFF_E
-        for c in range(0, 18):
-            self.map[0, c] = ROCK
-            self.map[17, c] = FOREST
-            self.map[16, c] = FORESTEDGE
-        for i in range(0, 3):
-            self.map[i + 1, 0] = ROCK
-            self.map[i + 1, 4] = ROCK
-            self.map[3, i] = ROCK
-
-            self.map[i + 1, 17] = ROCK
-            self.map[i + 1, 13] = ROCK
-            self.map[3, 17 - i] = ROCK
-        for i in range(5, 13):
-            self.map[1, i] = WATER
-            self.map[2, i] = WATER
-            self.map[3, i] = BEACH_N
-        self.map[15, 0] = CLIFF_SW
-        self.map[15, 17] = CLIFF_SE
-        self.dark_areas = [(1, 1, 4),
-                           (1, 2, 3),
-                           (1, 3, 2),
-                           (2, 1, 3),
-                           (2, 2, 2),
-                           (2, 3, 1),
-                           (3, 3, 1)]
+        self.terrain = shared_terrain()
+        self.dark_areas = DARK_AREAS
 
         # CREATURES
         self.agent = Agent(self, 1, 9, 9)
 
         # PLANTS
-        self.plants = []
-        for idx in range(12):
-            while True:
-                x, y = rnd.randint(1, 16), rnd.randint(4, 15)
-                if self.objects[y, x] == 0:
-                    self.objects[y, x] = PLANT
-                    break
-
+        self.entities.clear()
+        self.placement.clear()
+        xs, ys = self.placement.take(KIND_PLANT, 12)
+        for idx, (x, y) in enumerate(zip(xs.tolist(), ys.tolist())):
             stage = rnd.randint(0, 3)
-            plant = Plant(self, idx, x, y, stage)
-            self.plants.append(plant)
+            Plant(self, idx, x, y, stage)
 
         # Stones - DISABLED in SIMPLE ENV
-        self.stones = []
-        # for idx in range(15):
-        #     while True:
-        #         x, y = rnd.randint(1, 16), rnd.randint(4, 15)
-        #         if self.objects[y, x] == 0:
-        #             self.objects[y, x] = STONE
-        #             break
-        #
-        #     stone = Stone(self, idx, rnd.randint(1, 16), rnd.randint(4, 15))
-        #     self.stones.append(stone)
-
-        # Empty at first, but can be filled as things are set down
-        self.foods = []
+        # xs, ys = self.placement.take(KIND_STONE, 15)
+        # for idx, (x, y) in enumerate(zip(xs.tolist(), ys.tolist())):
+        #     Stone(self, idx, x, y)
+
+        # No food at first, but it can be filled as things are set down
+
+        if self._planes is not None:
+            self._planes.rebuild()
+        if self._periphery is not None:
+            self._periphery.rebuild()
 
         return self._get_state()
 
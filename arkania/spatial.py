@@ -0,0 +1,97 @@
+"""
+Uniform-grid spatial hash for entities at float positions
+
+The world is cut into square cells of `cell_size`.  build() sorts the entities by cell (row-major), so the entities
+of any horizontal run of cells are one contiguous slice of `order`.  A radius query therefore looks at a few slices
+of candidates instead of every entity, and neighbors() answers many queries at once with no python loop over the
+entities.
+"""
+import math
+import numpy as np
+
+
+def expand_ranges(lo, hi):
+    """
+    :return: (owner, values) - for every range i, the values lo[i] ... hi[i] - 1 each paired with owner i
+    """
+    counts = hi - lo
+    owner = np.repeat(np.arange(len(lo)), counts)
+    firsts = np.cumsum(counts) - counts
+    values = np.arange(counts.sum()) - np.repeat(firsts - lo, counts)
+    return owner, values
+
+
+class SpatialHash:
+    def __init__(self, width, height, cell_size):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.nx = max(int(math.ceil(width / cell_size)), 1)
+        self.ny = max(int(math.ceil(height / cell_size)), 1)
+        self.pos = np.zeros((0, 2), dtype=np.float32)
+        self.order = np.zeros(0, dtype=np.intp)
+        self.start = np.zeros(self.nx * self.ny + 1, dtype=np.intp)
+
+    def _cell_xy(self, pos):
+        cx = np.clip((pos[:, 0] / self.cell_size).astype(np.intp), 0, self.nx - 1)
+        cy = np.clip((pos[:, 1] / self.cell_size).astype(np.intp), 0, self.ny - 1)
+        return cx, cy
+
+    def build(self, pos):
+        """
+        Index a new set of positions
+        :param pos: <n x 2> array of (x, y); it is kept by reference until the next build
+        """
+        self.pos = pos
+        cx, cy = self._cell_xy(pos)
+        cells = cy * self.nx + cx
+        self.order = np.argsort(cells, kind='stable')
+        counts = np.bincount(cells, minlength=self.nx * self.ny)
+        self.start[0] = 0
+        np.cumsum(counts, out=self.start[1:])
+
+    def query(self, x, y, radius):
+        """
+        :return: indices of the entities within `radius` of (x, y)
+        """
+        _, idx = self.neighbors(np.array([[x, y]], dtype=self.pos.dtype), radius)
+        return idx
+
+    def neighbors(self, points, radius):
+        """
+        All (query, entity) pairs closer than `radius`
+        :param points: <m x 2> query positions
+        :return: (query indices, entity indices), ordered by query
+        """
+        points = np.asarray(points)
+        reach = int(math.ceil(radius / self.cell_size))
+        cx, cy = self._cell_xy(points)
+        x_lo = np.maximum(cx - reach, 0)
+        x_hi = np.minimum(cx + reach, self.nx - 1)
+        # one contiguous slice of `order` per row of cells around each query
+        rows = cy[:, None] + np.arange(-reach, reach + 1)[None, :]
+        valid = (rows >= 0) & (rows < self.ny)
+        query = np.broadcast_to(np.arange(len(points))[:, None], rows.shape)[valid]
+        rows = rows[valid]
+        lo = self.start[rows * self.nx + x_lo[query]]
+        hi = self.start[rows * self.nx + x_hi[query] + 1]
+        owner, slots = expand_ranges(lo, hi)
+        query = query[owner]
+        entity = self.order[slots]
+        d = self.pos[entity] - points[query]
+        close = (d * d).sum(axis=1) < radius * radius
+        return query[close], entity[close]
+
+    def pairs(self, radius, mask=None):
+        """
+        All pairs (i, j), i < j, of indexed entities closer than `radius`
+        :param mask: optional boolean array, only pairs where both entities are in the mask
+        """
+        points = self.pos if mask is None else self.pos[mask]
+        ids = np.arange(len(self.pos)) if mask is None else np.flatnonzero(mask)
+        q, j = self.neighbors(points, radius)
+        i = ids[q]
+        keep = i < j
+        if mask is not None:
+            keep &= mask[j]
+        return i[keep], j[keep]
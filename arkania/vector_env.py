@@ -0,0 +1,130 @@
+"""
+Batches of SimpleEnv instances stepped together
+
+Observations are returned as one flat float32 row per env:
+    [health, energy, food, water, in_hand, sight[0, 0], sight[0, 1], ... sight[2N, 2N]]
+Envs whose episode ends are reset automatically, so the observation returned for them is the first observation of
+the next episode.
+"""
+import numpy as np
+from .actions import action_masks
+from .entities import PLANT_RIPE
+from .simple_env import SimpleEnv
+from .vision import NUM_SIGHT_CODES
+
+VITALS = ('health', 'energy', 'food', 'water')
+SIGHT_SIZE = 2
+
+# column of in_hand in a flat observation, after the vitals
+IN_HAND = len(VITALS)
+
+# the sight code of each one-hot plane, and the bits of each sight code in the two bytes of the planes packed with
+# np.packbits (code 0 is the high bit of the first byte), with an empty last entry for UNSEEN cells
+PLANE_CODES = np.arange(NUM_SIGHT_CODES, dtype=np.int8)[:, None, None]
+PACKED_BITS = np.zeros((2, NUM_SIGHT_CODES + 1), dtype=np.uint8)
+PACKED_BITS[np.arange(NUM_SIGHT_CODES) // 8, np.arange(NUM_SIGHT_CODES)] = 0x80 >> (np.arange(NUM_SIGHT_CODES) % 8)
+
+
+def observation_size(sight_size=SIGHT_SIZE):
+    return len(VITALS) + 1 + (2 * sight_size + 1) ** 2
+
+
+def flatten_state(state, out=None):
+    """
+    Pack a SimpleEnv state dictionary into a flat float32 vector
+    :param state: the dictionary returned by SimpleEnv.reset() / step()
+    :param out: optional row to write into instead of allocating a new array
+    :return: the flat observation
+    """
+    sight = state['sight']
+    if out is None:
+        out = np.empty(len(VITALS) + 1 + sight.size, dtype=np.float32)
+    for i, key in enumerate(VITALS):
+        out[i] = state[key]
+    out[IN_HAND] = state['in_hand']
+    out[IN_HAND + 1:] = sight.ravel()
+    return out
+
+
+class SimpleVectorEnv:
+    def __init__(self, num_envs, **env_kwargs):
+        self.num_envs = num_envs
+        self.envs = [SimpleEnv(**env_kwargs) for _ in range(num_envs)]
+        self.observation_size = observation_size()
+        self._obs = np.zeros((num_envs, self.observation_size), dtype=np.float32)
+        self._planes = {}
+        # the occupancy grids of the envs, <num_envs x 18 x 18>, whose rows the envs' registries use as their grids,
+        # so that they can be read for every env in one lookup
+        regs = [env.entities for env in self.envs]
+        self.plant_stage = np.stack([reg.plant_stage for reg in regs])
+        self.food_count = np.stack([reg.food_count for reg in regs])
+        self.stone_count = np.stack([reg.stone_count for reg in regs])
+        for i, reg in enumerate(regs):
+            reg.bind_grids(self.plant_stage[i], self.food_count[i], self.stone_count[i])
+        self._rows = np.arange(num_envs)
+
+    def reset(self):
+        for i, env in enumerate(self.envs):
+            flatten_state(env.reset(), self._obs[i])
+        return self._obs.copy()
+
+    def step(self, actions):
+        """
+        :param actions: one integer action per env
+        :return: observations (num_envs x observation_size), rewards, dones, list of debug dictionaries
+        """
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        dones = np.zeros(self.num_envs, dtype=bool)
+        infos = []
+        for i, env in enumerate(self.envs):
+            state, reward, done, debug = env.step(int(actions[i]))
+            if done:
+                state = env.reset()
+            flatten_state(state, self._obs[i])
+            rewards[i] = reward
+            dones[i] = done
+            infos.append(debug)
+        return self._obs.copy(), rewards, dones, infos
+
+    def action_masks(self):
+        """
+        :return: boolean <num_envs x NUM_ACTIONS> valid-action masks for the current observations
+        """
+        obs = self._obs
+        agents = [env.agent for env in self.envs]
+        xs = np.fromiter((agent.x for agent in agents), np.intp, self.num_envs)
+        ys = np.fromiter((agent.y for agent in agents), np.intp, self.num_envs)
+        terrains = [env.terrain for env in self.envs]
+        if all(terrain is terrains[0] for terrain in terrains):
+            beach = terrains[0].beach[ys, xs]
+        else:
+            beach = np.array([terrain.beach[y, x] for terrain, x, y in zip(terrains, xs, ys)], dtype=bool)
+        at = self._rows, ys, xs
+        pickable = beach | (self.food_count[at] > 0) | (self.stone_count[at] > 0) | (self.plant_stage[at] == PLANT_RIPE)
+        return action_masks(obs[:, VITALS.index('energy')], obs[:, VITALS.index('food')],
+                            obs[:, VITALS.index('water')], obs[:, IN_HAND], pickable)
+
+    def sight_planes(self, packed=False):
+        """
+        :return: uint8 <num_envs x 15 x 2N+1 x 2N+1> one-hot sight planes for the current observations
+                 (<num_envs x 2 x 2N+1 x 2N+1> with packed=True); the array is re-used by the next call
+        """
+        out = self._planes.get(packed)
+        side = 2 * SIGHT_SIZE + 1
+        if out is None:
+            out = np.zeros((self.num_envs, 2 if packed else NUM_SIGHT_CODES, side, side), dtype=np.uint8)
+            self._planes[packed] = out
+        sight = self._obs[:, IN_HAND + 1:].reshape(self.num_envs, side, side)
+        if packed:
+            # each cell sets one bit in one of the two packed channels; UNSEEN (-1) wraps to the last, empty entry
+            codes = sight.astype(np.intp)
+            np.take(PACKED_BITS[0], codes, out=out[:, 0], mode='wrap')
+            np.take(PACKED_BITS[1], codes, out=out[:, 1], mode='wrap')
+        else:
+            # compared as int8 (cheaper than float32) straight into `out`, through a boolean view of it
+            np.equal(sight.astype(np.int8)[:, None], PLANE_CODES, out=out.view(bool))
+        return out
+
+    def close(self):
+        for env in self.envs:
+            env.close()
@@ -0,0 +1,279 @@
+"""
+Sight codes and occlusion-aware field-of-view for the grid worlds
+
+The field of view is the vision cone stored in sight.dat: 'P' marks the agent, the cone opens up along the rows
+below it, and every cell that is not '.' can be seen.  For each (radius, facing) the cone is rotated into world
+coordinates once, together with a table of the cells each line of sight passes through.  A query is then a table
+lookup plus one vectorized occlusion pass: a cell is hidden when a ROCK-WALL lies strictly between it and the agent.
+"""
+import os
+import numpy as np
+
+NORTH = 0
+EAST = 1
+SOUTH = 2
+WEST = 3
+
+# values found in a sight matrix
+SIGHT_UNSEEN = -1
+SIGHT_GRASS = 0
+SIGHT_BEACH = 1
+SIGHT_CLIFF_EDGE = 2
+SIGHT_FOREST_EDGE = 3
+SIGHT_ROCK = 4
+SIGHT_DROPOFF = 5
+SIGHT_WATER = 6
+SIGHT_DARK_FOREST = 7
+SIGHT_PLANT_1 = 8
+SIGHT_PLANT_RIPE = 11
+SIGHT_FOOD = 12
+SIGHT_STONE = 13
+SIGHT_PREDATOR = 14
+NUM_SIGHT_CODES = 15
+
+# sight code of each map tile, indexed by the tile id used in SimpleEnv.map
+TILE_CODES = np.array([0, 6, 5, 1, 1, 1, 1, 1, 2, 2, 4, 3, 7, -1, 14, 13, 8, 9, 10, 11, -1, 1, 2, 2, 12, -99, -99],
+                      dtype=np.int8)
+
+SIGHT_MASK_FILE = os.path.join(os.path.dirname(__file__), 'sight.dat')
+
+# unit vectors (dx, dy) pointing forward and to the right for each facing
+FORWARD = {NORTH: (0, 1), EAST: (1, 0), SOUTH: (0, -1), WEST: (-1, 0)}
+RIGHT = {NORTH: (1, 0), EAST: (0, -1), SOUTH: (-1, 0), WEST: (0, 1)}
+
+
+def padded_terrain_codes(tile_map, pad):
+    """
+    Translate a map of tile ids into sight codes, surrounded by `pad` cells of what lies beyond the edge of the map
+    (ROCK-WALL to the south, DROPOFF past the cliffs and DARK-FOREST to the north)
+    :param tile_map: <rows x columns> array of tile ids, indexed [y, x]
+    :param pad: number of cells to add on every side
+    :return: int8 array indexed [y + pad, x + pad]
+    """
+    height, width = tile_map.shape
+    ys, xs = np.mgrid[-pad:height + pad, -pad:width + pad]
+    codes = np.select([(xs >= 0) & (ys >= 0), (xs < 0) & (ys >= 0), (xs >= 0) & (ys < 0)],
+                      [np.where(xs >= ys, SIGHT_DROPOFF, SIGHT_DARK_FOREST),
+                       np.where(width - 1 - xs >= ys, SIGHT_DROPOFF, SIGHT_DARK_FOREST),
+                       np.where(width - 1 - xs >= ys, SIGHT_ROCK, SIGHT_DROPOFF)],
+                      np.where(xs >= ys, SIGHT_ROCK, SIGHT_DROPOFF)).astype(np.int8)
+    codes[pad:pad + height, pad:pad + width] = TILE_CODES[tile_map]
+    return codes
+
+
+def overlay_objects(codes, plant_stage, food_count, stone_count):
+    """
+    Write the sight codes of the objects on the ground over terrain codes: plants, then food, then stones on top
+    :param codes: sight codes, modified in place
+    :param plant_stage: entity grids of the same shape as codes (see EntityRegistry)
+    :return: codes
+    """
+    plant = plant_stage >= 0
+    codes[plant] = SIGHT_PLANT_1 + plant_stage[plant]
+    codes[food_count > 0] = SIGHT_FOOD
+    codes[stone_count > 0] = SIGHT_STONE
+    return codes
+
+
+def one_hot(codes, dtype=np.uint8):
+    """
+    :return: <NUM_SIGHT_CODES x ...> planes, 1 where codes equals the plane's index (codes outside 0-14 have no 1)
+    """
+    return (codes[None] == np.arange(NUM_SIGHT_CODES).reshape((-1,) + (1,) * codes.ndim)).astype(dtype)
+
+
+def load_sight_mask(path=SIGHT_MASK_FILE):
+    """
+    :return: (forward, lateral) offsets of the cells in the vision cone, relative to the agent
+    """
+    with open(path) as f:
+        rows = [line.rstrip('\n') for line in f if line.strip()]
+    p_row = [i for i, row in enumerate(rows) if 'P' in row][0]
+    p_col = rows[p_row].index('P')
+    cells = [(r - p_row, c - p_col) for r, row in enumerate(rows) for c, ch in enumerate(row)
+             if ch not in '.P' and r >= p_row]
+    return np.array(cells, dtype=int).reshape(-1, 2)
+
+
+def line_cells(dx, dy):
+    """
+    :return: the cells strictly between (0, 0) and (dx, dy) on a straight line, as a list of (x, y)
+    """
+    steps = max(abs(dx), abs(dy))
+    cells = []
+    for i in range(1, steps):
+        x = int(np.floor(i * dx / steps + 0.5))
+        y = int(np.floor(i * dy / steps + 0.5))
+        if (x, y) != (0, 0) and (x, y) != (dx, dy) and (not cells or cells[-1] != (x, y)):
+            cells.append((x, y))
+    return cells
+
+
+class FieldOfView:
+    """
+    Precomputed visibility tables for one (radius, facing).  Windows are <2R+1 x 2R+1> with the agent in the center
+    and north in row 0, the same layout as SimpleEnv.get_sight_matrix().
+    """
+
+    def __init__(self, radius, facing, mask=None):
+        if mask is None:
+            mask = load_sight_mask()
+        self.radius = radius
+        self.facing = facing
+        self.size = 2 * radius + 1
+        sentinel = self.size * self.size
+
+        fx, fy = FORWARD[facing]
+        rx, ry = RIGHT[facing]
+        offsets = {(0, 0)}
+        for fwd, lat in mask:
+            dx, dy = fwd * fx + lat * rx, fwd * fy + lat * ry
+            if max(abs(dx), abs(dy)) <= radius:
+                offsets.add((int(dx), int(dy)))
+        offsets = sorted(offsets)
+
+        def flat(dx, dy):
+            return (radius - dy) * self.size + (radius + dx)
+
+        rays = [[flat(x, y) for x, y in line_cells(dx, dy)] for dx, dy in offsets]
+        length = max([len(r) for r in rays] + [1])
+        # cells in the cone, and for each one the cells its line of sight crosses (padded with an always-clear cell)
+        self.cells = np.array([flat(dx, dy) for dx, dy in offsets], dtype=np.intp)
+        self.rays = np.full((len(rays), length), sentinel, dtype=np.intp)
+        for i, r in enumerate(rays):
+            self.rays[i, :len(r)] = r
+
+    def visible(self, blocking):
+        """
+        :param blocking: boolean window(s) <... x 2R+1 x 2R+1>, True where the cell blocks the line of sight
+        :return: boolean window(s) of the same shape, True where the cell can be seen
+        """
+        lead = blocking.shape[:-2]
+        flat = blocking.reshape(lead + (self.size * self.size,))
+        flat = np.concatenate([flat, np.zeros(lead + (1,), dtype=bool)], axis=-1)
+        occluded = flat[..., self.rays].any(axis=-1)
+        seen = np.zeros(lead + (self.size * self.size,), dtype=bool)
+        seen[..., self.cells] = ~occluded
+        return seen.reshape(blocking.shape)
+
+    def apply(self, window):
+        """
+        :param window: sight code window(s) <... x 2R+1 x 2R+1>
+        :return: a copy with every cell outside the field of view set to SIGHT_UNSEEN
+        """
+        return np.where(self.visible(window == SIGHT_ROCK), window, SIGHT_UNSEEN).astype(window.dtype)
+
+
+_tables = {}
+
+
+def field_of_view(radius, facing):
+    """
+    :return: the (cached) FieldOfView tables for this radius and facing
+    """
+    key = (radius, facing)
+    if key not in _tables:
+        _tables[key] = FieldOfView(radius, facing)
+    return _tables[key]
+
+
+def windows(world, pad, xs, ys, radius):
+    """
+    Cut sight windows for many agents at once out of a padded world of sight codes
+    :param world: array indexed [y + pad, x + pad], such as SimpleEnv.sight_world(pad)
+    :param xs: agent x positions
+    :param ys: agent y positions
+    :return: <n x 2R+1 x 2R+1> windows, north in row 0
+    """
+    xs = np.asarray(xs)[:, None]
+    ys = np.asarray(ys)[:, None]
+    span = np.arange(-radius, radius + 1)
+    rows = ys + pad - span
+    cols = xs + pad + span
+    return world[rows[:, :, None], cols[:, None, :]]
+
+
+def fov_batch(world, pad, xs, ys, facings, radius):
+    """
+    Field-of-view observations for many agents
+    :return: <n x 2R+1 x 2R+1> sight codes with the cells each agent can not see set to SIGHT_UNSEEN
+    """
+    win = windows(world, pad, xs, ys, radius)
+    facings = np.asarray(facings)
+    out = np.empty_like(win)
+    for facing in np.unique(facings):
+        group = facings == facing
+        out[group] = field_of_view(radius, int(facing)).apply(win[group])
+    return out
+
+
+class SightPlanes:
+    """
+    One-hot version of a SimpleEnv world, padded by `pad` cells on every side.  `planes` is uint8, stored north row
+    first and channels last, indexed [height + pad - 1 - y, x + pad, code], so that every <15 x 2N+1 x 2N+1> sight window
+    is an element of a strided sliding-window view and a batch of windows is a single gather.  It is kept up to date by
+    listening to the env's EntityRegistry, so only the tiles that change are re-encoded.
+    """
+
+    def __init__(self, env, pad):
+        self.env = env
+        self.pad = pad
+        self.top = env.entities.height + pad - 1
+        self.planes = None
+        self._views = {}
+        self.rebuild()
+        env.entities.listeners.append(self.on_change)
+
+    def rebuild(self):
+        """
+        Encode the whole world again, needed when the terrain changes (e.g. on reset)
+        """
+        planes = np.moveaxis(one_hot(self.env.sight_world(self.pad)[::-1]), 0, -1)
+        if self.planes is None:
+            self.planes = np.ascontiguousarray(planes)
+        else:
+            self.planes[...] = planes
+
+    def detach(self):
+        self.env.entities.listeners.remove(self.on_change)
+
+    def on_change(self, xs, ys):
+        reg = self.env.entities
+        pad = self.pad
+        codes = self.env._terrain_codes(pad)[ys + pad, xs + pad].copy()
+        overlay_objects(codes, reg.plant_stage[ys, xs], reg.food_count[ys, xs], reg.stone_count[ys, xs])
+        rows, cols = self.top - ys, xs + pad
+        self.planes[rows, cols] = 0
+        valid = (codes >= 0) & (codes < NUM_SIGHT_CODES)
+        self.planes[rows[valid], cols[valid], codes[valid]] = 1
+
+    def _view(self, size):
+        view = self._views.get(size)
+        if view is None:
+            side = 2 * size + 1
+            view = np.lib.stride_tricks.sliding_window_view(self.planes, (side, side), axis=(0, 1))
+            self._views[size] = view
+        return view
+
+    def window(self, x, y, size, packed=False):
+        """
+        :return: <15 x 2N+1 x 2N+1> uint8 planes around (x, y), north in row 0; with packed=True the channel axis is
+                 packed into bits, <2 x 2N+1 x 2N+1>
+        """
+        win = self._view(size)[self.top - y - size, x + self.pad - size]
+        return np.packbits(win, axis=0) if packed else win.copy()
+
+    def windows(self, xs, ys, size, packed=False, out=None):
+        """
+        Planes for many positions at once
+        :return: <n x 15 x 2N+1 x 2N+1> uint8 (or <n x 2 x 2N+1 x 2N+1> packed)
+        """
+        rows = self.top - size - np.asarray(ys)
+        cols = np.asarray(xs) + self.pad - size
+        win = self._view(size)[rows, cols]
+        if packed:
+            win = np.packbits(win, axis=1)
+        if out is None:
+            return win
+        out[...] = win
+        return out
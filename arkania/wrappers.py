@@ -0,0 +1,76 @@
+"""
+gym wrappers for the Arkania environments
+"""
+import itertools
+import gym
+from .recording import FrameWriter, format_of, check_format
+
+
+class FrameSkip(gym.Wrapper):
+    """
+    Repeat every action for `skip` turns (action repeat).  Rewards are summed, the repeat stops early if the agent
+    dies, and the debug dictionary of the last turn also holds the number of 'ticks' run.  Directly around the env,
+    only the state after the last turn is built (step_many); around other wrappers, every turn goes through their
+    step() so that none of them is skipped.
+    """
+
+    def __init__(self, env, skip=4):
+        super().__init__(env)
+        if skip < 1:
+            raise ValueError("skip must be at least 1")
+        self.skip = skip
+
+    def step(self, action):
+        if self.env is self.env.unwrapped:
+            return self.env.step_many(itertools.repeat(action, self.skip))
+        total = 0
+        for ticks in range(1, self.skip + 1):
+            state, reward, is_done, info = self.env.step(action)
+            total += reward
+            if is_done:
+                break
+        info = dict(info, ticks=ticks)
+        return state, total, is_done, info
+
+
+class RecordEpisodes(gym.Wrapper):
+    """
+    Render every `every`-th turn and encode the frames on a background thread (see recording.py).  Each episode goes
+    to its own output, named by formatting `path` with the episode number, e.g. 'eval/episode_{:03d}.gif'.  The
+    format comes from the extension: .gif, .mp4, or anything else for a directory of PNGs.  When the encoder falls
+    behind, frames are skipped before they are rendered (counted in `writer.dropped`), so the env never waits on it.
+    """
+
+    def __init__(self, env, path, every=1, fps=20, max_queue=64, fmt=None):
+        super().__init__(env)
+        if every < 1:
+            raise ValueError("every must be at least 1")
+        self.path = path
+        self.every = every
+        self.fmt = fmt or format_of(path)
+        check_format(self.fmt)
+        self.writer = FrameWriter(fps, max_queue)
+        self.episode = -1
+        self.turn = 0
+
+    def _capture(self):
+        self.writer.submit(lambda: self.env.render(mode='rgb_array'))
+
+    def reset(self, **kwargs):
+        state = self.env.reset(**kwargs)
+        self.episode += 1
+        self.turn = 0
+        self.writer.open(self.path.format(self.episode), self.fmt)
+        self._capture()
+        return state
+
+    def step(self, action):
+        result = self.env.step(action)
+        self.turn += 1
+        if self.turn % self.every == 0:
+            self._capture()
+        return result
+
+    def close(self):
+        self.writer.close()
+        super().close()
@@ -0,0 +1,58 @@
+"""
+Cost of agent communication (arkania/communication.py) in GridWorld, for a hundred to a few thousand agents
+
+Every agent says a random symbol every tick (or nothing, half of the time) and hears the symbols said in its sight
+window.  Reports ticks per second with and without communication, and the time the channel itself takes per tick
+(clearing the grid, speaking and hearing).
+
+Run from the repository root:
+    python -m benchmarks.bench_communication
+"""
+import time
+import numpy as np
+from arkania.actions import REST, MOVE_NORTH, MOVE_EAST, MOVE_SOUTH, MOVE_WEST
+from arkania.communication import SymbolChannel, ALPHABET, SILENT
+from arkania.sharded import GridWorld
+
+TICKS = 200
+SIZES = [(128, (2, 2)), (512, (4, 4)), (2048, (8, 8))]
+
+
+def rate(world, actions, symbols):
+    t0 = time.perf_counter()
+    for a, s in zip(actions, symbols):
+        world.step(a, s)
+    elapsed = time.perf_counter() - t0
+    world.close()
+    return len(actions) / elapsed
+
+
+def channel_cost(n, blocks, symbols, rng):
+    height, width = blocks[1] * 18 + 4, blocks[0] * 18 + 4
+    channel = SymbolChannel(n, (height, width))
+    ids = np.arange(n)
+    xs, ys = rng.integers(2, width - 2, n), rng.integers(2, height - 2, n)
+    t0 = time.perf_counter()
+    for s in symbols:
+        channel.clear()
+        channel.speak(ids, xs, ys, s)
+        channel.hear(xs, ys, 2)
+    return (time.perf_counter() - t0) / len(symbols) * 1e6
+
+
+def main():
+    rng = np.random.default_rng(0)
+    for n, blocks in SIZES:
+        # mostly resting, so that most agents stay alive through the run
+        actions = rng.choice([REST] * 6 + [MOVE_NORTH, MOVE_EAST, MOVE_SOUTH, MOVE_WEST], (TICKS, n))
+        symbols = np.where(rng.random((TICKS, n)) < 0.5, SILENT, rng.integers(1, ALPHABET + 1, (TICKS, n)))
+        rate(GridWorld(blocks, n), actions[:20], [None] * 20)  # warm up
+        plain = rate(GridWorld(blocks, n), actions, [None] * TICKS)
+        talking = rate(GridWorld(blocks, n, communication=True), actions, symbols)
+        print(f"{n:5d} agents: {plain:7.0f} ticks/sec silent, {talking:7.0f} ticks/sec talking "
+              f"({100 * (plain / talking - 1):+.0f}% per tick), channel alone "
+              f"{channel_cost(n, blocks, symbols, rng):6.1f} us per tick")
+
+
+if __name__ == "__main__":
+    main()
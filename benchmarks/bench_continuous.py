@@ -0,0 +1,53 @@
+"""
+Benchmark of ContinuousEnv and its spatial hash
+
+Times a full step at 10, 1k and 100k entities (at the same density as the default 18 x 18 world with a few dozen
+entities, so the world grows with the count), and the collision pair search through the spatial hash against the
+O(n^2) pairwise check where that is still feasible.
+
+Run from the repository root:
+    python -m benchmarks.bench_continuous
+"""
+import time
+import numpy as np
+from arkania.continuous_env import ContinuousEnv, BODY_RADIUS
+
+DENSITY = 0.1    # entities per square tile
+
+
+def pairwise(pos, radius):
+    d = pos[:, None, :] - pos[None, :, :]
+    close = (d * d).sum(axis=2) < radius * radius
+    return np.nonzero(np.triu(close, 1))
+
+
+def timed(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+
+def main():
+    rng = np.random.default_rng(0)
+    for n in [10, 1000, 100000]:
+        size = float(np.sqrt(n / DENSITY))
+        env = ContinuousEnv(num_plants=n // 2, num_stones=n // 4, num_predators=n - 1 - n // 2 - n // 4, size=size)
+        actions = rng.uniform(-1, 1, (200, 3))
+        repeat = 200 if n <= 1000 else 20
+        step = timed(lambda: env.step(actions[rng.integers(200)]), repeat)
+
+        radius = 2 * BODY_RADIUS
+        hashed = timed(lambda: env.hash.pairs(radius), repeat)
+        line = f"{n:7d} entities: step {step * 1e3:8.3f} ms   pairs via hash {hashed * 1e3:8.3f} ms"
+        if n <= 10000:
+            brute = timed(lambda: pairwise(env.pos, radius), max(repeat // 10, 2))
+            assert len(pairwise(env.pos, radius)[0]) == len(env.hash.pairs(radius)[0])
+            line += f"   pairwise {brute * 1e3:8.3f} ms"
+        else:
+            line += "   pairwise (too large: n^2 distances)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark of the struct-of-arrays entity registry
+
+Fills a SimpleEnv with many entities (one plant on every free tile plus thousands of stacked food items and stones)
+and times env.step(), and a pick-up / put-down cycle.  Memory per entity is compared with a plain python object
+holding the same fields, which is how Plant / Food / Stone used to be stored.
+
+Run from the repository root:
+    python -m benchmarks.bench_entities
+"""
+import sys
+import time
+import random as rnd
+from arkania import SimpleEnv
+from arkania.simple_env import Food, Stone, Plant
+
+
+class LegacyItem:
+    def __init__(self, env, uid, x, y):
+        self.uid = uid
+        self.env = env
+        self.x = x
+        self.y = y
+        self.stage = 0
+        self.counter = 0
+        self.vx = 0
+        self.vy = 0
+        self.in_air = 0
+
+
+def populate(env, n):
+    rnd.seed(0)
+    uid = 1000
+    for y in range(4, 16):
+        for x in range(1, 17):
+            if env.entities.plant_stage[y, x] < 0:
+                uid += 1
+                Plant(env, uid, x, y, rnd.randint(0, 3))
+    while env.entities.count < n:
+        uid += 1
+        x, y = rnd.randint(1, 16), rnd.randint(4, 15)
+        if uid % 2:
+            Food(env, uid, x, y)
+        else:
+            Stone(env, uid, x, y)
+
+
+def timeit(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+
+def main():
+    for n in [100, 1000, 10000, 100000]:
+        env = SimpleEnv()
+        populate(env, n)
+        agent = env.agent
+        agent.x, agent.y = 8, 8
+        Food(env, 0, 8, 8)
+
+        def cycle():
+            agent.energy = 100
+            agent.pick_up()
+            agent.put_down()
+
+        step_s = timeit(lambda: env.step(0), 200)
+        cycle_s = timeit(cycle, 200)
+        per_entity = env.entities.nbytes() / env.entities.count
+        legacy = LegacyItem(env, 0, 0, 0)
+        legacy_bytes = sys.getsizeof(legacy) + sys.getsizeof(legacy.__dict__)
+        print(f"{env.entities.count:7d} entities: step {step_s * 1e6:8.1f} us   pick-up + put-down {cycle_s * 1e6:7.1f} us"
+              f"   {per_entity:5.1f} bytes / entity (python object: {legacy_bytes} bytes)")
+
+
+if __name__ == "__main__":
+    main()
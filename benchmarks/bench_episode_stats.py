@@ -0,0 +1,73 @@
+"""
+Overhead of the EpisodeStats wrapper (arkania/episode_stats.py) per vector step, for 1 to 16k envs
+
+To time the wrapper alone, it wraps a stand-in vector env that returns pre-generated observations, rewards and dones
+(about one episode end per 150 env steps, as with random play), and is compared with the stand-in stepped directly.
+The accumulators cost the same on every step; the records and quantile sketches only cost at episode ends.  The last
+line puts the overhead next to the cost of a SimpleVectorEnv step.
+
+Run from the repository root:
+    python -m benchmarks.bench_episode_stats
+"""
+import time
+import numpy as np
+from arkania.vector_env import SimpleVectorEnv, observation_size
+from arkania.episode_stats import EpisodeStats
+
+STEPS = 200
+SIZES = [1024, 4096, 16384]
+
+
+class ReplayVectorEnv:
+    """
+    A vector env that plays back random step outputs, so that stepping it costs next to nothing
+    """
+
+    def __init__(self, num_envs, steps=8, seed=0):
+        rng = np.random.default_rng(seed)
+        self.num_envs = num_envs
+        self.obs = rng.uniform(0, 100, (steps, num_envs, observation_size())).astype(np.float32)
+        self.dones = rng.random((steps, num_envs)) < 1 / 150
+        self.rewards = np.where(self.dones, -1000.0, 1.0).astype(np.float32)
+        self.t = 0
+
+    def reset(self):
+        return self.obs[0]
+
+    def step(self, actions):
+        t = self.t = (self.t + 1) % len(self.obs)
+        return self.obs[t], self.rewards[t], self.dones[t], [{} for _ in range(self.num_envs)]
+
+    def close(self):
+        pass
+
+
+def per_step(venv, actions):
+    venv.reset()
+    t0 = time.perf_counter()
+    for _ in range(STEPS):
+        venv.step(actions)
+    return (time.perf_counter() - t0) / STEPS * 1e6
+
+
+def main():
+    options = [('accumulators only', {'records': False}),
+               ('+ episode records', {}),
+               ('+ q50, q90 sketches', {'quantiles': (0.5, 0.9)})]
+    for n in SIZES:
+        actions = np.zeros(n, dtype=np.int64)
+        bare = per_step(ReplayVectorEnv(n), actions)
+        for name, kwargs in options:
+            extra = per_step(EpisodeStats(ReplayVectorEnv(n), **kwargs), actions) - bare
+            print(f"{n:6d} envs, {name:20s}: {extra:7.1f} us per step ({extra / n * 1000:5.1f} ns per env step)")
+
+    n = 256
+    actions = np.zeros(n, dtype=np.int64)
+    plain = per_step(SimpleVectorEnv(n), actions)
+    wrapped = per_step(EpisodeStats(SimpleVectorEnv(n)), actions)
+    print(f"SimpleVectorEnv({n}): {plain:8.0f} us per step, with EpisodeStats {wrapped:8.0f} us "
+          f"({100 * (wrapped / plain - 1):+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
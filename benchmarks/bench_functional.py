@@ -0,0 +1,59 @@
+"""
+Throughput of the functional step (arkania/functional.py) on NumPy and on JAX, against SimpleVectorEnv
+
+Each backend steps a batch of n worlds with random actions for a fixed number of turns and reports env steps per
+second, observations included.  The JAX numbers exclude compilation, which is timed separately.
+
+Run from the repository root:
+    python -m benchmarks.bench_functional
+"""
+import time
+import numpy as np
+from arkania import SimpleEnv
+from arkania.vector_env import SimpleVectorEnv
+from arkania.functional import state_from_envs, make_step_fn, jax
+
+TURNS = 200
+BATCHES = [1, 64, 1024]
+
+
+def bench_vector_env(n, actions):
+    venv = SimpleVectorEnv(n)
+    venv.reset()
+    t0 = time.perf_counter()
+    for a in actions:
+        venv.step(a)
+    return n * len(actions) / (time.perf_counter() - t0)
+
+
+def bench_step_fn(backend, n, actions):
+    step = make_step_fn(backend)
+    state = state_from_envs([SimpleEnv() for _ in range(n)])
+    t0 = time.perf_counter()
+    out = step(state, actions[0])
+    if jax is not None and backend == 'jax':
+        jax.block_until_ready(out)
+    compile_time = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for a in actions:
+        state, obs, reward, done = step(state, a)
+    if backend == 'jax':
+        jax.block_until_ready(obs)
+    return n * len(actions) / (time.perf_counter() - t0), compile_time
+
+
+def main():
+    rng = np.random.default_rng(0)
+    backends = ['numpy'] + (['jax'] if jax is not None else [])
+    if jax is None:
+        print("JAX is not installed, only the NumPy backend is measured")
+    for n in BATCHES:
+        actions = rng.integers(0, 8, (TURNS, n))
+        print(f"{n:5d} worlds: SimpleVectorEnv {bench_vector_env(n, actions):10.0f} steps/sec")
+        for backend in backends:
+            rate, compile_time = bench_step_fn(backend, n, actions)
+            print(f"{'':13}step_fn {backend:5s}  {rate:10.0f} steps/sec  (first call {compile_time * 1e3:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Cost of SimpleEnv.step() with a plain state dictionary and with lazy_state=True, for a consumer that only reads the
+vitals and for one that also reads sight (and fov) every step
+
+Run from the repository root:
+    python -m benchmarks.bench_lazy
+"""
+import random
+import time
+from arkania import SimpleEnv
+
+TICKS = 20000
+
+
+def rate(env, keys):
+    rng = random.Random(0)
+    actions = [rng.choice([0, 0, 0, 5, 6, 7]) for _ in range(TICKS)]
+    t0 = time.perf_counter()
+    for a in actions:
+        state = env.step(a)[0]
+        for key in keys:
+            state[key]
+    return TICKS / (time.perf_counter() - t0)
+
+
+def main():
+    vitals = ['health', 'energy', 'food', 'water']
+    rate(SimpleEnv(), vitals)  # warm up
+    for options in [{}, {'fov_radius': 4}]:
+        views = ['sight', 'fov'] if 'fov_radius' in options else ['sight']
+        for name, keys in [('vitals only', vitals), ('vitals + sight', vitals + views)]:
+            eager = rate(SimpleEnv(**options), keys)
+            lazy = rate(SimpleEnv(lazy_state=True, **options), keys)
+            print(f"{str(options):18s} {name:15s}: dict {eager:8.0f} steps/sec, lazy {lazy:8.0f} steps/sec "
+                  f"({lazy / eager:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
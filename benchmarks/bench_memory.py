@@ -0,0 +1,41 @@
+"""
+Memory footprint of many SimpleEnv instances in one process
+
+Reports the memory allocated per env (traced with tracemalloc) at 1, 64 and 1024 envs, with every env using the shared
+read-only terrain, and again after each env has changed one tile and so holds a private copy of it.
+
+Run from the repository root:
+    python -m benchmarks.bench_memory
+"""
+import gc
+import tracemalloc
+from arkania import SimpleEnv
+from arkania.simple_env import GRASS
+
+
+def per_env(n):
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    envs = [SimpleEnv() for _ in range(n)]
+    shared = (tracemalloc.get_traced_memory()[0] - base) / n
+    for env in envs:
+        env.set_tile(9, 9, GRASS)
+        env.get_sight_matrix(env.agent)
+    private = (tracemalloc.get_traced_memory()[0] - base) / n
+    tracemalloc.stop()
+    del envs
+    return shared, private
+
+
+def main():
+    # load the shared sprite atlas and terrain before measuring
+    SimpleEnv().get_sight_matrix(SimpleEnv().agent)
+    for n in [1, 64, 1024]:
+        shared, private = per_env(n)
+        print(f"{n:5d} envs: {shared / 1024:7.1f} KiB per env sharing the terrain, "
+              f"{private / 1024:7.1f} KiB per env with a private copy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Cost of the foveated periphery (arkania/periphery.py) against pooling a large sight window
+
+Both produce the category counts of the 16 pooled cells of two rings around the 5 x 5 sight matrix (45 x 45 tiles):
+once from the summed-area tables, and once by cutting the 45 x 45 window out of the world and summing it per block.
+Also reports the cost of keeping the tables up to date as plants grow and food is picked up and put down.
+
+Run from the repository root:
+    python -m benchmarks.bench_periphery
+"""
+import random
+import time
+import numpy as np
+from arkania import SimpleEnv
+from arkania.periphery import ring_cells, reach, category_planes
+
+CALLS = 5000
+
+
+def pooled_window(env, cells, pad):
+    a = env.agent
+    planes = category_planes(env.sight_world(pad))
+    return np.array([planes[a.y + y0 + pad:a.y + y1 + pad + 1, a.x + x0 + pad:a.x + x1 + pad + 1].sum(axis=(0, 1))
+                     for x0, x1, y0, y1 in cells])
+
+
+def per_call(fn):
+    t0 = time.perf_counter()
+    for _ in range(CALLS):
+        fn()
+    return (time.perf_counter() - t0) / CALLS * 1e6
+
+
+def main():
+    env = SimpleEnv()
+    cells = ring_cells()
+    pad = reach(cells)
+    env.get_periphery(env.agent)
+    print(f"summed-area tables:   {per_call(lambda: env.get_periphery(env.agent, fractions=False)):7.1f} us per call")
+    print(f"pooled 45x45 window:  {per_call(lambda: pooled_window(env, cells, pad)):7.1f} us per call")
+
+    rng = random.Random(0)
+    actions = [rng.choice([0, 0, 0, 5, 6, 7]) for _ in range(CALLS)]
+    plain, tracked = SimpleEnv(), SimpleEnv()
+    tracked.get_periphery(tracked.agent)
+    for name, e in [('step() without periphery', plain), ('step() keeping the tables', tracked)]:
+        t0 = time.perf_counter()
+        for a in actions:
+            e._tick(a)
+        print(f"{name}: {(time.perf_counter() - t0) / CALLS * 1e6:7.1f} us per turn")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark of the one-hot sight planes
+
+Times getting <15 x 5 x 5> planes from the vector env (built from its batch of observations in one operation) and
+from the one-hot world kept by an env for many agents, against expanding the integer sight matrix into one-hot planes
+with NumPy after the fact (and packing them with np.packbits for the packed planes).
+
+Run from the repository root:
+    python -m benchmarks.bench_planes
+"""
+import time
+import numpy as np
+from arkania import SimpleEnv
+from arkania.vector_env import SimpleVectorEnv, SIGHT_SIZE, VITALS
+from arkania.vision import NUM_SIGHT_CODES, SightPlanes, windows
+
+CODES = np.arange(NUM_SIGHT_CODES)[:, None, None]
+
+
+def after_the_fact(obs):
+    side = 2 * SIGHT_SIZE + 1
+    sight = obs[:, len(VITALS) + 1:].reshape(-1, 1, side, side)
+    return (sight == CODES).astype(np.uint8)
+
+
+def timed(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+
+def main():
+    rng = np.random.default_rng(0)
+    for n in [1, 16, 64]:
+        venv = SimpleVectorEnv(n)
+        obs = venv.reset()
+        repeat = max(4000 // n, 20)
+        numpy = timed(lambda: after_the_fact(obs), repeat)
+        numpy_packed = timed(lambda: np.packbits(after_the_fact(obs), axis=1), repeat)
+        planes = timed(lambda: venv.sight_planes(), repeat)
+        packed = timed(lambda: venv.sight_planes(packed=True), repeat)
+        assert np.array_equal(after_the_fact(obs), venv.sight_planes())
+        assert np.array_equal(np.packbits(after_the_fact(obs), axis=1), venv.sight_planes(packed=True))
+        print(f"{n:5d} envs:   numpy one-hot {numpy * 1e6:8.1f} us   planes {planes * 1e6:8.1f} us"
+              f"   numpy packed {numpy_packed * 1e6:8.1f} us   packed {packed * 1e6:8.1f} us")
+        venv.close()
+
+    env = SimpleEnv()
+    sight_planes = SightPlanes(env, SIGHT_SIZE)
+    for n in [64, 256, 1024]:
+        xs = rng.integers(1, 17, n)
+        ys = rng.integers(4, 16, n)
+        repeat = max(20000 // n, 20)
+
+        def numpy_batch():
+            world = env.sight_world(SIGHT_SIZE)
+            win = windows(world, SIGHT_SIZE, xs, ys, SIGHT_SIZE)
+            return (win[:, None] == CODES).astype(np.uint8)
+
+        numpy = timed(numpy_batch, repeat)
+        planes = timed(lambda: sight_planes.windows(xs, ys, SIGHT_SIZE), repeat)
+        assert np.array_equal(numpy_batch(), sight_planes.windows(xs, ys, SIGHT_SIZE))
+        print(f"{n:5d} agents: numpy one-hot {numpy * 1e6:8.1f} us   planes {planes * 1e6:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Cost of SimpleEnv.reset() over many episodes, and of placing thousands of entities in a dense world
+
+Reset must cost the same in episode 10000 as in episode 1, and placing the last entities of a nearly full region must
+cost the same as placing the first ones.
+
+Run from the repository root:
+    python -m benchmarks.bench_reset
+"""
+import random
+import time
+import numpy as np
+from arkania import SimpleEnv
+from arkania.placement import Placement, Region
+
+
+def bench_resets(episodes=10000, report=(1, 100, 1000, 10000)):
+    env = SimpleEnv()
+    for episode in range(1, episodes + 1):
+        t0 = time.perf_counter()
+        env.reset()
+        elapsed = time.perf_counter() - t0
+        if episode in report:
+            print(f"  reset of episode {episode:6d}: {elapsed * 1e6:7.1f} us")
+
+
+def bench_dense(size=256, batch=1000):
+    placement = Placement(size, size, {'all': Region(0, size - 1, 0, size - 1)})
+    rng = random.Random(0)
+    t_clear = time.perf_counter()
+    placement.clear()
+    t_clear = time.perf_counter() - t_clear
+    print(f"  clear() of a {size}x{size} world: {t_clear * 1e6:.1f} us")
+    while placement.num_free('all') >= batch:
+        fill = 1 - placement.num_free('all') / size ** 2
+        t0 = time.perf_counter()
+        placement.take('all', batch, rng)
+        elapsed = time.perf_counter() - t0
+        if fill == 0 or placement.num_free('all') < batch:
+            print(f"  placing {batch} entities at {fill:4.0%} full: {elapsed * 1e6 / batch:.2f} us per entity")
+
+
+def main():
+    print("SimpleEnv.reset():")
+    bench_resets()
+    print("Placement:")
+    bench_dense()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Benchmark of the batched ray-cast sensor
+
+Casts 32 rays from each of 64 agents in ContinuousEnv worlds of growing size (same density), against the cost target
+of 1 ms per step at 1000 entities, and against casting one agent at a time.
+
+Run from the repository root:
+    python -m benchmarks.bench_sensors
+"""
+import time
+import numpy as np
+from arkania.continuous_env import ContinuousEnv
+
+NUM_AGENTS = 64
+NUM_RAYS = 32
+DENSITY = 0.1
+TARGET_MS = 1.0
+
+
+def timed(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+
+def main():
+    for n in [100, 1000, 10000, 100000]:
+        env = ContinuousEnv(num_plants=n // 2, num_stones=n // 4, num_predators=n - 1 - n // 2 - n // 4,
+                            size=float(np.sqrt(n / DENSITY)))
+        agents = np.arange(NUM_AGENTS)
+        batched = timed(lambda: env.get_rays(agents, NUM_RAYS), 200)
+        single = timed(lambda: [env.get_rays([a], NUM_RAYS) for a in agents], 20)
+        mark = '' if n != 1000 else ('  (target met)' if batched * 1e3 < TARGET_MS else '  (target MISSED)')
+        print(f"{n:7d} entities, {NUM_AGENTS} agents x {NUM_RAYS} rays: batched {batched * 1e3:7.3f} ms"
+              f"   one agent at a time {single * 1e3:7.3f} ms{mark}")
+
+
+if __name__ == "__main__":
+    main()
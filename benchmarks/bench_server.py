@@ -0,0 +1,77 @@
+"""
+Benchmark of the asyncio env server against stepping the envs in-process
+
+Reports the round-trip latency of stepping a single remote env, and steps/sec of a pool of envs stepped in-process,
+over localhost TCP and over a unix socket (with and without splitting a step into pipelined chunks), and the bytes
+received per env step with full OBS frames and with delta-compressed frames.
+
+Run from the repository root:
+    python -m benchmarks.bench_server
+"""
+import os
+import time
+import tempfile
+import multiprocessing as mp
+import numpy as np
+from arkania.server import RemoteVectorEnv, run_server
+from arkania.vector_env import SimpleVectorEnv
+
+NUM_ENVS = 64
+STEPS = 200
+
+
+def start_server(num_envs, port=None, path=None, delta=False):
+    proc = mp.Process(target=run_server, kwargs=dict(num_envs=num_envs, port=port, path=path, delta=delta),
+                      daemon=True)
+    proc.start()
+    for _ in range(200):
+        try:
+            return proc, RemoteVectorEnv(port=port, path=path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            time.sleep(0.05)
+    raise RuntimeError("server did not start")
+
+
+def steps_per_sec(venv, steps=STEPS):
+    rng = np.random.default_rng(0)
+    venv.reset()
+    actions = rng.integers(0, 5, size=(steps, venv.num_envs))
+    t0 = time.perf_counter()
+    for a in actions:
+        venv.step(a)
+    return steps * venv.num_envs / (time.perf_counter() - t0)
+
+
+def main():
+    venv = SimpleVectorEnv(NUM_ENVS)
+    print(f"in-process          {NUM_ENVS} envs: {steps_per_sec(venv):9.0f} steps/sec")
+
+    proc, client = start_server(1, port=5601)
+    client.reset()
+    t0 = time.perf_counter()
+    for _ in range(2000):
+        client.step([0])
+    print(f"tcp round trip       1 env : {(time.perf_counter() - t0) / 2000 * 1e6:9.1f} us")
+    client.close()
+    proc.terminate()
+
+    for name, kwargs in [('tcp ', dict(port=5602)),
+                         ('unix', dict(path=os.path.join(tempfile.mkdtemp(), 'arkania.sock')))]:
+        proc, client = start_server(NUM_ENVS, **kwargs)
+        for chunk in [NUM_ENVS, 8]:
+            client.chunk = chunk
+            print(f"{name} chunk {chunk:3d}     {NUM_ENVS} envs: {steps_per_sec(client):9.0f} steps/sec")
+        client.close()
+        proc.terminate()
+
+    for name, delta, port in [('full ', False, 5603), ('delta', True, 5604)]:
+        proc, client = start_server(NUM_ENVS, port=port, delta=delta)
+        rate = steps_per_sec(client)
+        per_step = client.bytes_received / ((STEPS + 1) * NUM_ENVS)
+        print(f"tcp {name}          {NUM_ENVS} envs: {rate:9.0f} steps/sec  {per_step:6.1f} bytes / env step")
+        client.close()
+        proc.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Scaling of ShardedWorld (arkania/sharded.py) from 1 to 16 shards, against GridWorld stepping the same world in one
+process
+
+The world is 8 x 8 copies of the SimpleEnv map (144 x 144 tiles) with 2048 agents taking random actions.  Reports
+ticks per second and agent steps per second, and checks that every run ends in the same world as the single-process
+one.  The speedup is bounded by the number of cores (os.cpu_count()).
+
+Run from the repository root:
+    python -m benchmarks.bench_sharded
+"""
+import os
+import time
+import numpy as np
+from arkania.actions import REST, MOVE_NORTH, MOVE_EAST, MOVE_SOUTH, MOVE_WEST, PICK_UP, PUT_DOWN, CONSUME
+from arkania.sharded import GridWorld, ShardedWorld
+
+BLOCKS = (8, 8)
+AGENTS = 2048
+TICKS = 100
+SHARDS = [1, 2, 4, 8, 16]
+
+
+def run(world, actions):
+    world.step(actions[0])  # warm up
+    world.reset()
+    t0 = time.perf_counter()
+    for a in actions:
+        world.step(a)
+    elapsed = time.perf_counter() - t0
+    state = world.snapshot()
+    world.close()
+    return len(actions) / elapsed, state
+
+
+def main():
+    rng = np.random.default_rng(0)
+    choices = [REST] * 4 + [MOVE_NORTH, MOVE_EAST, MOVE_SOUTH, MOVE_WEST, PICK_UP, PUT_DOWN, CONSUME]
+    actions = rng.choice(choices, (TICKS, AGENTS))
+    print(f"{BLOCKS[0] * 18} x {BLOCKS[1] * 18} tiles, {AGENTS} agents, {TICKS} ticks, {os.cpu_count()} cores")
+
+    base, expected = run(GridWorld(BLOCKS, AGENTS), actions)
+    print(f"GridWorld:          {base:8.1f} ticks/sec {base * AGENTS:10.0f} agent steps/sec")
+    for k in SHARDS:
+        rate, state = run(ShardedWorld(k, BLOCKS, AGENTS), actions)
+        same = all(np.array_equal(state[name], expected[name]) for name in expected)
+        print(f"ShardedWorld({k:2d}):   {rate:8.1f} ticks/sec {rate * AGENTS:10.0f} agent steps/sec "
+              f"({rate / base:.2f}x)  {'identical' if same else 'DIFFERENT'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark of SimpleEnv.step_many(), the FrameSkip wrapper and SimpleEnv.fast_forward_rest() against calling step()
+in a loop
+
+Run from the repository root:
+    python -m benchmarks.bench_step_many
+"""
+import time
+from arkania import SimpleEnv
+from arkania.wrappers import FrameSkip
+
+TICKS = 20000
+
+
+def rate(fn):
+    t0 = time.perf_counter()
+    ticks = fn()
+    return ticks / (time.perf_counter() - t0)
+
+
+def main():
+    env = SimpleEnv()
+    # resting keeps the agent alive, so every call runs the full number of ticks
+    actions = [0] * TICKS
+
+    def loop():
+        env.reset()
+        for a in actions:
+            env.step(a)
+        return TICKS
+
+    def many(k):
+        def run():
+            env.reset()
+            ticks = 0
+            for start in range(0, TICKS, k):
+                ticks += env.step_many(actions[start:start + k])[3]['ticks']
+            return ticks
+        return run
+
+    def skip(k):
+        def run():
+            wrapped = FrameSkip(env, k)
+            wrapped.reset()
+            ticks = 0
+            for _ in range(TICKS // k):
+                ticks += wrapped.step(0)[3]['ticks']
+            return ticks
+        return run
+
+    def fast_rest(k):
+        def run():
+            env.reset()
+            ticks = 0
+            for _ in range(TICKS // k):
+                env.agent.food = env.agent.water = 100.0
+                ticks += env.fast_forward_rest(k)[3]['ticks']
+            return ticks
+        return run
+
+    print(f"step() loop        {rate(loop):10.0f} ticks/sec")
+    for k in [4, 16, 64]:
+        print(f"step_many(k={k:2d})   {rate(many(k)):10.0f} ticks/sec")
+    for k in [4, 16]:
+        print(f"FrameSkip(skip={k:2d}) {rate(skip(k)):10.0f} ticks/sec")
+    for k in [4, 16, 64]:
+        print(f"fast_forward_rest({k:2d}) {rate(fast_rest(k)):7.0f} ticks/sec")
+
+
+if __name__ == "__main__":
+    main()
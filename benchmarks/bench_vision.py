@@ -0,0 +1,48 @@
+"""
+Benchmark of the occlusion-aware field of view
+
+Times the batched field of view for hundreds of agents scattered over a SimpleEnv world, against calling
+SimpleEnv.get_fov_matrix() once per agent.
+
+Run from the repository root:
+    python -m benchmarks.bench_vision
+"""
+import time
+import numpy as np
+from arkania import SimpleEnv
+from arkania.simple_env import FOV_RADIUS
+from arkania.vision import fov_batch, field_of_view
+
+
+def main():
+    env = SimpleEnv()
+    rng = np.random.default_rng(0)
+    radius = FOV_RADIUS
+    t0 = time.perf_counter()
+    for facing in range(4):
+        field_of_view(radius, facing)
+    print(f"building the tables for radius {radius}: {(time.perf_counter() - t0) * 1e3:.1f} ms (once)")
+
+    for n in [1, 64, 256, 1024]:
+        xs = rng.integers(1, 17, n)
+        ys = rng.integers(4, 16, n)
+        facings = rng.integers(0, 4, n)
+        repeat = max(2000 // n, 5)
+
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            world = env.sight_world(radius)
+            fov_batch(world, radius, xs, ys, facings, radius)
+        batched = (time.perf_counter() - t0) / repeat
+
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            for x, y, f in zip(xs, ys, facings):
+                env.agent.x, env.agent.y, env.agent.facing = int(x), int(y), int(f)
+                env.get_fov_matrix(env.agent, radius)
+        single = (time.perf_counter() - t0) / repeat
+        print(f"{n:5d} agents: batched {batched * 1e3:7.2f} ms / step   one at a time {single * 1e3:7.2f} ms / step")
+
+
+if __name__ == "__main__":
+    main()
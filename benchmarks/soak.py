@@ -0,0 +1,188 @@
+"""
+Soak test: run SimpleEnv for millions of steps and resets, and fail if memory or the time per step trends upward
+
+Each phase plays random actions in one env (resetting it whenever the agent dies, and at least every
+--episode-length turns), with or without rendering, and takes a sample every --sample-every steps:
+    steps/sec over the last window, resident memory (RSS), the number of objects tracked by gc, and with
+    --tracemalloc the bytes allocated from Python
+After a warm-up (the first --warmup fraction of the samples), the trend of each series is the Theil-Sen slope (the
+median of the slopes between every pair of samples, so a few noisy samples do not move it) projected over the phase.
+A phase fails if RSS grows by more than --max-rss-growth MB, gc objects by more than --max-object-growth, or the time
+per step by more than --max-slowdown (a fraction of the median).
+
+Run from the repository root (exits with status 1 if a phase fails):
+    python -m benchmarks.soak
+    python -m benchmarks.soak --steps 10000000 --render-steps 500000 --tracemalloc
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+import numpy as np
+from arkania import SimpleEnv
+from arkania.actions import NUM_ACTIONS
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_bytes():
+    """
+    :return: the current resident set size of this process (from /proc on Linux, else the peak from getrusage)
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        if resource is None:
+            return 0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def theil_sen(xs, ys):
+    """
+    :return: the median slope between every pair of points
+    """
+    xs, ys = np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)
+    i, j = np.triu_indices(len(xs), 1)
+    dx = xs[j] - xs[i]
+    keep = dx != 0
+    return float(np.median((ys[j] - ys[i])[keep] / dx[keep])) if keep.any() else 0.0
+
+
+class Sample:
+    __slots__ = ('steps', 'resets', 'elapsed', 'us_per_step', 'rss', 'objects', 'traced')
+
+    def __init__(self, steps, resets, elapsed, us_per_step, rss, objects, traced):
+        self.steps = steps
+        self.resets = resets
+        self.elapsed = elapsed
+        self.us_per_step = us_per_step
+        self.rss = rss
+        self.objects = objects
+        self.traced = traced
+
+    def __str__(self):
+        traced = f"  traced {self.traced / 2 ** 20:8.2f} MB" if self.traced is not None else ""
+        return (f"{self.steps:10d} steps {self.resets:8d} resets {self.elapsed:8.1f}s  {self.us_per_step:7.2f} us/step"
+                f"  ({1e6 / self.us_per_step:8.0f} steps/sec)  RSS {self.rss / 2 ** 20:8.2f} MB  "
+                f"gc objects {self.objects:8d}{traced}")
+
+
+def run_phase(steps, render_every=0, sample_every=100000, episode_length=5000, seed=0, trace=False, verbose=True):
+    """
+    :param render_every: render (rgb_array) every this many steps, 0 for never
+    :return: list of Samples
+    """
+    rng = random.Random(seed)
+    actions = [rng.randrange(NUM_ACTIONS) for _ in range(65536)]
+    env = SimpleEnv()
+    env.reset()
+    samples = []
+    resets = 0
+    turn = 0
+    t_start = t_window = time.perf_counter()
+    for step in range(1, steps + 1):
+        done = env.step(actions[step & 0xFFFF])[2]
+        turn += 1
+        if render_every and step % render_every == 0:
+            env.render(mode='rgb_array')
+        if done or turn >= episode_length:
+            env.reset()
+            resets += 1
+            turn = 0
+        if step % sample_every == 0:
+            now = time.perf_counter()
+            us_per_step = (now - t_window) / sample_every * 1e6
+            gc.collect()
+            # not counting the samples taken so far
+            objects = len(gc.get_objects()) - len(samples)
+            sample = Sample(step, resets, now - t_start, us_per_step, rss_bytes(), objects,
+                            tracemalloc.get_traced_memory()[0] if trace else None)
+            samples.append(sample)
+            if verbose:
+                print(f"  {sample}", flush=True)
+            # the sampling itself (gc.collect() in particular) is not part of the window
+            t_window = time.perf_counter()
+    env.close()
+    return samples
+
+
+def check_trends(samples, warmup, max_rss_growth, max_object_growth, max_slowdown):
+    """
+    :return: list of failure messages (empty when the phase passes)
+    """
+    samples = samples[int(len(samples) * warmup):]
+    if len(samples) < 3:
+        return [f"only {len(samples)} samples after the warm-up, need at least 3 (lower --sample-every)"]
+    steps = [s.steps for s in samples]
+    span = steps[-1] - steps[0]
+    failures = []
+
+    rss_growth = theil_sen(steps, [s.rss for s in samples]) * span / 2 ** 20
+    if rss_growth > max_rss_growth:
+        failures.append(f"RSS trends up by {rss_growth:.2f} MB over {span} steps (limit {max_rss_growth} MB)")
+    object_growth = theil_sen(steps, [s.objects for s in samples]) * span
+    if object_growth > max_object_growth:
+        failures.append(f"gc objects trend up by {object_growth:.0f} over {span} steps (limit {max_object_growth})")
+    if samples[0].traced is not None:
+        traced_growth = theil_sen(steps, [s.traced for s in samples]) * span / 2 ** 20
+        if traced_growth > max_rss_growth:
+            failures.append(f"traced memory trends up by {traced_growth:.2f} MB over {span} steps "
+                            f"(limit {max_rss_growth} MB)")
+    latency = [s.us_per_step for s in samples]
+    slowdown = theil_sen(steps, latency) * span / np.median(latency)
+    if slowdown > max_slowdown:
+        failures.append(f"time per step trends up by {100 * slowdown:.1f}% over {span} steps "
+                        f"(limit {100 * max_slowdown:.0f}%)")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soak test SimpleEnv for memory leaks and per-step drift")
+    parser.add_argument('--steps', type=int, default=2000000,
+                        help="steps of the phase without rendering (0 to skip it)")
+    parser.add_argument('--render-steps', type=int, default=200000,
+                        help="steps of the phase with rendering (0 to skip it)")
+    parser.add_argument('--render-every', type=int, default=50, help="render every this many steps")
+    parser.add_argument('--sample-every', type=int, default=None,
+                        help="steps between samples (default: 1/40 of the phase)")
+    parser.add_argument('--episode-length', type=int, default=5000, help="reset at least this often")
+    parser.add_argument('--warmup', type=float, default=0.2, help="fraction of the samples to ignore")
+    parser.add_argument('--max-rss-growth', type=float, default=8.0, help="MB")
+    parser.add_argument('--max-object-growth', type=int, default=1000)
+    parser.add_argument('--max-slowdown', type=float, default=0.25, help="fraction of the median time per step")
+    parser.add_argument('--tracemalloc', action='store_true', help="also trace Python allocations (slower)")
+    args = parser.parse_args(argv)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    phases = [('no rendering', args.steps, 0),
+              (f"rendering every {args.render_every} steps", args.render_steps, args.render_every)]
+    phases = [phase for phase in phases if phase[1] > 0]
+
+    failed = False
+    for name, steps, render_every in phases:
+        sample_every = args.sample_every or max(steps // 40, 1)
+        print(f"{name}: {steps} steps, a sample every {sample_every}")
+        samples = run_phase(steps, render_every, sample_every, args.episode_length, trace=args.tracemalloc)
+        failures = check_trends(samples, args.warmup, args.max_rss_growth, args.max_object_growth,
+                                args.max_slowdown)
+        for failure in failures:
+            print(f"  FAIL: {failure}")
+        if not failures:
+            print("  ok: no upward trend in memory or time per step")
+        failed |= bool(failures)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,9 @@
 from arkania import SimpleEnv
-import time
+from arkania.interactive import InteractiveRunner, load_log, replay, TICK_RATE
+import argparse
 
 
-def human_interface():
+def human_interface(tick_rate=TICK_RATE, record=None):
     """
         For a human user interface we could do:
           W = move north
@@ -17,45 +18,33 @@ def human_interface():
           Left-Arrow = throw west
           Down-Arrow = throw south
           Right-Arrow throw east
+          P = pause
+          ESC = quit
+
+        Keys are read from the game window (no need for root), and the world moves on one turn per tick.
     """
-    import keyboard
     env = SimpleEnv()
-    env.reset()
-    env.render()
-
-    # Turn this off before committing
-    debugging = False
-
-    done = False
-    while not done:
-        env.render()
-        time.sleep(0.15)
-
-        action = 0
-        ch = keyboard.read_key()
-        print(f"getch -> ({ch})")
-
-        if ch == 'esc': break
-        if ch == 'w': action = 1
-        if ch == 'd': action = 2
-        if ch == 's': action = 3
-        if ch == 'a': action = 4
-        if ch == 'e': action = 5
-        if ch == 'x': action = 6
-        if ch == 'c': action = 7
-        if ch == 'up': action = 8
-        if ch == 'right': action = 9
-        if ch == 'down': action = 10
-        if ch == 'left': action = 11
-
-        state, reward, done, debug_info = env.step(action)
-
-        if debugging:
-            print(f"agent: ({env.agent.x}, {env.agent.y})")
-            print(state['sight'])
-
+    runner = InteractiveRunner(env, tick_rate)
+    turns = runner.run()
+    print(f"{turns} turns, total reward {runner.total_reward}" + (" (died)" if runner.done else ""))
+    if record is not None:
+        runner.save_log(record)
     env.viewer.close()
 
 
 if __name__ == "__main__":
-    human_interface()
+    parser = argparse.ArgumentParser(description="Play SimpleEnv from the keyboard, or replay a recorded game")
+    parser.add_argument('--tick-rate', type=float, default=TICK_RATE, help="turns per second")
+    parser.add_argument('--record', help="write the actions played to this file")
+    parser.add_argument('--replay', help="replay the actions recorded in this file")
+    parser.add_argument('--speed', type=float, default=8.0, help="replay speed, as a multiple of the tick rate")
+    args = parser.parse_args()
+
+    if args.replay is None:
+        human_interface(args.tick_rate, args.record)
+    else:
+        actions, tick_rate = load_log(args.replay)
+        env = SimpleEnv()
+        runner = replay(env, actions, tick_rate, args.speed)
+        print(f"replayed {len(runner.log)} of {len(actions)} turns, total reward {runner.total_reward}")
+        env.viewer.close()